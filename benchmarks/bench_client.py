@@ -0,0 +1,126 @@
+"""Benchmarks of the client against a local SbcSimulator.
+
+Run with:
+
+    $ python -m pytest benchmarks/bench_client.py
+
+Besides the timings of pytest-benchmark, calls/sec, fleet sweep times and
+peak memory are reported in the extra_info column of the JSON output, e.g.,
+with --benchmark-json=results.json
+"""
+
+import asyncio
+import tracemalloc
+
+import pytest
+
+from sbc_rest_client.async_sbc import AsyncSbc, run_on_fleet_async
+from sbc_rest_client.kpis import GlobalSessionsSnapshot
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+FLEET_SIZE = 50
+
+
+def _calls_per_sec(benchmark) -> None:
+    if benchmark.stats is None:
+        # --benchmark-disable
+        return
+    benchmark.extra_info["calls_per_sec"] = round(
+        1 / benchmark.stats.stats.mean, 1
+    )
+
+
+def test_role(benchmark, simulator):
+    sbc = simulator.sbc()
+    sbc.role
+    benchmark(lambda: sbc.role)
+    _calls_per_sec(benchmark)
+
+
+def test_kpi_snapshot(benchmark, simulator):
+    sbc = simulator.sbc()
+    benchmark(sbc.kpi_snapshot)
+    _calls_per_sec(benchmark)
+
+
+def test_update_config_element(benchmark, simulator):
+    sbc = simulator.sbc()
+    element = next(sbc.config_elements("session-agent"))
+    benchmark(sbc.update_config_element, element)
+    _calls_per_sec(benchmark)
+
+
+@pytest.mark.parametrize("concurrency", [1, 8, 32])
+def test_fleet_sweep(benchmark, slow_simulator, concurrency):
+    """Get the KPIs of a fleet. The fleet is one simulator, addressed
+    FLEET_SIZE times.
+    """
+
+    sbcs = [
+        AsyncSbc(
+            slow_simulator.user, slow_simulator.passwd,
+            slow_simulator.address, scheme=slow_simulator.scheme
+        )
+        for _ in range(FLEET_SIZE)
+    ]
+
+    async def kpis(sbc):
+        return await sbc.kpi_snapshot()
+
+    def sweep():
+        return asyncio.run(
+            run_on_fleet_async(sbcs, kpis, concurrency=concurrency)
+        )
+
+    results = benchmark.pedantic(sweep, rounds=3, warmup_rounds=1)
+    assert not [r for r in results if isinstance(r, Exception)]
+    benchmark.extra_info["fleet_size"] = FLEET_SIZE
+    if benchmark.stats is not None:
+        benchmark.extra_info["sweep_seconds"] = round(
+            benchmark.stats.stats.mean, 3
+        )
+
+
+def _peak_memory(f) -> int:
+    tracemalloc.start()
+    try:
+        f()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_iter_config_elements(benchmark, large_simulator):
+    sbc = large_simulator.sbc()
+
+    def consume():
+        count = 0
+        for _ in sbc.iter_config_elements("session-agent"):
+            count += 1
+        return count
+
+    assert benchmark.pedantic(consume, rounds=3) == 20000
+    benchmark.extra_info["peak_bytes"] = _peak_memory(consume)
+
+
+def test_get_config_elements(benchmark, large_simulator):
+    sbc = large_simulator.sbc()
+
+    def get():
+        assert sbc.get_config_elements("session-agent")
+
+    benchmark.pedantic(get, rounds=3)
+    benchmark.extra_info["peak_bytes"] = _peak_memory(get)
+
+
+def test_parse_kpis(benchmark, simulator):
+    """Client-side CPU cost of a KPI poll, without the network."""
+
+    sbc = simulator.sbc()
+    content = sbc._request("GET", sbc._global_sessions_url).content
+    snapshot = benchmark(GlobalSessionsSnapshot.from_xml, sbc.host, content)
+    assert snapshot.cps is not None
+    _calls_per_sec(benchmark)
@@ -0,0 +1,84 @@
+"""Benchmarks of the start-up cost of short-lived scripts.
+
+Run with:
+
+    $ python -m pytest benchmarks/bench_import.py
+
+Every import is timed in a fresh interpreter. Subtract the time of
+test_interpreter_startup to get the time of the import itself. The import
+time of every module is in the extra_info column of the JSON output, from
+python -X importtime.
+"""
+
+import os
+import subprocess
+import sys
+
+import sbc_rest_client
+from sbc_rest_client.sbc import Sbc
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+# Imported on first use only, see sbc_rest_client.sbc
+HEAVY_MODULES = ("requests", "urllib3", "lxml")
+
+
+def _python(code: str, *options: str) -> subprocess.CompletedProcess:
+    # The fresh interpreter imports the package the benchmarks import, also
+    # when it is not installed, e.g., with the pythonpath of pytest
+    env = dict(os.environ)
+    src = os.path.dirname(os.path.dirname(sbc_rest_client.__file__))
+    env["PYTHONPATH"] = os.pathsep.join(
+        path for path in (src, env.get("PYTHONPATH")) if path
+    )
+    return subprocess.run(
+        [sys.executable, *options, "-c", code], check=True,
+        capture_output=True, text=True, env=env
+    )
+
+
+def _import_times(module: str) -> dict:
+    """The cumulative import time in microseconds of module and of the
+    packages it imports, from python -X importtime.
+    """
+
+    stderr = _python("import " + module, "-X", "importtime").stderr
+    times = dict()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        if "." not in name or name.startswith("sbc_rest_client"):
+            times[name] = int(cumulative)
+    return times
+
+
+def test_interpreter_startup(benchmark):
+    benchmark.pedantic(_python, args=("pass",), rounds=10)
+
+
+def test_import_sbc(benchmark):
+    benchmark.pedantic(
+        _python, args=("import sbc_rest_client.sbc",), rounds=10
+    )
+    times = _import_times("sbc_rest_client.sbc")
+    benchmark.extra_info["import_time_us"] = times["sbc_rest_client.sbc"]
+    benchmark.extra_info["modules"] = times
+
+
+def test_import_does_not_load_heavy_modules():
+    loaded = _python(
+        "import sys, sbc_rest_client.sbc; print(*sys.modules)"
+    ).stdout.split()
+    assert not set(HEAVY_MODULES) & set(loaded)
+
+
+def test_lazy_constructor(benchmark):
+    sbc = benchmark(
+        Sbc, "admin", "admin", "sbc.example.com", lazy_login=True
+    )
+    # No session, no token
+    assert sbc._session is None and sbc._headers is None
@@ -0,0 +1,32 @@
+"""Fixtures for the benchmarks. The client talks to a local SbcSimulator."""
+
+import pytest
+
+from sbc_rest_client.simulator import SbcSimulator
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+@pytest.fixture(scope="module")
+def simulator():
+    """A simulator without added latency. Measures client overhead."""
+
+    with SbcSimulator(element_count=100) as simulator:
+        yield simulator
+
+
+@pytest.fixture(scope="module")
+def slow_simulator():
+    """A simulator with WAN-like latency. Measures concurrency."""
+
+    with SbcSimulator(latency=0.05, jitter=0.01, element_count=10) as simulator:
+        yield simulator
+
+
+@pytest.fixture(scope="module")
+def large_simulator():
+    """A simulator with a large configuration. Measures parsing and memory."""
+
+    with SbcSimulator(element_count=20000, attribute_count=30) as simulator:
+        yield simulator
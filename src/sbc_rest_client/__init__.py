@@ -12,8 +12,19 @@ Import example:
 
     sbc = Sbc("admin", "password", "sbc.your-domain.com")
 
+Messages are logged with the logging module, under the sbc_rest_client
+logger. Nothing is printed unless you configure logging, e.g.:
+
+    import logging
+
+    logging.basicConfig(level=logging.INFO)
+
 For usage examples see the README.md.
 """
 
+import logging
+
 __author__ = '139928764+p4irin@users.noreply.github.com'
-__version__ = '0.1.1'
\ No newline at end of file
+__version__ = '0.1.1'
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
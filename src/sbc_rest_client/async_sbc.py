@@ -0,0 +1,264 @@
+"""Provide an asyncio front end to the Sbc REST client.
+
+An AsyncSbc mirrors the Sbc API. Every call is delegated to a synchronous Sbc
+object and executed in a worker thread, so one event loop can drive hundreds
+of Session Border Controllers concurrently while each of them keeps its own
+pooled requests.Session.
+
+Example:
+
+    import asyncio
+    from sbc_rest_client.async_sbc import AsyncSbc, run_on_fleet_async
+
+    async def main():
+        sbcs = [AsyncSbc("admin", "password", host) for host in hosts]
+        roles = await run_on_fleet_async(
+            sbcs, lambda sbc: sbc.role, concurrency=50
+        )
+
+    asyncio.run(main())
+"""
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Iterable, Union
+
+from sbc_rest_client.kpis import GlobalSessionsSnapshot
+from sbc_rest_client.metadata import ElementTypeMetadata
+from sbc_rest_client.results import Result
+from sbc_rest_client.sbc import Sbc
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+# Set by run_on_fleet_async() so every AsyncSbc driven by the fleet helper
+# runs its blocking calls in a pool sized to the requested concurrency.
+_fleet_executor = contextvars.ContextVar("_fleet_executor", default=None)
+
+
+class AsyncSbc(object):
+    """Interact with the REST API of a Session Border Controller from asyncio.
+    """
+
+    def __init__(
+            self, user: str, passwd: str, host: str,
+            executor: Union[Executor, None] = None,
+            **kwargs: Any
+        ) -> None:
+
+        """Initialize an AsyncSbc object.
+
+        No network I/O is done here. An access token is acquired on the first
+        awaited call, or explicitly by awaiting _get_token(). It is refreshed
+        before it expires.
+
+        Args:
+            user: A user name with admin privileges.
+            passwd: The admin user password.
+            host: The hostname or ip-address of the Session Border Controller
+            executor: The executor to run blocking calls in. Defaults to the
+                pool of run_on_fleet_async() when called from there, or to the
+                event loop's default executor.
+            kwargs: Passed on to Sbc. E.g., api_version, request_timeout,
+                ssl_warnings and verify. Login is always lazy.
+        """
+        self.host = host
+        self._executor = executor
+        self._sbc = Sbc(user, passwd, host, lazy_login=True, **kwargs)
+
+    async def _run(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking callable in an executor thread."""
+
+        loop = asyncio.get_running_loop()
+        executor = self._executor or _fleet_executor.get()
+        return await loop.run_in_executor(
+            executor, functools.partial(func, *args, **kwargs)
+        )
+
+    async def _get_token(self) -> None:
+        """Get and set an access token, unless a valid one is set. See
+        Sbc._refresh_token()
+        """
+
+        await self._run(self._sbc._refresh_token)
+
+    def _call(self, name: str, *args: Any, **kwargs: Any) -> Awaitable[Any]:
+        """Call the Sbc method name in an executor thread."""
+
+        return self._run(getattr(self._sbc, name), *args, **kwargs)
+
+    def _property(self, name: str) -> Awaitable[Any]:
+        """Get the Sbc property name in an executor thread."""
+
+        return self._run(getattr, self._sbc, name)
+
+    @property
+    def role(self) -> Awaitable[Union[str, bool]]:
+        """Get the role of a Session Border Controller. See Sbc.role"""
+
+        return self._property("role")
+
+    def reboot(self) -> Awaitable[Result]:
+        """Reboot a Session Border Controller. See Sbc.reboot()"""
+
+        return self._call("reboot")
+
+    def switchover(self) -> Awaitable[Result]:
+        """Switch the active SBC in an HA setup. See Sbc.switchover()"""
+
+        return self._call("switchover")
+
+    @property
+    def supported_rest_api_versions(self) -> Awaitable["list[str]"]:
+        """Returns a list of supported API versions."""
+
+        return self._property("supported_rest_api_versions")
+
+    # Statistics
+
+    def kpi_snapshot(
+            self, max_age: Union[float, None] = None
+        ) -> Awaitable[GlobalSessionsSnapshot]:
+        """Get all global session KPIs at once. See Sbc.kpi_snapshot()"""
+
+        return self._call("kpi_snapshot", max_age)
+
+    @property
+    def global_cps(self) -> Awaitable[str]:
+        """Returns the global calls per second."""
+
+        return self._property("global_cps")
+
+    @property
+    def global_con_sessions(self) -> Awaitable[str]:
+        """Returns the global number of connected sessions."""
+
+        return self._property("global_con_sessions")
+
+    # Configuration
+
+    def config_element_types(self) -> Awaitable["list[str]"]:
+        """Get the supported element types. See Sbc.config_element_types()"""
+
+        return self._call("config_element_types")
+
+    def element_type_metadata(
+            self, element_type: str
+        ) -> Awaitable[ElementTypeMetadata]:
+        """Get the metadata of an element type.
+
+        See Sbc.element_type_metadata()
+        """
+
+        return self._call("element_type_metadata", element_type)
+
+    def prefetch_metadata(
+            self, element_types: "list[str]" = None, max_workers: int = 4
+        ) -> Awaitable[int]:
+        """Warm the metadata cache. See Sbc.prefetch_metadata()"""
+
+        return self._call("prefetch_metadata", element_types, max_workers)
+
+    def config_element_key_attributes(
+            self, element_type: str
+        ) -> Awaitable["list[str]"]:
+        """Get the key attributes of a configuration element.
+
+        See Sbc.config_element_key_attributes()
+        """
+
+        return self._call("config_element_key_attributes", element_type)
+
+    def get_config_elements(
+            self, element_type: str, key_attribs: str = None
+        ) -> Awaitable[Result]:
+        """Get one or more configuration element instances.
+
+        See Sbc.get_config_elements()
+        """
+
+        return self._call("get_config_elements", element_type, key_attribs)
+
+    def lock(self) -> Awaitable[Result]:
+        """Lock the configuration. See Sbc.lock()"""
+
+        return self._call("lock")
+
+    def unlock(self) -> Awaitable[Result]:
+        """Unlock the configuration. See Sbc.unlock()"""
+
+        return self._call("unlock")
+
+    def update_config_element(self, xml_str: str) -> Awaitable[Result]:
+        """Update a configuration element. See Sbc.update_config_element()"""
+
+        return self._call("update_config_element", xml_str)
+
+    def add_config_element(self, xml_str: str) -> Awaitable[Result]:
+        """Add a configuration element. See Sbc.add_config_element()"""
+
+        return self._call("add_config_element", xml_str)
+
+    def delete_config_element(
+            self, element_type: str, key_attribs: Union[str, None] = None
+        ) -> Awaitable[Result]:
+        """Delete a configuration element. See Sbc.delete_config_element()"""
+
+        return self._call("delete_config_element", element_type, key_attribs)
+
+    def activate_config(self) -> Awaitable[Result]:
+        """Activate the configuration. See Sbc.activate_config()"""
+
+        return self._call("activate_config")
+
+
+async def run_on_fleet_async(
+        sbcs: Iterable[AsyncSbc],
+        operation: Callable[[AsyncSbc], Awaitable[Any]],
+        concurrency: int = 32,
+        return_exceptions: bool = True
+    ) -> "list[Any]":
+    """Run the same operation on many Session Border Controllers.
+
+    The asyncio counterpart of fleet.run_on_fleet().
+
+    At most concurrency operations are in flight at any time. The blocking
+    calls of AsyncSbc objects without an executor of their own run in a
+    thread pool of the same size, so a fleet sweep takes about as long as the
+    slowest host per batch instead of the sum of all hosts.
+
+    Args:
+        sbcs: The AsyncSbc objects to run the operation on.
+        operation: A callable that takes an AsyncSbc and returns an
+            awaitable. E.g., lambda sbc: sbc.role
+        concurrency: The maximum number of hosts handled at the same time.
+        return_exceptions: Return exceptions in the result list instead of
+            raising the first one.
+
+    Returns:
+        A list of results, in the order of sbcs.
+    """
+
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    semaphore = asyncio.Semaphore(concurrency)
+    executor = ThreadPoolExecutor(
+        max_workers=concurrency, thread_name_prefix="sbc-fleet"
+    )
+
+    async def _run_one(sbc: AsyncSbc) -> Any:
+        async with semaphore:
+            return await operation(sbc)
+
+    token = _fleet_executor.set(executor)
+    try:
+        return await asyncio.gather(
+            *(_run_one(sbc) for sbc in sbcs),
+            return_exceptions=return_exceptions
+        )
+    finally:
+        _fleet_executor.reset(token)
+        executor.shutdown(wait=False)
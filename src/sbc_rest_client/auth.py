@@ -0,0 +1,79 @@
+"""Keep track of the lifetime of SBC REST API access tokens.
+
+An access token is valid for 10 minutes. The TokenManager records when a
+token was issued so the Sbc class can get a fresh one shortly before it
+expires, instead of failing API calls the moment it does. The token and the
+time it was issued are kept as one tuple, so threads reading them while
+another thread sets a new token see a consistent pair.
+"""
+
+import time
+from typing import Union
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+class TokenManager(object):
+    """Record an access token and tell when it needs to be refreshed."""
+
+    def __init__(self, lifetime: float = 600, refresh_margin: float = 60
+                 ) -> None:
+        """Initialize a TokenManager object.
+
+        Args:
+            lifetime: The number of seconds a token is valid after it was
+                issued. The SBC issues tokens that are valid for 10 minutes.
+            refresh_margin: The number of seconds before expiry at which a
+                token is considered due for a refresh.
+        """
+
+        if refresh_margin >= lifetime:
+            raise ValueError("refresh_margin must be smaller than lifetime")
+        self.lifetime = lifetime
+        self.refresh_margin = refresh_margin
+        # (token, issued_at) or None
+        self._state = None
+
+    @property
+    def token(self) -> Union[str, None]:
+        """The current access token or None if there is none."""
+
+        state = self._state
+        return state[0] if state else None
+
+    @property
+    def issued_at(self) -> Union[float, None]:
+        """The time.monotonic() timestamp the current token was issued at."""
+
+        state = self._state
+        return state[1] if state else None
+
+    @property
+    def expires_in(self) -> float:
+        """The number of seconds until the current token expires.
+
+        Zero if there is no token or it already expired.
+        """
+
+        state = self._state
+        if state is None:
+            return 0.0
+        remaining = state[1] + self.lifetime - time.monotonic()
+        return max(remaining, 0.0)
+
+    @property
+    def needs_refresh(self) -> bool:
+        """True if there is no token or it is about to expire."""
+
+        return self.expires_in <= self.refresh_margin
+
+    def set(self, token: str) -> None:
+        """Record a freshly issued token."""
+
+        self._state = (token, time.monotonic())
+
+    def invalidate(self) -> None:
+        """Forget the current token, e.g., after a 401 Unauthorized."""
+
+        self._state = None
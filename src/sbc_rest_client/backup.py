@@ -0,0 +1,562 @@
+"""Back up the configuration of an SBC to a compact, indexed archive.
+
+export_config() lists the element types of an SBC, streams the running
+configuration elements of several element types at the same time over the
+pooled session of the Sbc object and writes them to one of these archives,
+picked by the extension of the path:
+
+- .sqlite or .db: a SQLite database with a row per configuration element,
+  keyed by element type and key attributes. The XML of every element is
+  compressed with zlib, with a preset dictionary per element type. Elements
+  of a type look alike, so they compress almost as well as a whole bundle
+  while every row can still be decompressed on its own.
+- .xml.gz or .xml.zst: an XML bundle. Decompressed, it is one configElements
+  document that ConfigElement.iter_xml() reads. Every element type is a
+  separate gzip member or zstd frame, and a JSON index next to the bundle,
+  <path>.index, holds where every element type and element is. zstd
+  requires the zstandard package.
+
+Both are written to a temporary file first and renamed when complete, so a
+failed backup never replaces a good one. ConfigArchive reads either of them
+and looks up single elements without decompressing or parsing the rest of
+the archive.
+
+Example:
+
+    from sbc_rest_client.backup import ConfigArchive, export_config
+
+    result = export_config(sbc, "backups/sbc1.sqlite")
+    print(result)
+
+    with ConfigArchive("backups/sbc1.sqlite") as archive:
+        print(archive.get("session-agent", "&hostname=sa1.example.com"))
+"""
+
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Tuple, Union
+
+from lxml import etree
+
+from sbc_rest_client.elements import ConfigElement
+from sbc_rest_client.metadata import ElementTypeMetadata
+from sbc_rest_client.results import Result
+from sbc_rest_client.sbc import Sbc
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+logger = logging.getLogger(__name__)
+
+
+FORMAT_VERSION = 1
+
+_BUNDLE_HEADER = b'<?xml version="1.0" encoding="UTF-8"?>\n<configElements>\n'
+_BUNDLE_FOOTER = b"</configElements>\n"
+
+# (key_attribs, XML) of the elements of one element type
+Elements = List[Tuple[str, bytes]]
+
+
+def archive_format(path: str) -> str:
+    """The archive format of a path, from its extension.
+
+    Returns:
+        sqlite, gzip or zstd
+
+    Raises:
+        ValueError: The extension is not one of .sqlite, .db, .gz or .zst
+    """
+
+    name = path.lower()
+    if name.endswith((".sqlite", ".sqlite3", ".db")):
+        return "sqlite"
+    if name.endswith(".gz"):
+        return "gzip"
+    if name.endswith(".zst"):
+        return "zstd"
+    raise ValueError(
+        "Unknown archive format of {}. Use .sqlite, .db, .xml.gz or "
+        ".xml.zst".format(path)
+    )
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(
+            "zstd archives require zstandard. pip install zstandard"
+        ) from None
+    return zstandard
+
+
+def _fetch(sbc: Sbc, element_type: str
+           ) -> Tuple[str, Union[ElementTypeMetadata, None],
+                      Union[Elements, None], Union[str, None]]:
+    """Get the running elements of element_type as (key_attribs, XML).
+
+    Runs in a worker thread. Failures are returned, not raised, so one
+    element type can not fail a whole backup.
+    """
+
+    try:
+        metadata = sbc.element_type_metadata(element_type)
+        elements = [
+            (
+                ConfigElement.from_node(node, metadata).key_attribs(),
+                etree.tostring(node, encoding="UTF-8", xml_declaration=False,
+                               with_tail=False)
+            )
+            for node in sbc.iter_config_elements(element_type)
+        ]
+    except Exception as e:
+        return element_type, None, None, repr(e)
+    return element_type, metadata, elements, None
+
+
+def export_config(
+        sbc: Sbc, path: str,
+        element_types: Union["list[str]", None] = None,
+        max_workers: int = 8, level: Union[int, None] = None
+    ) -> Result:
+    """Back up the running configuration of an SBC to an archive.
+
+    Args:
+        sbc: The Sbc object of the SBC.
+        path: The archive to write. Its extension picks the format, see
+            archive_format(). An existing archive is replaced when the
+            backup is complete.
+        element_types: The element types to back up. Defaults to every
+            element type supported by the SBC.
+        max_workers: The number of element types fetched at the same time.
+            Keep it at or below the pool_maxsize of the Sbc object.
+        level: The compression level. Defaults to 6 for zlib and gzip and
+            to 3 for zstd.
+
+    Returns:
+        A Result. It is falsy if any element type could not be fetched; the
+        other element types are archived anyway. Its value maps element
+        types to the number of elements archived.
+
+    Raises:
+        requests.exceptions.RequestException: The element types could not
+            be listed.
+    """
+
+    start = time.perf_counter()
+    fmt = archive_format(path)
+    if element_types is None:
+        element_types = sbc.config_element_types()
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "host": sbc.host,
+        "software_version": sbc.software_version,
+        "api_version": sbc.api_version,
+        "created": time.time(),
+    }
+    if fmt == "sqlite":
+        writer = _SqliteWriter(path, level)
+    else:
+        writer = _BundleWriter(path, fmt, level)
+    counts: Dict[str, int] = dict()
+    errors: Dict[str, str] = dict()
+    try:
+        with ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="sbc-backup"
+                ) as executor:
+            # In the order of element_types, so archives are reproducible
+            for element_type, metadata, elements, error in executor.map(
+                    lambda element_type: _fetch(sbc, element_type),
+                    element_types):
+                if error is not None:
+                    logger.error("%s: Failed to export %s: %s",
+                                 sbc.host, element_type, error)
+                    errors[element_type] = error
+                    continue
+                writer.add(metadata, elements)
+                counts[element_type] = len(elements)
+        meta["errors"] = errors
+        writer.commit(meta)
+    except BaseException:
+        writer.abort()
+        raise
+    result = Result(
+        "Export config.", not errors, elapsed=time.perf_counter() - start,
+        error="Failed element types: {}".format(", ".join(errors))
+        if errors else None,
+        value=counts
+    )
+    logger.info("%s: %s %d elements of %d element types to %s", sbc.host,
+                result, sum(counts.values()), len(counts), path)
+    return result
+
+
+def _zdict(elements: Elements, size: int = 32768) -> bytes:
+    """A zlib preset dictionary for the elements of one element type.
+
+    A sample of elements, spread over the element type, up to size bytes,
+    the most zlib uses. The last bytes of a dictionary matter most to zlib,
+    so the first element goes last.
+    """
+
+    if not elements:
+        return b""
+    step = max(1, len(elements) // 16)
+    parts = list()
+    total = 0
+    for _, xml in elements[::step]:
+        if total + len(xml) > size:
+            break
+        parts.append(xml)
+        total += len(xml)
+    return b"".join(reversed(parts))[-size:]
+
+
+class _SqliteWriter(object):
+    """Write an archive as a SQLite database."""
+
+    def __init__(self, path: str, level: Union[int, None]) -> None:
+        self.path = path
+        self.level = 6 if level is None else level
+        self._tmp = path + ".tmp"
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+        self._db = sqlite3.connect(self._tmp)
+        # A crash leaves only the temporary file behind, so the journal
+        # buys nothing here
+        self._db.execute("PRAGMA journal_mode = OFF")
+        self._db.execute("PRAGMA synchronous = OFF")
+        self._db.executescript("""
+            CREATE TABLE meta (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE element_types (
+                element_type TEXT PRIMARY KEY,
+                attributes TEXT NOT NULL,
+                key_attributes TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                zdict BLOB NOT NULL
+            );
+            CREATE TABLE elements (
+                element_type TEXT NOT NULL,
+                key_attribs TEXT NOT NULL,
+                xml BLOB NOT NULL
+            );
+        """)
+
+    def add(self, metadata: ElementTypeMetadata, elements: Elements) -> None:
+        element_type = metadata.element_type
+        zdict = _zdict(elements)
+        compressor = zlib.compressobj(self.level, zdict=zdict)
+        rows = list()
+        for key_attribs, xml in elements:
+            # Copies of a compressor primed with the dictionary are cheaper
+            # than priming a new one for every element
+            c = compressor.copy()
+            rows.append(
+                (element_type, key_attribs, c.compress(xml) + c.flush())
+            )
+        with self._db:
+            self._db.execute(
+                "INSERT INTO element_types VALUES (?, ?, ?, ?, ?)",
+                (element_type, json.dumps(metadata.attributes),
+                 json.dumps(metadata.key_attributes), len(elements), zdict)
+            )
+            self._db.executemany("INSERT INTO elements VALUES (?, ?, ?)", rows)
+
+    def commit(self, meta: dict) -> None:
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO meta VALUES (?, ?)",
+                [(name, json.dumps(value)) for name, value in meta.items()]
+            )
+            # Indexed once at the end, not on every insert
+            self._db.execute(
+                "CREATE INDEX elements_key "
+                "ON elements (element_type, key_attribs)"
+            )
+        self._db.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self) -> None:
+        self._db.close()
+        os.remove(self._tmp)
+
+
+class _BundleWriter(object):
+    """Write an archive as a gzip or zstd XML bundle with a JSON index."""
+
+    def __init__(self, path: str, fmt: str, level: Union[int, None]) -> None:
+        self.path = path
+        self.format = fmt
+        if fmt == "zstd":
+            self._compressor = _zstandard().ZstdCompressor(
+                level=3 if level is None else level
+            )
+            self._compress = self._compressor.compress
+        else:
+            level = 6 if level is None else level
+            self._compress = lambda data: gzip.compress(
+                data, compresslevel=level, mtime=0
+            )
+        self._tmp = path + ".tmp"
+        self._file = open(self._tmp, "wb")
+        self._index: Dict[str, dict] = dict()
+        self._frame(_BUNDLE_HEADER)
+
+    def _frame(self, data: bytes) -> Tuple[int, int]:
+        """Write data as one gzip member or zstd frame.
+
+        Returns:
+            The offset and length of the compressed frame in the file.
+        """
+
+        frame = self._compress(data)
+        offset = self._file.tell()
+        self._file.write(frame)
+        return offset, len(frame)
+
+    def add(self, metadata: ElementTypeMetadata, elements: Elements) -> None:
+        # Where every element is in the decompressed frame
+        positions = list()
+        parts = list()
+        position = 0
+        for key_attribs, xml in elements:
+            positions.append((key_attribs, position, len(xml)))
+            parts.append(xml)
+            parts.append(b"\n")
+            position += len(xml) + 1
+        offset, length = self._frame(b"".join(parts))
+        self._index[metadata.element_type] = {
+            "offset": offset,
+            "length": length,
+            "attributes": metadata.attributes,
+            "key_attributes": metadata.key_attributes,
+            "elements": positions,
+        }
+
+    def commit(self, meta: dict) -> None:
+        self._frame(_BUNDLE_FOOTER)
+        self._file.close()
+        index = dict(meta, format=self.format, element_types=self._index)
+        with open(self._tmp + ".index", "w") as f:
+            json.dump(index, f, separators=(",", ":"))
+        os.replace(self._tmp, self.path)
+        os.replace(self._tmp + ".index", self.path + ".index")
+
+    def abort(self) -> None:
+        self._file.close()
+        os.remove(self._tmp)
+
+
+class ConfigArchive(object):
+    """Read an archive written by export_config().
+
+    Looking up an element reads one row of a SQLite archive, or decompresses
+    only the frame of its element type in a bundle.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Open an archive.
+
+        Args:
+            path: The archive. Its extension tells the format, see
+                archive_format().
+        """
+
+        self.path = path
+        self.format = archive_format(path)
+        self._db = None
+        self._file = None
+        self._metadata: Dict[str, ElementTypeMetadata] = dict()
+        # The most recently decompressed bundle frame
+        self._frame: Tuple[Union[str, None], bytes] = (None, b"")
+        # Per element type of a bundle: key_attribs -> [(start, length)],
+        # in archive order. Elements without key attributes share a key.
+        self._positions: Dict[str, Dict[str, List[Tuple[int, int]]]] = \
+            dict()
+        if self.format == "sqlite":
+            self._db = sqlite3.connect(
+                "file:{}?mode=ro".format(path), uri=True
+            )
+            self.meta = {
+                name: json.loads(value) for name, value in
+                self._db.execute("SELECT name, value FROM meta")
+            }
+            self._counts = dict()
+            self._zdicts: Dict[str, bytes] = dict()
+            for element_type, attributes, key_attributes, count, zdict in \
+                    self._db.execute("SELECT * FROM element_types"):
+                self._metadata[element_type] = ElementTypeMetadata(
+                    element_type, json.loads(attributes),
+                    json.loads(key_attributes)
+                )
+                self._counts[element_type] = count
+                self._zdicts[element_type] = zdict
+        else:
+            with open(path + ".index") as f:
+                index = json.load(f)
+            self._index = index.pop("element_types")
+            self.meta = index
+            for element_type, entry in self._index.items():
+                self._metadata[element_type] = ElementTypeMetadata(
+                    element_type, entry["attributes"],
+                    entry["key_attributes"]
+                )
+            if self.format == "zstd":
+                self._decompress = \
+                    _zstandard().ZstdDecompressor().decompress
+            else:
+                self._decompress = gzip.decompress
+            self._file = open(path, "rb")
+
+    def element_types(self) -> "list[str]":
+        """The element types in the archive."""
+
+        return list(self._metadata)
+
+    def metadata(self, element_type: str) -> ElementTypeMetadata:
+        """The metadata of an element type at the time of the backup.
+
+        Raises:
+            KeyError: The element type is not in the archive.
+        """
+
+        return self._metadata[element_type]
+
+    def count(self, element_type: str) -> int:
+        """The number of elements of an element type in the archive."""
+
+        if self._db is not None:
+            return self._counts.get(element_type, 0)
+        entry = self._index.get(element_type)
+        return len(entry["elements"]) if entry else 0
+
+    def __len__(self) -> int:
+        return sum(self.count(element_type) for element_type in self._metadata)
+
+    def keys(self, element_type: str) -> "list[str]":
+        """The key attributes of the elements of an element type, as query
+        parameters, in archive order. E.g., &hostname=sa1.example.com
+        """
+
+        if self._db is not None:
+            return [
+                key_attribs for key_attribs, in self._db.execute(
+                    "SELECT key_attribs FROM elements WHERE element_type = ? "
+                    "ORDER BY rowid", (element_type,)
+                )
+            ]
+        entry = self._index.get(element_type)
+        return [key for key, _, _ in entry["elements"]] if entry else []
+
+    def _inflate(self, element_type: str, data: bytes) -> bytes:
+        """Decompress the XML of an element in a SQLite archive."""
+
+        d = zlib.decompressobj(zdict=self._zdicts[element_type])
+        return d.decompress(data) + d.flush()
+
+    def _bundle_frame(self, element_type: str) -> Union[bytes, None]:
+        cached_type, data = self._frame
+        if cached_type == element_type:
+            return data
+        entry = self._index.get(element_type)
+        if entry is None:
+            return None
+        self._file.seek(entry["offset"])
+        data = self._decompress(self._file.read(entry["length"]))
+        self._frame = (element_type, data)
+        return data
+
+    def xml(self, element_type: str, key_attribs: str = ""
+            ) -> Union[bytes, None]:
+        """The XML of one element.
+
+        Args:
+            element_type: The element type. E.g., session-agent
+            key_attribs: The key attributes as query parameters, as returned
+                by keys() and ConfigElement.key_attribs(). Empty for
+                singletons.
+
+        Returns:
+            The configElement XML, or None if the element is not in the
+            archive. If several elements have the same key attributes,
+            e.g., elements of a type without key attributes, the first one.
+            See elements() for all of them.
+        """
+
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT xml FROM elements "
+                "WHERE element_type = ? AND key_attribs = ? "
+                "ORDER BY rowid LIMIT 1",
+                (element_type, key_attribs)
+            ).fetchone()
+            return self._inflate(element_type, row[0]) if row else None
+        positions = self._positions.get(element_type)
+        if positions is None:
+            entry = self._index.get(element_type)
+            if entry is None:
+                return None
+            positions = dict()
+            for key, start, length in entry["elements"]:
+                positions.setdefault(key, list()).append((start, length))
+            self._positions[element_type] = positions
+        if key_attribs not in positions:
+            return None
+        start, length = positions[key_attribs][0]
+        return self._bundle_frame(element_type)[start:start + length]
+
+    def get(self, element_type: str, key_attribs: str = ""
+            ) -> Union[ConfigElement, None]:
+        """One element as a ConfigElement, or None. See xml()"""
+
+        xml = self.xml(element_type, key_attribs)
+        if xml is None:
+            return None
+        return ConfigElement.from_xml(xml, self._metadata[element_type])
+
+    def elements(self, element_type: str) -> Iterator[ConfigElement]:
+        """All elements of an element type as ConfigElements."""
+
+        metadata = self._metadata.get(element_type)
+        if self._db is not None:
+            for xml, in self._db.execute(
+                    "SELECT xml FROM elements WHERE element_type = ? "
+                    "ORDER BY rowid", (element_type,)):
+                yield ConfigElement.from_xml(
+                    self._inflate(element_type, xml), metadata
+                )
+            return
+        data = self._bundle_frame(element_type)
+        if data is None:
+            return
+        for _, start, length in self._index[element_type]["elements"]:
+            yield ConfigElement.from_xml(data[start:start + length], metadata)
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self) -> "ConfigArchive":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return "{cls}({path!r}, host={host!r}, element_types={n})".format(
+            cls=type(self).__name__, path=self.path,
+            host=self.meta.get("host"), n=len(self._metadata)
+        )
@@ -0,0 +1,255 @@
+"""sbcctl, run Sbc calls on many SBCs from the command line.
+
+Every subcommand wraps a method or property of Sbc and runs on every host
+given with --host or in an --inventory file, up to --max-workers hosts at
+the same time. A JSON object per host is printed as soon as the host
+finishes:
+
+    {"host": "sbc1.example.com", "ok": true, "value": "active",
+     "elapsed": 0.041}
+
+Calls that return a Result add its status_code, reason and error. The exit
+status is 0 if every host succeeded and 1 otherwise. The credentials are
+taken from SBC_USER and SBC_PASSWORD in the environment.
+
+Examples:
+
+    $ sbcctl --inventory sbcs.txt role
+    $ sbcctl -H sbc1.example.com -H sbc2.example.com kpis
+    $ sbcctl --inventory sbcs.txt --max-workers 100 get session-agent
+    $ sbcctl --inventory sbcs.txt --daemon role
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+from sbc_rest_client.inventory import jsonable, read_inventory
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+# subcommand: (Sbc method or property, positional arguments, help).
+# Arguments named file are read and passed on as the content of the file.
+COMMANDS: Dict[str, Tuple[str, Tuple[str, ...], str]] = {
+    "role": ("role", (), "Get the role"),
+    "versions": (
+        "supported_rest_api_versions", (), "Get the supported API versions"
+    ),
+    "global-cps": ("global_cps", (), "Get the global calls per second"),
+    "global-con-sessions": (
+        "global_con_sessions", (),
+        "Get the global number of connected sessions"
+    ),
+    "kpis": ("kpi_snapshot", (), "Get all global session KPIs"),
+    "element-types": (
+        "config_element_types", (), "Get the configuration element types"
+    ),
+    "key-attributes": (
+        "config_element_key_attributes", ("element_type",),
+        "Get the key attributes of an element type"
+    ),
+    "get": (
+        "get_config_elements", ("element_type", "key_attribs?"),
+        "Get configuration elements. key_attribs like &name=value"
+    ),
+    "lock": ("lock", (), "Lock the configuration"),
+    "unlock": ("unlock", (), "Unlock the configuration"),
+    "update": (
+        "update_config_element", ("file",),
+        "Update a configuration element from an XML file"
+    ),
+    "add": (
+        "add_config_element", ("file",),
+        "Add a configuration element from an XML file"
+    ),
+    "delete": (
+        "delete_config_element", ("element_type", "key_attribs?"),
+        "Delete configuration elements. key_attribs like &name=value"
+    ),
+    "activate": (
+        "activate_config", (), "Verify, save and activate the configuration"
+    ),
+    "switchover": ("switchover", (), "Execute an HA switchover"),
+    "reboot": ("reboot", (), "Reboot"),
+}
+
+
+def host_record(host: str, value: Any, elapsed: float) -> dict:
+    """The JSON object printed for a host."""
+
+    from sbc_rest_client.results import Result
+
+    record = {"host": host}
+    if isinstance(value, Exception):
+        record.update(ok=False, error=repr(value))
+    elif isinstance(value, Result):
+        record.update(
+            ok=value.ok, status_code=value.status_code, reason=value.reason,
+            error=value.error, value=jsonable(value.value)
+        )
+    else:
+        # Sbc.role returns False if the call failed
+        record.update(ok=value is not False, value=jsonable(value))
+    record["elapsed"] = round(elapsed, 3)
+    return record
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="sbcctl",
+        description="Run SBC REST API calls on many SBCs in parallel. The "
+        "credentials are read from SBC_USER and SBC_PASSWORD.",
+    )
+    parser.add_argument(
+        "-H", "--host", action="append", default=[], dest="hosts",
+        help="An SBC hostname. Repeat for more hosts"
+    )
+    parser.add_argument(
+        "-i", "--inventory",
+        help="A file with SBC hostnames, one per line"
+    )
+    parser.add_argument(
+        "-j", "--max-workers", type=int, default=32,
+        help="The maximum number of hosts handled at the same time"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=10,
+        help="The timeout of every API call, in seconds"
+    )
+    parser.add_argument(
+        "--api-version", default="v1.1", help="The REST API version"
+    )
+    parser.add_argument(
+        "--scheme", default="https", choices=("https", "http"),
+        help="Use http to talk to an sbc-simulator"
+    )
+    parser.add_argument(
+        "--no-verify", action="store_true",
+        help="Disable verification of the SBC certificates"
+    )
+    parser.add_argument(
+        "--daemon", nargs="?", const="", default=None, metavar="SOCKET",
+        help="Send the calls through a running sbc-daemon, on its default "
+        "socket or on SOCKET"
+    )
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+    for name, (_, arguments, description) in COMMANDS.items():
+        command = commands.add_parser(
+            name, help=description, description=description
+        )
+        for argument in arguments:
+            if argument.endswith("?"):
+                command.add_argument(argument[:-1], nargs="?", default=None)
+            else:
+                command.add_argument(argument)
+    return parser
+
+
+def _call_args(args: argparse.Namespace) -> list:
+    """The positional arguments of the Sbc call of the subcommand."""
+
+    call_args = list()
+    for argument in COMMANDS[args.command][1]:
+        value = getattr(args, argument.rstrip("?"))
+        if argument == "file":
+            with open(value) as f:
+                value = f.read()
+        call_args.append(value)
+    # Leave out trailing optional arguments that were not given
+    while call_args and call_args[-1] is None:
+        call_args.pop()
+    return call_args
+
+
+def main(argv: Union[List[str], None] = None) -> int:
+    """The entry point of the sbcctl console script."""
+
+    parser = _parser()
+    args = parser.parse_args(argv)
+
+    hosts = list(args.hosts)
+    if args.inventory:
+        hosts += read_inventory(args.inventory)
+    # Each host once, in the order given
+    hosts = list(dict.fromkeys(hosts))
+    if not hosts:
+        parser.error("no SBC hosts given, use --host or --inventory")
+    if args.max_workers < 1:
+        parser.error("--max-workers must be at least 1")
+    user = os.environ.get("SBC_USER")
+    passwd = os.environ.get("SBC_PASSWORD")
+    if not user or not passwd:
+        parser.error("set SBC_USER and SBC_PASSWORD in the environment")
+    try:
+        call_args = _call_args(args)
+    except OSError as e:
+        parser.error(str(e))
+
+    call = COMMANDS[args.command][0]
+    options = dict(
+        api_version=args.api_version, request_timeout=args.timeout,
+        scheme=args.scheme
+    )
+    if args.no_verify:
+        options.update(verify=False, ssl_warnings=False)
+
+    if args.daemon is not None:
+        from sbc_rest_client.daemon import DaemonClient
+
+        client = DaemonClient(args.daemon or None)
+        if not client.available():
+            parser.error("no sbc-daemon serving on {}".format(client.path))
+
+        def run(host: str) -> Any:
+            return client.call(
+                host, user, passwd, call, *call_args, options=options
+            )
+    else:
+        from sbc_rest_client.sbc import Sbc
+
+        is_property = isinstance(getattr(Sbc, call), property)
+
+        def run(host: str) -> Any:
+            sbc = Sbc(user, passwd, host, lazy_login=True, **options)
+            if is_property:
+                return getattr(sbc, call)
+            return getattr(sbc, call)(*call_args)
+
+    return _run_on_hosts(run, hosts, args.max_workers)
+
+
+def _run_on_hosts(run: Callable[[str], Any], hosts: List[str],
+                  max_workers: int) -> int:
+    """Run on every host and print a JSON line per host as it finishes.
+
+    Returns:
+        The exit status. 0 if every host succeeded, 1 otherwise.
+    """
+
+    from sbc_rest_client.fleet import FleetExecutor
+
+    def timed(host: str) -> Tuple[Any, float]:
+        start = time.perf_counter()
+        try:
+            value = run(host)
+        except Exception as e:
+            value = e
+        return value, time.perf_counter() - start
+
+    failed = 0
+    with FleetExecutor(min(max_workers, len(hosts))) as fleet:
+        for host, (value, elapsed) in fleet.as_completed(timed, hosts):
+            record = host_record(host, value, elapsed)
+            failed += not record["ok"]
+            print(json.dumps(record), flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
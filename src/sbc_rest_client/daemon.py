@@ -0,0 +1,522 @@
+"""Keep Sbc objects warm for short-lived scripts.
+
+A short script pays for starting Python, importing requests and lxml,
+setting up a TLS connection and logging in, just to read a role or a KPI.
+An SbcDaemon keeps Sbc objects, with their access tokens and pooled
+connections, alive in a background process and serves their API calls over
+a Unix socket. DaemonClient sends calls to it. It only imports modules of
+the standard library, so a script that talks to the daemon starts fast.
+
+The protocol is a JSON object per line. A request names the SBC, the
+credentials and the call:
+
+    {"host": "sbc1.example.com", "user": "admin", "passwd": "...",
+     "call": "role", "args": [], "kwargs": {}, "options": {}}
+
+and gets back:
+
+    {"ok": true, "value": "active"}
+
+Results of calls that return a Result come back as a Result. The socket is
+only accessible to the user that started the daemon, in a directory only
+that user can access. DaemonClient refuses to send credentials over a
+socket that belongs to another user.
+
+All processes that send their calls through one daemon share its rate
+limits, and their concurrent reads of the same SBC share one API call, see
+sbc_rest_client.singleflight. Start it with rate limits, see
+sbc_rest_client.ratelimit, to keep the load on every SBC in check however
+many scripts run at the same time.
+
+Example:
+
+    $ sbc-daemon --idle-timeout 900 &
+
+    from sbc_rest_client.daemon import DaemonClient
+
+    client = DaemonClient()
+    print(client.call("sbc1.example.com", "admin", "password", "role"))
+    if client.call("sbc1.example.com", "admin", "password", "lock"):
+        ...
+"""
+
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import struct
+import sys
+import tempfile
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple, Union
+
+from sbc_rest_client.inventory import jsonable
+
+if TYPE_CHECKING:
+    from sbc_rest_client.sbc import Sbc
+    from sbc_rest_client.singleflight import SingleFlight
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+logger = logging.getLogger(__name__)
+
+
+# The Sbc methods and properties the daemon serves
+CALLS = frozenset((
+    "role", "supported_rest_api_versions", "global_cps",
+    "global_con_sessions", "kpi_snapshot", "config_element_types",
+    "element_type_metadata", "config_element_key_attributes",
+    "get_config_elements", "lock", "unlock", "update_config_element",
+    "add_config_element", "delete_config_element", "activate_config",
+    "reboot", "switchover",
+))
+
+
+def default_socket_path() -> str:
+    """The socket path of the current user.
+
+    In $XDG_RUNTIME_DIR if it is set, otherwise in a directory of the user
+    in the temporary directory. The daemon creates that directory, only the
+    user has access to it.
+    """
+
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "sbc_rest_client.sock")
+    return os.path.join(
+        tempfile.gettempdir(), "sbc_rest_client-{}".format(os.getuid()),
+        "daemon.sock"
+    )
+
+
+def private_directory(path: str) -> str:
+    """Create directory path, only accessible to the current user, unless
+    it exists.
+
+    Raises:
+        DaemonError: path exists but is not a directory, belongs to another
+            user or is accessible to others. Someone may be waiting for
+            credentials on a socket in there.
+    """
+
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(path)
+    if (not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid()
+            or st.st_mode & 0o077):
+        raise DaemonError(
+            "{} is not a directory only the current user can access".format(
+                path
+            )
+        )
+    return path
+
+
+def _check_owner(path: str) -> None:
+    """Raise DaemonError if the socket at path belongs to another user."""
+
+    if os.stat(path).st_uid != os.getuid():
+        raise DaemonError(
+            "{} belongs to another user, not sending to it".format(path)
+        )
+
+
+def _check_peer(sock: socket.socket) -> None:
+    """Raise DaemonError if the process at the other end of sock runs as
+    another user. Only where SO_PEERCRED is available, e.g., Linux.
+    """
+
+    if not hasattr(socket, "SO_PEERCRED"):
+        return
+    credentials = sock.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+    )
+    _, uid, _ = struct.unpack("3i", credentials)
+    if uid != os.getuid():
+        raise DaemonError("The daemon runs as another user, not sending to it")
+
+
+class DaemonError(Exception):
+    """The daemon could not run a call. E.g., the SBC refused the login."""
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self) -> None:
+        # A connection may send several requests, one per line
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = self.server.sbc_daemon.handle(line)
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(self, path: str, daemon: "SbcDaemon") -> None:
+        self.sbc_daemon = daemon
+        # Only the owner may connect. The socket is created with these
+        # permissions, there is no window in which others could
+        umask = os.umask(0o177)
+        try:
+            super().__init__(path, _Handler)
+        finally:
+            os.umask(umask)
+
+    def service_actions(self) -> None:
+        if self.sbc_daemon.idle:
+            logger.info("Idle for %s seconds, shutting down",
+                        self.sbc_daemon.idle_timeout)
+            # shutdown() waits for serve_forever() to return, so it can not
+            # be called from the thread that runs it
+            threading.Thread(target=self.shutdown, daemon=True).start()
+
+
+class SbcDaemon(object):
+    """Serve API calls of cached Sbc objects over a Unix socket."""
+
+    def __init__(self, path: Union[str, None] = None,
+                 idle_timeout: float = 0,
+                 limiter_kwargs: Union[dict, None] = None,
+                 single_flight: Union["SingleFlight", None] = None,
+                 **sbc_kwargs) -> None:
+        """Initialize an SbcDaemon object.
+
+        Args:
+            path: The path of the Unix socket. Defaults to
+                default_socket_path(), its directory is created by
+                serve_forever() if needed.
+            idle_timeout: Stop serving after this many seconds without a
+                request, counted from when the last call finished. Never
+                while calls are running. 0 serves until stopped.
+            limiter_kwargs: Limit the API calls to every SBC with a
+                HostLimiter created with these arguments, shared by all Sbc
+                objects for the SBC. None does not limit them.
+            single_flight: The SingleFlight shared by all Sbc objects.
+                Defaults to one that does not cache.
+            sbc_kwargs: Passed on to every Sbc object, e.g.,
+                verify=False. Requests add to them with their options.
+        """
+
+        self.path = path or default_socket_path()
+        self._default_path = path is None
+        self.idle_timeout = idle_timeout
+        self.limiter_kwargs = limiter_kwargs
+        if single_flight is None:
+            from sbc_rest_client.singleflight import SingleFlight
+            single_flight = SingleFlight()
+        self.single_flight = single_flight
+        self.sbc_kwargs = sbc_kwargs
+        self._sbcs: Dict[Tuple[str, str, str, str], "Sbc"] = dict()
+        self._lock = threading.Lock()
+        self._last_request = time.monotonic()
+        # The number of requests being handled
+        self._in_flight = 0
+        self._server = None
+
+    @property
+    def idle(self) -> bool:
+        with self._lock:
+            return bool(self.idle_timeout) and not self._in_flight and (
+                time.monotonic() - self._last_request > self.idle_timeout
+            )
+
+    def sbc(self, host: str, user: str, passwd: str,
+            options: Union[dict, None] = None) -> "Sbc":
+        """The cached Sbc object for host, credentials and options.
+
+        Created on first use, with lazy_login=True.
+        """
+
+        from sbc_rest_client.sbc import Sbc
+
+        options = dict(self.sbc_kwargs, **(options or {}))
+        key = (host, user, passwd, json.dumps(options, sort_keys=True))
+        sbc = self._sbcs.get(key)
+        if sbc is None:
+            with self._lock:
+                sbc = self._sbcs.get(key)
+                if sbc is None:
+                    options.setdefault("lazy_login", True)
+                    options["single_flight"] = self.single_flight
+                    if self.limiter_kwargs is not None:
+                        from sbc_rest_client.ratelimit import shared_limiter
+                        options["limiter"] = shared_limiter(
+                            host, **self.limiter_kwargs
+                        )
+                    sbc = Sbc(user, passwd, host, **options)
+                    self._sbcs[key] = sbc
+        return sbc
+
+    def handle(self, line: bytes) -> dict:
+        """Run the request on a line and return the response."""
+
+        with self._lock:
+            self._in_flight += 1
+        try:
+            return self._handle(line)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._last_request = time.monotonic()
+
+    def _handle(self, line: bytes) -> dict:
+        from sbc_rest_client.results import Result
+
+        try:
+            request = json.loads(line)
+            call = request["call"]
+            if call == "ping":
+                return {"ok": True, "value": {
+                    "pid": os.getpid(), "sbcs": len(self._sbcs)
+                }}
+            if call not in CALLS:
+                raise DaemonError("Unsupported call {}".format(call))
+            sbc = self.sbc(
+                request["host"], request["user"], request["passwd"],
+                request.get("options")
+            )
+            if isinstance(getattr(type(sbc), call), property):
+                value = getattr(sbc, call)
+            else:
+                value = getattr(sbc, call)(
+                    *request.get("args", ()), **request.get("kwargs", {})
+                )
+        except Exception as e:
+            logger.warning("Request failed: %r", e)
+            return {"ok": False, "error": repr(e)}
+        if isinstance(value, Result):
+            return {"ok": True, "result": jsonable(value)}
+        return {"ok": True, "value": jsonable(value)}
+
+    def serve_forever(self) -> None:
+        """Serve until stop() is called or the idle timeout passes.
+
+        Removes a stale socket of a daemon that is no longer running.
+
+        Raises:
+            DaemonError: Another daemon is serving on the socket, or the
+                directory of the default socket is not private.
+        """
+
+        if self._default_path:
+            private_directory(os.path.dirname(self.path))
+        if os.path.exists(self.path):
+            if DaemonClient(self.path).available():
+                raise DaemonError(
+                    "A daemon is already serving on {}".format(self.path)
+                )
+            os.remove(self.path)
+        self._server = _Server(self.path, self)
+        logger.info("Serving on %s", self.path)
+        try:
+            self._server.serve_forever(poll_interval=1.0)
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def start(self) -> "SbcDaemon":
+        """Serve from a background thread."""
+
+        thread = threading.Thread(
+            target=self.serve_forever, name="sbc-daemon", daemon=True
+        )
+        thread.start()
+        while self._server is None and thread.is_alive():
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+
+
+class DaemonClient(object):
+    """Send API calls to an SbcDaemon."""
+
+    def __init__(self, path: Union[str, None] = None,
+                 timeout: Union[float, None] = 300.0) -> None:
+        """Initialize a DaemonClient object.
+
+        Nothing is sent here. Every call opens a connection, which costs
+        microseconds on a Unix socket.
+
+        Args:
+            path: The path of the Unix socket. Defaults to
+                default_socket_path()
+            timeout: The number of seconds to wait for a response. Leave
+                room for activate_config() and for the request_timeout of
+                the Sbc objects of the daemon.
+        """
+
+        self.path = path or default_socket_path()
+        self.timeout = timeout
+
+    def _send(self, messages: List[dict]) -> List[dict]:
+        """Send messages and read a response per message.
+
+        Raises:
+            DaemonError: The socket, or the daemon, belongs to another user.
+            OSError: No daemon is serving on the socket.
+        """
+
+        _check_owner(self.path)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            _check_peer(sock)
+            sock.sendall(b"".join(
+                json.dumps(message).encode() + b"\n" for message in messages
+            ))
+            with sock.makefile("rb") as f:
+                return [json.loads(f.readline()) for _ in messages]
+
+    def available(self) -> bool:
+        """A daemon is serving on the socket."""
+
+        try:
+            return self._send([{"call": "ping"}])[0]["ok"]
+        except (OSError, ValueError, DaemonError):
+            return False
+
+    @staticmethod
+    def _value(response: dict) -> Any:
+        if not response["ok"]:
+            raise DaemonError(response["error"])
+        if "result" in response:
+            from sbc_rest_client.results import Result
+            return Result(**response["result"])
+        return response["value"]
+
+    def call(self, host: str, user: str, passwd: str, call: str, *args,
+             options: Union[dict, None] = None, **kwargs) -> Any:
+        """Run an Sbc method, or read an Sbc property, in the daemon.
+
+        Args:
+            host: The hostname or ip-address of the SBC.
+            user: A user name with admin privileges.
+            passwd: The password of user.
+            call: The name of the method or property. See CALLS
+            args: Passed on to the method.
+            options: Keyword arguments for the Sbc object, if the daemon has
+                to create it. E.g., {"verify": False}
+            kwargs: Passed on to the method.
+
+        Returns:
+            What the call returned, in JSON types. A Result for calls that
+            return one.
+
+        Raises:
+            DaemonError: The call raised an exception in the daemon, or the
+                socket belongs to another user.
+            OSError: No daemon is serving on the socket.
+        """
+
+        return self._value(self._send([{
+            "host": host, "user": user, "passwd": passwd, "call": call,
+            "args": args, "kwargs": kwargs, "options": options or {},
+        }])[0])
+
+    def call_many(self, requests: List[dict]) -> List[Any]:
+        """Send several requests over one connection.
+
+        Args:
+            requests: Dicts with the host, user, passwd, call and, if
+                needed, args, kwargs and options keys.
+
+        Returns:
+            The value or Result of every request, or a DaemonError for the
+            requests that raised one, in the order of requests.
+        """
+
+        values = list()
+        for response in self._send(requests):
+            try:
+                values.append(self._value(response))
+            except DaemonError as e:
+                values.append(e)
+        return values
+
+
+def main(argv: Union[List[str], None] = None) -> int:
+    """The entry point of the sbc-daemon console script."""
+
+    parser = argparse.ArgumentParser(
+        prog="sbc-daemon",
+        description="Keep SBC sessions warm for short-lived scripts."
+    )
+    parser.add_argument(
+        "--socket", default=None,
+        help="The path of the Unix socket. Defaults to {}".format(
+            default_socket_path()
+        )
+    )
+    parser.add_argument(
+        "--idle-timeout", type=float, default=0,
+        help="Stop after this many seconds without a request. 0 never stops"
+    )
+    parser.add_argument(
+        "--no-verify", action="store_true",
+        help="Disable verification of the SBC certificates"
+    )
+    parser.add_argument(
+        "--rate", type=float, default=None,
+        help="Limit the API calls to every SBC to this many per second, "
+        "adapting to how the SBC copes"
+    )
+    parser.add_argument(
+        "--max-in-flight", type=int, default=None,
+        help="Limit the concurrent API calls to every SBC to this many"
+    )
+    parser.add_argument(
+        "--cache-ttl", action="append", default=[],
+        metavar="ENDPOINT=SECONDS",
+        help="Reuse reads of an endpoint for this many seconds. E.g., "
+        "supported_rest_api_versions=3600. Repeat for more endpoints"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    sbc_kwargs = dict()
+    if args.no_verify:
+        sbc_kwargs.update(verify=False, ssl_warnings=False)
+    limiter_kwargs = None
+    if args.rate is not None or args.max_in_flight is not None:
+        limiter_kwargs = dict(rate=args.rate)
+        if args.max_in_flight is not None:
+            limiter_kwargs.update(max_in_flight=args.max_in_flight)
+    from sbc_rest_client.singleflight import SingleFlight
+    ttls = dict()
+    for ttl in args.cache_ttl:
+        endpoint, _, seconds = ttl.partition("=")
+        try:
+            ttls[endpoint] = float(seconds)
+        except ValueError:
+            parser.error("--cache-ttl {} is not ENDPOINT=SECONDS".format(ttl))
+    daemon = SbcDaemon(
+        args.socket, args.idle_timeout, limiter_kwargs, SingleFlight(ttls),
+        **sbc_kwargs
+    )
+    try:
+        daemon.serve_forever()
+    except DaemonError as e:
+        parser.error(str(e))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,373 @@
+"""A compact in-memory model of configuration elements.
+
+A ConfigElement holds a configElement of the REST API: its element type, its
+attributes and its sub elements. It is built to hold a full SBC configuration
+in memory:
+
+- Objects use __slots__.
+- Attribute names are interned and the tuple of attribute names is shared by
+  every element with the same attributes. Most elements of a type have the
+  same attributes, so an element only really stores its values.
+- Short values, like enabled, disabled or 0, are interned too.
+
+ConfigElements serialise back to the XML the REST API expects with
+to_xml(). Parsing and serialising round-trips.
+
+Example:
+
+    from sbc_rest_client.elements import ConfigElement
+
+    for element in sbc.config_elements("session-agent"):
+        if element["state"] == "disabled":
+            print(element.key(), element.to_xml())
+"""
+
+import sys
+from typing import (
+    TYPE_CHECKING, Dict, Iterable, Iterator, Mapping, Tuple, Union
+)
+from urllib.parse import quote
+
+from sbc_rest_client.metadata import ElementTypeMetadata
+from sbc_rest_client.parsing import parse
+
+if TYPE_CHECKING:
+    from lxml import etree
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+# An attribute value is a str, or a tuple of str for multi-valued attributes
+# and for attributes without a value.
+Value = Union[str, Tuple[str, ...]]
+
+_XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+# Values up to this length are interned
+_INTERN_MAX_LEN = 32
+
+# The shared tuples of attribute names, for every process-wide distinct
+# combination of names. An SBC has a few hundred element types, so this
+# stays small. It never shrinks, so it is bounded: once full, new
+# combinations are not shared.
+_SHARED_NAMES_MAX = 4096
+_shared_names: Dict[Tuple[str, ...], Tuple[str, ...]] = dict()
+
+
+def _shared(names: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Return the one shared copy of a tuple of interned attribute names."""
+
+    shared = _shared_names.get(names)
+    if shared is not None:
+        return shared
+    if len(_shared_names) >= _SHARED_NAMES_MAX:
+        return names
+    return _shared_names.setdefault(names, names)
+
+
+def escape(text: str) -> str:
+    """Escape &, < and > in XML text.
+
+    Like xml.sax.saxutils.escape(), without importing urllib.request along
+    with it.
+    """
+
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _intern_value(value: str) -> str:
+    if len(value) <= _INTERN_MAX_LEN:
+        return sys.intern(value)
+    return value
+
+
+class ConfigElement(object):
+    """A configuration element, or a sub element, and its attributes."""
+
+    __slots__ = (
+        "element_type", "_names", "_values", "sub_elements", "_extra",
+        "_metadata"
+    )
+
+    def __init__(
+            self, element_type: str,
+            attributes: Iterable[Tuple[str, Value]] = (),
+            sub_elements: Iterable["ConfigElement"] = (),
+            metadata: Union[ElementTypeMetadata, None] = None
+        ) -> None:
+        """Initialize a ConfigElement object.
+
+        Args:
+            element_type: The element type. E.g., session-agent
+            attributes: (name, value) tuples. A value is a str, or a tuple of
+                str for a multi-valued attribute.
+            sub_elements: The sub elements.
+            metadata: The metadata of the element type. It provides the key
+                attributes.
+        """
+
+        names = list()
+        values = list()
+        for name, value in attributes:
+            names.append(sys.intern(name))
+            if isinstance(value, str):
+                values.append(_intern_value(value))
+            elif len(value) == 1:
+                values.append(_intern_value(value[0]))
+            else:
+                values.append(tuple(_intern_value(v) for v in value))
+        self.element_type = sys.intern(element_type)
+        self._names = _shared(tuple(names))
+        self._values = tuple(values)
+        self.sub_elements = tuple(sub_elements)
+        # (position, xml) tuples of other child nodes. position is the
+        # number of attributes and sub elements before the node.
+        self._extra = ()
+        self._metadata = metadata
+
+    # Parsing
+
+    @classmethod
+    def from_node(cls, node: "etree._Element",
+                  metadata: Union[ElementTypeMetadata, None] = None
+                  ) -> "ConfigElement":
+        """Create a ConfigElement from a configElement or subElement node.
+
+        Child nodes other than the element type, attributes and sub elements
+        are kept as is, in place, so they survive a round trip.
+        """
+
+        element_type = None
+        attributes = list()
+        sub_elements = list()
+        extra = list()
+        for child in node:
+            tag = child.tag
+            if tag == "attribute":
+                values = [v.text or "" for v in child.iterfind("value")]
+                attributes.append((
+                    child.findtext("name"),
+                    values[0] if len(values) == 1 else tuple(values)
+                ))
+            elif tag == "subElement":
+                sub_elements.append(cls.from_node(child))
+            elif tag in ("elementType", "subElementType"):
+                element_type = child.text
+            elif isinstance(tag, str):
+                from lxml import etree
+                extra.append((
+                    len(attributes) + len(sub_elements),
+                    etree.tostring(child, encoding="unicode", with_tail=False)
+                ))
+        element = cls(element_type, attributes, sub_elements, metadata)
+        if extra:
+            element._extra = tuple(extra)
+        return element
+
+    @classmethod
+    def from_xml(cls, xml: Union[str, bytes],
+                 metadata: Union[ElementTypeMetadata, None] = None
+                 ) -> "ConfigElement":
+        """Create a ConfigElement from a configElement XML document."""
+
+        if isinstance(xml, str):
+            xml = xml.encode()
+        return cls.from_node(parse(xml.strip()), metadata)
+
+    @classmethod
+    def iter_xml(cls, xml: Union[str, bytes],
+                 metadata: Union[ElementTypeMetadata, None] = None
+                 ) -> Iterator["ConfigElement"]:
+        """Create ConfigElements from every configElement node in xml.
+
+        E.g., from a saved configElements response.
+        """
+
+        if isinstance(xml, str):
+            xml = xml.encode()
+        tree = parse(xml.strip())
+        if tree.tag == "configElement":
+            yield cls.from_node(tree, metadata)
+            return
+        for node in tree.iter("configElement"):
+            yield cls.from_node(node, metadata)
+
+    # Serialising
+
+    def _write(self, parts: list, sub_element: bool) -> None:
+        """Append the XML of the element to parts."""
+
+        if sub_element:
+            parts.append("<subElement><subElementType>")
+        else:
+            parts.append("<configElement><elementType>")
+        parts.append(escape(self.element_type))
+        parts.append(
+            "</subElementType>" if sub_element else "</elementType>"
+        )
+        extra = self._extra
+        # The index in extra of the next other child node to write
+        e = 0
+        for position, (name, value) in enumerate(
+                zip(self._names, self._values)):
+            while e < len(extra) and extra[e][0] <= position:
+                parts.append(extra[e][1])
+                e += 1
+            parts.append("<attribute><name>")
+            parts.append(escape(name))
+            parts.append("</name>")
+            for v in ((value,) if isinstance(value, str) else value):
+                parts.append("<value>")
+                parts.append(escape(v))
+                parts.append("</value>")
+            parts.append("</attribute>")
+        for position, sub in enumerate(self.sub_elements, len(self._names)):
+            while e < len(extra) and extra[e][0] <= position:
+                parts.append(extra[e][1])
+                e += 1
+            sub._write(parts, True)
+        parts.extend(xml for _, xml in extra[e:])
+        parts.append("</subElement>" if sub_element else "</configElement>")
+
+    def to_xml(self, declaration: bool = True) -> str:
+        """Serialise the element to the XML the REST API expects.
+
+        The result can be passed to Sbc.update_config_element() and
+        Sbc.add_config_element().
+        """
+
+        parts = [_XML_DECLARATION] if declaration else []
+        self._write(parts, False)
+        return "".join(parts)
+
+    # Access
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._names
+
+    def __getitem__(self, name: str) -> Value:
+        try:
+            return self._values[self._names.index(name)]
+        except ValueError:
+            raise KeyError(name) from None
+
+    def get(self, name: str, default: Union[Value, None] = None
+            ) -> Union[Value, None]:
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def items(self) -> Iterator[Tuple[str, Value]]:
+        """The (name, value) tuples of the attributes, in document order."""
+
+        return zip(self._names, self._values)
+
+    @property
+    def metadata(self) -> Union[ElementTypeMetadata, None]:
+        return self._metadata
+
+    def key(self, key_attributes: Union[Iterable[str], None] = None
+            ) -> Tuple[Value, ...]:
+        """The values of the key attributes.
+
+        Args:
+            key_attributes: The names of the key attributes. Defaults to the
+                key attributes of the metadata of the element.
+
+        Raises:
+            ValueError: There are no key attributes to go by.
+        """
+
+        if key_attributes is None:
+            if self._metadata is None:
+                raise ValueError(
+                    "No metadata for {}, pass key_attributes".format(
+                        self.element_type
+                    )
+                )
+            key_attributes = self._metadata.key_attributes
+        return tuple(self.get(name, "") for name in key_attributes)
+
+    def key_attribs(self, key_attributes: Union[Iterable[str], None] = None
+                    ) -> str:
+        """The key attributes as query parameters.
+
+        For Sbc.get_config_elements() and Sbc.delete_config_element().
+        E.g., &hostname=sa1.example.com
+        """
+
+        if key_attributes is None and self._metadata is not None:
+            key_attributes = self._metadata.key_attributes
+        key_attributes = tuple(key_attributes or ())
+        key = self.key(key_attributes)
+        return "".join(
+            "&{}={}".format(quote(name), quote(
+                value if isinstance(value, str) else ",".join(value)
+            ))
+            for name, value in zip(key_attributes, key)
+        )
+
+    def replace(self, changes: Mapping[str, Value]) -> "ConfigElement":
+        """Return a copy with some attribute values changed or added.
+
+        E.g., element.replace({"max-sessions": "100"})
+        """
+
+        changes = dict(changes)
+        attributes = [
+            (name, changes.pop(name, value)) for name, value in self.items()
+        ]
+        attributes.extend(changes.items())
+        element = type(self)(
+            self.element_type, attributes, self.sub_elements, self._metadata
+        )
+        # Other child nodes after the attributes stay after the added ones
+        element._extra = tuple(
+            (position + len(changes) if position >= len(self) else position,
+             xml)
+            for position, xml in self._extra
+        )
+        return element
+
+    def subset(self, names: Iterable[str]) -> "ConfigElement":
+        """Return a copy holding only the given attributes.
+
+        Sub elements are left out. Useful to update only the attributes
+        that changed, plus the key attributes.
+        """
+
+        wanted = set(names)
+        return type(self)(
+            self.element_type,
+            [(name, value) for name, value in self.items() if name in wanted],
+            metadata=self._metadata
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ConfigElement):
+            return NotImplemented
+        return (
+            self.element_type == other.element_type
+            and dict(self.items()) == dict(other.items())
+            and self.sub_elements == other.sub_elements
+            and self._extra == other._extra
+        )
+
+    def __ne__(self, other: object) -> bool:
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return "{cls}({element_type!r}, {attributes!r})".format(
+            cls=type(self).__name__, element_type=self.element_type,
+            attributes=dict(self.items())
+        )
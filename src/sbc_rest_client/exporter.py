@@ -0,0 +1,334 @@
+"""Export the statistics of SBCs as Prometheus metrics.
+
+The sbc-exporter console script serves a /metrics endpoint for a list of
+Session Border Controllers. It keeps one authenticated Sbc object per host and
+refreshes the metrics from a background thread at a fixed interval. A scrape
+returns the cached metrics immediately and never triggers REST API calls.
+
+Usage:
+
+    $ export SBC_USER=admin SBC_PASSWORD=password
+    $ sbc-exporter --interval 15 --port 9800 sbc1.example.com sbc2.example.com
+
+The SBC credentials are read from the SBC_USER and SBC_PASSWORD environment
+variables, so the password does not show up in the process list.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Union
+
+from sbc_rest_client.inventory import read_inventory
+from sbc_rest_client.sbc import Sbc
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+logger = logging.getLogger(__name__)
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+ROLES = ("standalone", "active", "standby")
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the Prometheus text format."""
+
+    return (
+        value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    )
+
+
+def _labels(**labels: str) -> str:
+    """Format labels for the Prometheus text format."""
+
+    return ",".join(
+        '{name}="{value}"'.format(name=name, value=_escape(str(value)))
+        for name, value in labels.items()
+    )
+
+
+class _HostMetrics(object):
+    """The most recent metrics of a single SBC."""
+
+    __slots__ = ("up", "role", "kpis", "duration", "timestamp")
+
+    def __init__(self) -> None:
+        self.up = 0
+        self.role = None
+        self.kpis = dict()
+        self.duration = 0.0
+        self.timestamp = 0.0
+
+
+class SbcExporter(object):
+    """Collect SBC statistics in the background and render them as metrics.
+    """
+
+    def __init__(self, sbcs: Iterable[Sbc], interval: float = 15.0,
+                 max_workers: int = 32) -> None:
+        """Initialize an SbcExporter object.
+
+        Args:
+            sbcs: The Sbc objects to collect statistics from.
+            interval: The number of seconds between refreshes.
+            max_workers: The maximum number of SBCs refreshed at the same
+                time.
+        """
+
+        self.sbcs = list(sbcs)
+        self.interval = interval
+        self._metrics: Dict[str, _HostMetrics] = {
+            sbc.host: _HostMetrics() for sbc in self.sbcs
+        }
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, len(self.sbcs))),
+            thread_name_prefix="sbc-exporter"
+        )
+        self._rendered = self._render().encode()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _collect(self, sbc: Sbc) -> None:
+        """Refresh the metrics of a single SBC. It is up if both its KPIs
+        and its role could be read.
+        """
+
+        metrics = _HostMetrics()
+        start = time.monotonic()
+        try:
+            metrics.kpis = sbc.kpi_snapshot(max_age=0).fields
+            role = sbc.role
+            if role:
+                metrics.role = role
+                metrics.up = 1
+            else:
+                # Sbc.role logged why
+                logger.warning("%s: Refresh: Nok! No role", sbc.host)
+        except Exception as e:
+            logger.warning("%s: Refresh: Nok! %r", sbc.host, e)
+        metrics.duration = time.monotonic() - start
+        metrics.timestamp = time.time()
+        self._metrics[sbc.host] = metrics
+
+    def refresh(self) -> None:
+        """Refresh the metrics of every SBC, in parallel."""
+
+        list(self._executor.map(self._collect, self.sbcs))
+        self._rendered = self._render().encode()
+
+    def _render(self) -> str:
+        """Render the cached metrics in the Prometheus text format."""
+
+        lines: List[str] = list()
+
+        def family(name: str, kind: str, help_text: str) -> None:
+            lines.append("# HELP {} {}".format(name, help_text))
+            lines.append("# TYPE {} {}".format(name, kind))
+
+        def sample(name: str, labels: str, value: Union[int, float]) -> None:
+            lines.append("{}{{{}}} {}".format(name, labels, value))
+
+        hosts = sorted(self._metrics.items())
+
+        family(
+            "sbc_up", "gauge", "1 if the last refresh of the SBC succeeded."
+        )
+        for host, metrics in hosts:
+            sample("sbc_up", _labels(host=host), metrics.up)
+
+        family(
+            "sbc_role", "gauge",
+            "The role of the SBC. 1 for the current role, 0 otherwise."
+        )
+        for host, metrics in hosts:
+            if metrics.role is None:
+                continue
+            for role in ROLES:
+                sample(
+                    "sbc_role", _labels(host=host, role=role),
+                    int(metrics.role == role)
+                )
+
+        family("sbc_global_cps", "gauge", "The global calls per second.")
+        for host, metrics in hosts:
+            if "sysGlobalCPS" in metrics.kpis:
+                sample(
+                    "sbc_global_cps", _labels(host=host),
+                    metrics.kpis["sysGlobalCPS"]
+                )
+
+        family(
+            "sbc_global_con_sessions", "gauge",
+            "The global number of connected sessions."
+        )
+        for host, metrics in hosts:
+            if "sysGlobalConSessions" in metrics.kpis:
+                sample(
+                    "sbc_global_con_sessions", _labels(host=host),
+                    metrics.kpis["sysGlobalConSessions"]
+                )
+
+        family(
+            "sbc_global_sessions", "gauge",
+            "Every numeric field of the globalSessions KPIs."
+        )
+        for host, metrics in hosts:
+            for field, value in sorted(metrics.kpis.items()):
+                if isinstance(value, (int, float)):
+                    sample(
+                        "sbc_global_sessions",
+                        _labels(host=host, field=field), value
+                    )
+
+        family(
+            "sbc_refresh_duration_seconds", "gauge",
+            "The duration of the last refresh of the SBC."
+        )
+        for host, metrics in hosts:
+            sample(
+                "sbc_refresh_duration_seconds", _labels(host=host),
+                round(metrics.duration, 6)
+            )
+
+        family(
+            "sbc_last_refresh_timestamp_seconds", "gauge",
+            "The unix time of the last refresh of the SBC."
+        )
+        for host, metrics in hosts:
+            sample(
+                "sbc_last_refresh_timestamp_seconds", _labels(host=host),
+                round(metrics.timestamp, 3)
+            )
+
+        lines.append("")
+        return "\n".join(lines)
+
+    @property
+    def metrics(self) -> bytes:
+        """The most recently rendered metrics."""
+
+        return self._rendered
+
+    def _run(self) -> None:
+        """Refresh at a fixed interval until stopped."""
+
+        next_run = time.monotonic()
+        while not self._stop.is_set():
+            self.refresh()
+            next_run = max(next_run + self.interval, time.monotonic())
+            self._stop.wait(next_run - time.monotonic())
+
+    def start(self) -> None:
+        """Start refreshing in a background thread."""
+
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="sbc-exporter", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop refreshing and wait for the background thread to finish."""
+
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def make_server(self, address: str = "", port: int = 9800
+                    ) -> ThreadingHTTPServer:
+        """Create an HTTP server that serves the metrics on /metrics."""
+
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.metrics
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        return ThreadingHTTPServer((address, port), Handler)
+
+
+def main(argv: Union[List[str], None] = None) -> int:
+    """The entry point of the sbc-exporter console script."""
+
+    parser = argparse.ArgumentParser(
+        prog="sbc-exporter",
+        description="Serve Prometheus metrics for Session Border Controllers."
+    )
+    parser.add_argument("hosts", nargs="*", help="SBC hostnames")
+    parser.add_argument(
+        "--hosts-file", help="A file with SBC hostnames, one per line"
+    )
+    parser.add_argument("--address", default="", help="The address to bind")
+    parser.add_argument(
+        "--port", type=int, default=9800, help="The port to listen on"
+    )
+    parser.add_argument(
+        "--interval", type=float, default=15.0,
+        help="The number of seconds between refreshes"
+    )
+    parser.add_argument(
+        "--api-version", default="v1.1", help="The REST API version"
+    )
+    parser.add_argument(
+        "--no-verify", action="store_true",
+        help="Disable verification of the SBC certificates"
+    )
+    args = parser.parse_args(argv)
+
+    hosts = list(args.hosts)
+    if args.hosts_file:
+        hosts += read_inventory(args.hosts_file)
+    if not hosts:
+        parser.error("no SBC hosts given")
+    user = os.environ.get("SBC_USER")
+    passwd = os.environ.get("SBC_PASSWORD")
+    if not user or not passwd:
+        parser.error("set SBC_USER and SBC_PASSWORD in the environment")
+
+    sbcs = [
+        Sbc(
+            user, passwd, host, api_version=args.api_version,
+            verify=not args.no_verify, ssl_warnings=not args.no_verify,
+            lazy_login=True
+        )
+        for host in hosts
+    ]
+    exporter = SbcExporter(sbcs, interval=args.interval)
+    server = exporter.make_server(args.address, args.port)
+    exporter.start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        exporter.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
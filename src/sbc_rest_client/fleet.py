@@ -0,0 +1,162 @@
+"""Fan out API calls over many SBCs with a thread pool.
+
+Sbc objects are safe to share between threads, so a plain thread pool is
+enough to drive a fleet of SBCs from one process. Each Sbc keeps its own
+pooled connections and access token. Use async_sbc.run_on_fleet_async() instead
+when the calling code is asyncio based.
+
+Example:
+
+    from sbc_rest_client.fleet import FleetExecutor
+
+    sbcs = [Sbc("admin", "password", host, lazy_login=True) for host in hosts]
+    with FleetExecutor(max_workers=32) as fleet:
+        roles = fleet.map(lambda sbc: sbc.role, sbcs)
+        for sbc, snapshot in fleet.as_completed(Sbc.kpi_snapshot, sbcs):
+            print(sbc.host, snapshot)
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Iterable, Iterator, Tuple, Union
+
+from sbc_rest_client.sbc import Sbc
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+class FleetExecutor(object):
+    """Run operations on many Sbc objects in a thread pool."""
+
+    def __init__(self, max_workers: int = 32) -> None:
+        """Initialize a FleetExecutor object.
+
+        Args:
+            max_workers: The maximum number of SBCs handled at the same time.
+                Every Sbc has its own connection pool, so this is not limited
+                by pool_maxsize. Calls on the same Sbc are, see Sbc.
+        """
+
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="sbc-fleet"
+        )
+
+    def map(self, operation: Callable[[Sbc], Any], sbcs: Iterable[Sbc],
+            return_exceptions: bool = True,
+            timeout: Union[float, None] = None) -> "list[Any]":
+        """Run the same operation on every SBC.
+
+        Args:
+            operation: A callable that takes an Sbc. E.g.,
+                lambda sbc: sbc.role
+            sbcs: The Sbc objects to run the operation on.
+            return_exceptions: Return exceptions in the result list instead of
+                raising the first one.
+            timeout: The number of seconds to wait for all results. SBCs
+                without a result by then get a
+                concurrent.futures.TimeoutError. Operations that did not
+                start are cancelled, running ones are not interrupted.
+                None waits for all results.
+
+        Returns:
+            A list of results, in the order of sbcs.
+        """
+
+        futures = [self._executor.submit(operation, sbc) for sbc in sbcs]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        results = list()
+        for future in futures:
+            try:
+                results.append(future.result(_remaining(deadline)))
+            except Exception as e:
+                if isinstance(e, FutureTimeoutError) and not future.done():
+                    future.cancel()
+                if not return_exceptions:
+                    for pending in futures:
+                        pending.cancel()
+                    raise
+                results.append(e)
+        return results
+
+    def as_completed(self, operation: Callable[[Sbc], Any],
+                     sbcs: Iterable[Sbc], timeout: Union[float, None] = None
+                     ) -> Iterator[Tuple[Sbc, Union[Any, Exception]]]:
+        """Run the same operation on every SBC and yield results as they
+        come in.
+
+        Args:
+            operation: A callable that takes an Sbc.
+            sbcs: The Sbc objects to run the operation on.
+            timeout: The number of seconds to wait for all results. SBCs
+                without a result by then are yielded last, with a
+                concurrent.futures.TimeoutError. None waits for all results.
+
+        Yields:
+            (sbc, result) tuples. result is the exception if the operation
+            raised one.
+        """
+
+        futures = {
+            self._executor.submit(operation, sbc): sbc for sbc in sbcs
+        }
+        pending = set(futures)
+        try:
+            for future in as_completed(futures, timeout):
+                pending.discard(future)
+                try:
+                    yield futures[future], future.result()
+                except Exception as e:
+                    yield futures[future], e
+        except FutureTimeoutError:
+            for future in futures:
+                if future in pending:
+                    future.cancel()
+                    yield futures[future], FutureTimeoutError()
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self) -> "FleetExecutor":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+
+
+def _remaining(deadline: Union[float, None]) -> Union[float, None]:
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def run_on_fleet(sbcs: Iterable[Sbc], operation: Callable[[Sbc], Any],
+                 max_workers: int = 32, return_exceptions: bool = True,
+                 timeout: Union[float, None] = None) -> "list[Any]":
+    """Run the same operation on many SBCs in a thread pool.
+
+    The threaded counterpart of async_sbc.run_on_fleet_async().
+
+    Args:
+        sbcs: The Sbc objects to run the operation on.
+        operation: A callable that takes an Sbc. E.g., lambda sbc: sbc.role
+        max_workers: The maximum number of SBCs handled at the same time.
+        return_exceptions: Return exceptions in the result list instead of
+            raising the first one.
+        timeout: See FleetExecutor.map()
+
+    Returns:
+        A list of results, in the order of sbcs.
+    """
+
+    sbcs = list(sbcs)
+    fleet = FleetExecutor(max(1, min(max_workers, len(sbcs))))
+    try:
+        return fleet.map(operation, sbcs, return_exceptions, timeout)
+    finally:
+        # Do not wait for operations that timed out
+        fleet.shutdown(wait=timeout is None)
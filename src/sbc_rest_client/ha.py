@@ -0,0 +1,277 @@
+"""Talk to an HA pair of SBCs as one.
+
+In a High Availability setup only the active SBC accepts configuration
+changes. An SbcHaPair wraps the Sbc objects of both peers, remembers which
+one is active and sends every call to the right peer:
+
+- configuration changes go to the active peer,
+- statistics are read from the active peer, or from the standby peer with
+  read_from="standby" to offload the active one.
+
+Roles are resolved with a single status request when it is first needed:
+in a pair, the peer of the active SBC is the standby one and vice versa. The
+roles are not resolved again until a switchover, which swaps them, or a
+call fails the way calls to a peer that is no longer active fail: without a
+response, or with one of ROLE_CHANGE_STATUSES. A call that failed because
+the peers switched roles behind our back is retried once on the new active
+peer.
+
+Example:
+
+    from sbc_rest_client.ha import SbcHaPair
+
+    pair = SbcHaPair(
+        Sbc("admin", "password", "sbc1.example.com", lazy_login=True),
+        Sbc("admin", "password", "sbc2.example.com", lazy_login=True),
+    )
+    if pair.lock():
+        pair.update_config_element(xml_str)
+        pair.activate_config()
+        pair.unlock()
+    pair.switchover()
+    print(pair.active.host, pair.global_cps)
+"""
+
+import logging
+import threading
+from typing import Any, Callable, Tuple, Union
+
+from sbc_rest_client.elements import ConfigElement
+from sbc_rest_client.kpis import GlobalSessionsSnapshot
+from sbc_rest_client.results import Result
+from sbc_rest_client.sbc import Sbc, SbcError
+from sbc_rest_client.transaction import ConfigTransaction
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+logger = logging.getLogger(__name__)
+
+
+# Failed calls to the active peer with these status codes, or without a
+# response, make the roles be resolved again. The peer may be standby now.
+ROLE_CHANGE_STATUSES = frozenset((401, 403, 409))
+
+
+class HaPairError(Exception):
+    """The roles of the peers of an HA pair could not be resolved."""
+
+
+class SbcHaPair(object):
+    """Route calls to the active or standby peer of an HA pair."""
+
+    def __init__(self, first: Sbc, second: Sbc, read_from: str = "active"
+                 ) -> None:
+        """Initialize an SbcHaPair object.
+
+        No API calls are made here. The roles are resolved on first use.
+
+        Args:
+            first: The Sbc object of one peer. It is asked for its role
+                first.
+            second: The Sbc object of the other peer.
+            read_from: The peer statistics are read from. active or standby
+        """
+
+        if read_from not in ("active", "standby"):
+            raise ValueError("read_from must be active or standby")
+        self.peers = (first, second)
+        self.read_from = read_from
+        # (active, standby) or None if unknown
+        self._roles: Union[Tuple[Sbc, Sbc], None] = None
+        self._lock = threading.Lock()
+
+    # Roles
+
+    def resolve(self) -> Tuple[Sbc, Sbc]:
+        """Find out which peer is active, with as few status requests as
+        possible.
+
+        The peer that was active last is asked first. If it does not answer,
+        the other peer is asked.
+
+        Returns:
+            An (active, standby) tuple.
+
+        Raises:
+            HaPairError: Neither peer reports a role of active or standby.
+        """
+
+        with self._lock:
+            first, second = self._roles or self.peers
+            for sbc, peer in ((first, second), (second, first)):
+                # False if the peer did not answer
+                role = sbc.role
+                if role == "active":
+                    self._roles = (sbc, peer)
+                elif role == "standby":
+                    self._roles = (peer, sbc)
+                else:
+                    logger.warning(
+                        "%s: Role %r, asking its peer", sbc.host, role
+                    )
+                    continue
+                logger.info("HA pair: %s is active, %s is standby",
+                            self._roles[0].host, self._roles[1].host)
+                return self._roles
+            self._roles = None
+        raise HaPairError("No active peer in HA pair {} / {}".format(
+            first.host, second.host
+        ))
+
+    def invalidate(self) -> None:
+        """Forget the roles. They are resolved again on the next call."""
+
+        self._roles = None
+
+    @property
+    def roles(self) -> Tuple[Sbc, Sbc]:
+        """The (active, standby) Sbc objects, resolved if unknown."""
+
+        roles = self._roles
+        if roles is None:
+            roles = self.resolve()
+        return roles
+
+    @property
+    def active(self) -> Sbc:
+        return self.roles[0]
+
+    @property
+    def standby(self) -> Sbc:
+        return self.roles[1]
+
+    # Routing
+
+    def _on_active(self, call: Callable[[Sbc], Result]) -> Result:
+        """Run call on the active peer. Retry once if it failed like calls
+        to a standby peer fail and the roles turn out to have changed.
+        """
+
+        active = self.active
+        result = call(active)
+        if result or not (result.status_code is None
+                          or result.status_code in ROLE_CHANGE_STATUSES):
+            return result
+        self.invalidate()
+        try:
+            new_active = self.active
+        except HaPairError:
+            return result
+        if new_active is active:
+            return result
+        logger.info("HA pair: roles changed, retrying on %s", new_active.host)
+        return call(new_active)
+
+    def _on_reader(self, call: Callable[[Sbc], Any]) -> Any:
+        """Run a read on the peer statistics are read from. Fail over to the
+        other peer if the request fails or the SBC answers with an error.
+        """
+
+        import requests
+        active, standby = self.roles
+        sbc = active if self.read_from == "active" else standby
+        try:
+            return call(sbc)
+        except (requests.exceptions.RequestException, SbcError) as e:
+            logger.warning("HA pair: read from %s failed, %r", sbc.host, e)
+            self.invalidate()
+            active, standby = self.roles
+            return call(standby if sbc is active else active)
+
+    # Statistics
+
+    def kpi_snapshot(self, max_age: Union[float, None] = None
+                     ) -> GlobalSessionsSnapshot:
+        """See Sbc.kpi_snapshot()"""
+
+        return self._on_reader(lambda sbc: sbc.kpi_snapshot(max_age))
+
+    @property
+    def global_cps(self) -> str:
+        """See Sbc.global_cps"""
+
+        return self._on_reader(lambda sbc: sbc.global_cps)
+
+    @property
+    def global_con_sessions(self) -> str:
+        """See Sbc.global_con_sessions"""
+
+        return self._on_reader(lambda sbc: sbc.global_con_sessions)
+
+    # Configuration
+
+    def lock(self) -> Result:
+        """Lock the configuration of the active peer."""
+
+        return self._on_active(Sbc.lock)
+
+    def unlock(self) -> Result:
+        """Unlock the configuration of the active peer."""
+
+        return self._on_active(Sbc.unlock)
+
+    def update_config_element(self, xml_str: Union[str, ConfigElement]
+                              ) -> Result:
+        """See Sbc.update_config_element()"""
+
+        return self._on_active(lambda sbc: sbc.update_config_element(xml_str))
+
+    def add_config_element(self, xml_str: Union[str, ConfigElement]
+                           ) -> Result:
+        """See Sbc.add_config_element()"""
+
+        return self._on_active(lambda sbc: sbc.add_config_element(xml_str))
+
+    def delete_config_element(self, element_type: str,
+                              key_attribs: Union[str, None] = None
+                              ) -> Result:
+        """See Sbc.delete_config_element()"""
+
+        return self._on_active(
+            lambda sbc: sbc.delete_config_element(element_type, key_attribs)
+        )
+
+    def activate_config(self) -> Result:
+        """See Sbc.activate_config()"""
+
+        return self._on_active(Sbc.activate_config)
+
+    def transaction(self, **kwargs) -> ConfigTransaction:
+        """A ConfigTransaction on the active peer.
+
+        Args:
+            kwargs: Passed on to ConfigTransaction.
+        """
+
+        return ConfigTransaction(self.active, **kwargs)
+
+    # Admin
+
+    def switchover(self) -> Result:
+        """Make the standby peer active.
+
+        On success the cached roles are swapped, so no status requests are
+        needed to find the new active peer.
+        """
+
+        active, standby = self.roles
+        result = active.switchover()
+        if result:
+            with self._lock:
+                self._roles = (standby, active)
+        else:
+            self.invalidate()
+        return result
+
+    def __repr__(self) -> str:
+        roles = self._roles
+        if roles is None:
+            return "{cls}({a!r}, {b!r}, roles unknown)".format(
+                cls=type(self).__name__, a=self.peers[0].host,
+                b=self.peers[1].host
+            )
+        return "{cls}(active={a!r}, standby={b!r})".format(
+            cls=type(self).__name__, a=roles[0].host, b=roles[1].host
+        )
@@ -0,0 +1,402 @@
+"""Time every API call and keep latency histograms per host and endpoint.
+
+Pass an Instrumentation object to Sbc, or to several Sbc objects, to record
+every API call they send:
+
+- a RequestRecord per call with the method, the endpoint template, the
+  status code, the request and response sizes and where the time went:
+  connecting, including the DNS lookup, the TLS handshake, waiting for the
+  server and the total,
+- a LatencyHistogram per (host, endpoint), with HDR style log-linear
+  buckets, so percentiles stay accurate from microseconds to minutes at a
+  fixed, small memory cost,
+- the duration of verify, save and activate operations, under the endpoints
+  operation/verify, operation/save and operation/activate.
+
+Records are also passed to the callbacks you add and, optionally, turned
+into OpenTelemetry spans. Without an Instrumentation object an Sbc does not
+time anything.
+
+Example:
+
+    from sbc_rest_client.instrumentation import Instrumentation
+
+    instrumentation = Instrumentation()
+    sbc = Sbc("admin", "password", "sbc1.example.com",
+              instrumentation=instrumentation)
+    sbc.activate_config()
+    for row in instrumentation.summary():
+        print(row)
+"""
+
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Dict, List, Tuple, Union
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    import requests
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+_API_PREFIX = re.compile(r"^/rest/(?:v[\d.]+|api)/")
+_ID_SEGMENT = re.compile(r"^(?:\d+|[0-9a-fA-F-]{16,})$")
+
+
+@lru_cache(maxsize=512)
+def endpoint_template(url: str) -> str:
+    """The endpoint of a URL, without the API prefix, the query string and
+    ids.
+
+    E.g., https://sbc/rest/v1.1/configuration/configElements?elementType=x
+    becomes configuration/configElements
+    """
+
+    path = _API_PREFIX.sub("", urlsplit(url).path)
+    return "/".join(
+        "{id}" if _ID_SEGMENT.match(segment) else segment
+        for segment in path.strip("/").split("/")
+    )
+
+
+class RequestRecord(object):
+    """The measurements of one API call."""
+
+    __slots__ = (
+        "host", "method", "endpoint", "status_code", "request_bytes",
+        "response_bytes", "connect", "tls", "server", "duration", "start",
+        "error"
+    )
+
+    def __init__(
+            self, host: str, method: str, endpoint: str,
+            status_code: Union[int, None], request_bytes: int,
+            response_bytes: int, connect: float, tls: float, server: float,
+            duration: float, start: float,
+            error: Union[Exception, None] = None
+        ) -> None:
+        """Initialize a RequestRecord object.
+
+        Args:
+            host: The host of the SBC.
+            method: The HTTP method.
+            endpoint: The endpoint template. See endpoint_template()
+            status_code: The status code, or None if no response was
+                received.
+            request_bytes: The size of the request body.
+            response_bytes: The size of the response body. 0 for streamed
+                responses without a Content-Length.
+            connect: The seconds spent on the DNS lookup and setting up the
+                TCP connection. 0 if a pooled connection was reused.
+            tls: The seconds spent on the TLS handshake.
+            server: The seconds from sending the request until the response
+                headers were received.
+            duration: The total number of seconds the call took, including a
+                token refresh and a retry after a 401.
+            start: The time.time() timestamp the call started at.
+            error: The exception raised, if any.
+        """
+
+        self.host = host
+        self.method = method
+        self.endpoint = endpoint
+        self.status_code = status_code
+        self.request_bytes = request_bytes
+        self.response_bytes = response_bytes
+        self.connect = connect
+        self.tls = tls
+        self.server = server
+        self.duration = duration
+        self.start = start
+        self.error = error
+
+    def __repr__(self) -> str:
+        return (
+            "{cls}({method} {host} {endpoint} -> {status_code}, "
+            "duration={duration:.6f})"
+        ).format(
+            cls=type(self).__name__, method=self.method, host=self.host,
+            endpoint=self.endpoint, status_code=self.status_code,
+            duration=self.duration
+        )
+
+
+class LatencyHistogram(object):
+    """A log-linear latency histogram, in the style of HdrHistogram.
+
+    Latencies are counted in microseconds. Every power of two is split into
+    2 ** (precision_bits - 1) linear buckets, so a recorded value is off by
+    less than 1 / 2 ** (precision_bits - 1). 1.6% with the default 7 bits.
+    The histogram grows with the logarithm of the largest value only.
+
+    Not thread-safe on its own. Instrumentation serialises access.
+    """
+
+    __slots__ = ("precision_bits", "_half", "counts", "count", "total",
+                 "min", "max")
+
+    def __init__(self, precision_bits: int = 7) -> None:
+        if not 2 <= precision_bits <= 16:
+            raise ValueError("precision_bits must be between 2 and 16")
+        self.precision_bits = precision_bits
+        self._half = 1 << (precision_bits - 1)
+        self.counts: List[int] = list()
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def _index(self, us: int) -> int:
+        shift = us.bit_length() - self.precision_bits
+        if shift <= 0:
+            return us
+        return shift * self._half + (us >> shift)
+
+    def _upper(self, index: int) -> int:
+        """The highest microsecond value counted in bucket index."""
+
+        if index < 2 * self._half:
+            return index
+        shift = (index // self._half) - 1
+        mantissa = index - shift * self._half
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, seconds: float) -> None:
+        """Count a latency."""
+
+        index = self._index(max(int(seconds * 1e6), 0))
+        counts = self.counts
+        if index >= len(counts):
+            counts.extend([0] * (index + 1 - len(counts)))
+        counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """Add the counts of a histogram with the same precision."""
+
+        if other.precision_bits != self.precision_bits:
+            raise ValueError("Histograms differ in precision")
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for index, n in enumerate(other.counts):
+            self.counts[index] += n
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        """The latency, in seconds, below which p percent of the calls were.
+
+        Returns the upper bound of the bucket, capped at the maximum. 0 if
+        nothing was recorded.
+        """
+
+        if not 0 <= p <= 100:
+            raise ValueError("p must be between 0 and 100")
+        if not self.count:
+            return 0.0
+        rank = max(1, int(round(p / 100 * self.count)))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self._upper(index) / 1e6, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        """The count and the common percentiles, in seconds."""
+
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "min": self.min if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "p999": self.percentile(99.9),
+            "max": self.max,
+        }
+
+
+class Instrumentation(object):
+    """Record API calls in latency histograms, callbacks and spans.
+
+    Safe to share between Sbc objects and threads.
+    """
+
+    def __init__(self, precision_bits: int = 7, tracer=None) -> None:
+        """Initialize an Instrumentation object.
+
+        Args:
+            precision_bits: The precision of the histograms. See
+                LatencyHistogram.
+            tracer: An OpenTelemetry tracer to create a span per API call
+                with. See use_opentelemetry().
+        """
+
+        self.precision_bits = precision_bits
+        self.tracer = tracer
+        self.callbacks: List[Callable[[RequestRecord], None]] = list()
+        self._histograms: Dict[Tuple[str, str], LatencyHistogram] = dict()
+        self._lock = threading.Lock()
+
+    def use_opentelemetry(self, name: str = "sbc_rest_client") -> None:
+        """Create OpenTelemetry spans with the globally configured tracer
+        provider.
+
+        Raises:
+            ImportError: opentelemetry-api is not installed.
+        """
+
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            raise ImportError(
+                "OpenTelemetry spans require opentelemetry-api. "
+                "pip install opentelemetry-api"
+            ) from None
+        self.tracer = trace.get_tracer(name)
+
+    def add_callback(self, callback: Callable[[RequestRecord], None]
+                     ) -> None:
+        """Call callback with the RequestRecord of every API call.
+
+        Callbacks run in the thread that sent the call, so keep them short.
+        """
+
+        self.callbacks.append(callback)
+
+    def histogram(self, host: str, endpoint: str) -> LatencyHistogram:
+        """The histogram of an endpoint of a host. Created on first use."""
+
+        key = (host, endpoint)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(
+                    key, LatencyHistogram(self.precision_bits)
+                )
+        return histogram
+
+    def observe(self, host: str, endpoint: str, seconds: float) -> None:
+        """Record a latency in the histogram of host and endpoint."""
+
+        histogram = self.histogram(host, endpoint)
+        with self._lock:
+            histogram.record(seconds)
+
+    def measure(self, host: str, method: str, url: str,
+                send: Callable[[], "requests.Response"],
+                request_bytes: int = 0, stream: bool = False
+                ) -> "requests.Response":
+        """Send an API call with send() and record it.
+
+        Args:
+            host: The host of the SBC.
+            method: The HTTP method.
+            url: The URL of the API call.
+            send: Sends the call and returns the response.
+            request_bytes: The size of the request body.
+            stream: The response is streamed. Its size is taken from the
+                Content-Length header, so the body is not read here.
+
+        Returns:
+            The response returned by send().
+        """
+
+        # Imported here, transport imports requests
+        from sbc_rest_client.transport import (
+            connection_timings, reset_connection_timings
+        )
+        reset_connection_timings()
+        start = time.time()
+        started = time.perf_counter()
+        r = error = None
+        try:
+            r = send()
+            return r
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            connect, tls = connection_timings()
+            if r is None:
+                status_code, response_bytes, server = None, 0, 0.0
+            else:
+                status_code = r.status_code
+                server = r.elapsed.total_seconds()
+                if stream:
+                    response_bytes = int(
+                        r.headers.get("Content-Length") or 0
+                    )
+                else:
+                    response_bytes = len(r.content)
+            self.add(RequestRecord(
+                host, method, endpoint_template(url), status_code,
+                request_bytes, response_bytes, connect, tls, server,
+                duration, start, error
+            ))
+
+    def add(self, record: RequestRecord) -> None:
+        """Record a RequestRecord in histograms, callbacks and a span."""
+
+        self.observe(record.host, record.endpoint, record.duration)
+        for callback in self.callbacks:
+            callback(record)
+        if self.tracer is not None:
+            self._span(record)
+
+    def _span(self, record: RequestRecord) -> None:
+        start_ns = int(record.start * 1e9)
+        span = self.tracer.start_span(
+            "{} {}".format(record.method, record.endpoint),
+            start_time=start_ns,
+            attributes={
+                "http.request.method": record.method,
+                "server.address": record.host,
+                "url.template": record.endpoint,
+                "http.response.status_code": record.status_code or 0,
+                "http.request.body.size": record.request_bytes,
+                "http.response.body.size": record.response_bytes,
+                "sbc.connect_seconds": record.connect,
+                "sbc.tls_seconds": record.tls,
+                "sbc.server_seconds": record.server,
+            }
+        )
+        if record.error is not None:
+            span.record_exception(record.error)
+        span.end(end_time=start_ns + int(record.duration * 1e9))
+
+    def summary(self) -> "list[dict]":
+        """The histograms as dicts with host, endpoint, count and
+        percentiles, slowest p99 first.
+        """
+
+        with self._lock:
+            rows = [
+                dict(host=host, endpoint=endpoint, **histogram.to_dict())
+                for (host, endpoint), histogram in self._histograms.items()
+            ]
+        rows.sort(key=lambda row: row["p99"], reverse=True)
+        return rows
+
+    def reset(self) -> None:
+        """Drop all histograms."""
+
+        with self._lock:
+            self._histograms.clear()
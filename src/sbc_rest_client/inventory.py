@@ -0,0 +1,43 @@
+"""Read SBC inventories and turn the results of Sbc calls into JSON types.
+
+Shared by the console scripts: sbcctl, sbc-exporter and sbc-daemon. Only the
+standard library is imported, so the scripts start fast.
+"""
+
+from typing import Any, List
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+def read_inventory(path: str) -> List[str]:
+    """Read hosts from an inventory file, one per line. # starts a comment.
+    """
+
+    hosts = list()
+    with open(path) as f:
+        for line in f:
+            host = line.split("#", 1)[0].strip()
+            if host:
+                hosts.append(host)
+    return hosts
+
+
+def jsonable(value: Any) -> Any:
+    """Turn the return value of an Sbc call into JSON types."""
+
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [jsonable(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): jsonable(v) for k, v in value.items()}
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    slots = getattr(type(value), "__slots__", None)
+    if slots:
+        return {
+            name: jsonable(getattr(value, name))
+            for name in slots if not name.startswith("_")
+        }
+    return str(value)
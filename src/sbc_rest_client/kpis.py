@@ -0,0 +1,116 @@
+"""Typed snapshots of the KPI statistics of a Session Border Controller.
+
+One GET on statistics/kpis?type=globalSessions returns all global session
+KPIs. A GlobalSessionsSnapshot holds every field of that response as a
+number, so reading several KPIs costs a single API call.
+"""
+
+import time
+from typing import Dict, Iterator, Union
+
+from sbc_rest_client.parsing import parse
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+Number = Union[int, float]
+
+
+def _to_number(text: Union[str, None]) -> Union[Number, str, None]:
+    """Convert the text of a KPI field to an int or a float.
+
+    Text that is not numeric is returned as is.
+    """
+
+    if text is None:
+        return None
+    text = text.strip()
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+class GlobalSessionsSnapshot(object):
+    """The global session KPIs of a Session Border Controller at one moment.
+
+    Fields are accessed by the name of their XML element. E.g.,
+    snapshot["sysGlobalCPS"] or snapshot.sysGlobalCPS
+    """
+
+    __slots__ = ("host", "timestamp", "fields")
+
+    def __init__(self, host: str, fields: Dict[str, Union[Number, str]],
+                 timestamp: Union[float, None] = None) -> None:
+        """Initialize a GlobalSessionsSnapshot object.
+
+        Args:
+            host: The host the KPIs were fetched from.
+            fields: The KPI field names mapped to their values.
+            timestamp: The time.monotonic() timestamp of the fetch. Defaults
+                to now.
+        """
+
+        self.host = host
+        self.fields = fields
+        self.timestamp = time.monotonic() if timestamp is None else timestamp
+
+    @classmethod
+    def from_xml(cls, host: str, content: bytes) -> "GlobalSessionsSnapshot":
+        """Create a snapshot from a statistics/kpis response body.
+
+        Every element under /response/data that has no child elements is a
+        field.
+        """
+
+        from lxml import etree
+        tree = parse(content)
+        fields = dict()
+        for data in tree.iterfind("data"):
+            for node in data.iter(etree.Element):
+                if len(node) == 0 and node is not data:
+                    fields.setdefault(node.tag, _to_number(node.text))
+        return cls(host, fields)
+
+    @property
+    def age(self) -> float:
+        """The number of seconds since the snapshot was taken."""
+
+        return time.monotonic() - self.timestamp
+
+    @property
+    def cps(self) -> Number:
+        """The global calls per second."""
+
+        return self.fields["sysGlobalCPS"]
+
+    @property
+    def con_sessions(self) -> Number:
+        """The global number of connected sessions."""
+
+        return self.fields["sysGlobalConSessions"]
+
+    def __getitem__(self, name: str) -> Union[Number, str]:
+        return self.fields[name]
+
+    def __getattr__(self, name: str) -> Union[Number, str]:
+        try:
+            return self.fields[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.fields
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.fields)
+
+    def __repr__(self) -> str:
+        return "{cls}(host={host!r}, fields={fields!r})".format(
+            cls=type(self).__name__, host=self.host, fields=self.fields
+        )
@@ -0,0 +1,221 @@
+"""Cache the metadata of configuration element types.
+
+The metadata of an element type, its attributes and which of them are key
+attributes, only changes when the software of the SBC is upgraded. A
+MetadataCache keeps it in memory, and optionally in a JSON file, keyed by
+host, SBC software version, REST API version and element type.
+
+Metadata cached without a software version is kept in memory only. It is
+never written to, or read from, the file, since nothing would tell it apart
+from the metadata of the same host after an upgrade.
+
+Example:
+
+    from sbc_rest_client.metadata import MetadataCache
+    from sbc_rest_client.sbc import Sbc
+
+    cache = MetadataCache("~/.cache/sbc_rest_client/metadata.json")
+    sbc = Sbc(
+        "admin", "password", "sbc.example.com",
+        metadata_cache=cache, software_version="SCZ8.3.0 MR-1 Patch 9"
+    )
+    sbc.prefetch_metadata()
+    cache.save()
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+from typing import Dict, Iterable, Tuple, Union
+
+from sbc_rest_client.parsing import parse
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+CacheKey = Tuple[str, str, str, str]
+
+
+class ElementTypeMetadata(object):
+    """The attribute names and key attributes of a configuration element type.
+    """
+
+    __slots__ = ("element_type", "attributes", "key_attributes")
+
+    def __init__(self, element_type: str, attributes: Iterable[str],
+                 key_attributes: Iterable[str]) -> None:
+        """Initialize an ElementTypeMetadata object.
+
+        Attribute names are interned, so every object that refers to them
+        shares the same string objects.
+
+        Args:
+            element_type: The element type. E.g., session-group
+            attributes: The names of all attributes, in metadata order.
+            key_attributes: The names of the key attributes.
+        """
+
+        self.element_type = sys.intern(element_type)
+        self.attributes = tuple(sys.intern(name) for name in attributes)
+        self.key_attributes = tuple(
+            sys.intern(name) for name in key_attributes
+        )
+
+    @classmethod
+    def from_xml(cls, element_type: str, content: bytes
+                 ) -> "ElementTypeMetadata":
+        """Create the metadata from a configuration/elementTypes/metadata
+        response body.
+        """
+
+        tree = parse(content)
+        attributes = list()
+        key_attributes = list()
+        for metadata in tree.iterfind("data/attributeMetadata"):
+            name = metadata.findtext("name")
+            attributes.append(name)
+            if metadata.findtext("key") == "true":
+                key_attributes.append(name)
+        return cls(element_type, attributes, key_attributes)
+
+    def to_dict(self) -> dict:
+        return {
+            "element_type": self.element_type,
+            "attributes": list(self.attributes),
+            "key_attributes": list(self.key_attributes),
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "ElementTypeMetadata":
+        return cls(d["element_type"], d["attributes"], d["key_attributes"])
+
+    def __repr__(self) -> str:
+        return "{cls}({element_type!r}, key_attributes={keys!r})".format(
+            cls=type(self).__name__, element_type=self.element_type,
+            keys=self.key_attributes
+        )
+
+
+class MetadataCache(object):
+    """An in-memory cache of element type metadata, optionally on disk.
+
+    The cache is safe to share between Sbc objects and threads.
+    """
+
+    def __init__(self, path: Union[str, None] = None) -> None:
+        """Initialize a MetadataCache object.
+
+        Args:
+            path: A JSON file to persist the cache in. It is loaded if it
+                exists. Call save() to write it. None keeps the cache in
+                memory only. Only metadata cached with a software version is
+                persisted.
+        """
+
+        self.path = os.path.expanduser(path) if path else None
+        self._entries: Dict[CacheKey, ElementTypeMetadata] = dict()
+        self._lock = threading.Lock()
+        if self.path and os.path.exists(self.path):
+            self.load()
+
+    @staticmethod
+    def _key(host: str, software_version: Union[str, None],
+             api_version: str, element_type: str) -> CacheKey:
+        return (host, software_version or "", api_version, element_type)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, host: str, software_version: Union[str, None],
+            api_version: str, element_type: str
+            ) -> Union[ElementTypeMetadata, None]:
+        """Return the cached metadata or None if it is not cached."""
+
+        key = self._key(host, software_version, api_version, element_type)
+        return self._entries.get(key)
+
+    def put(self, host: str, software_version: Union[str, None],
+            api_version: str, metadata: ElementTypeMetadata) -> None:
+        """Cache the metadata of an element type."""
+
+        key = self._key(
+            host, software_version, api_version, metadata.element_type
+        )
+        with self._lock:
+            self._entries[key] = metadata
+
+    def invalidate(
+            self, host: Union[str, None] = None,
+            software_version: Union[str, None] = None,
+            api_version: Union[str, None] = None,
+            element_type: Union[str, None] = None
+        ) -> int:
+        """Remove cached metadata.
+
+        Entries matching all of the given arguments are removed. Without
+        arguments the whole cache is cleared.
+
+        Returns:
+            The number of entries removed.
+        """
+
+        wanted = (host, software_version, api_version, element_type)
+        with self._lock:
+            stale = [
+                key for key in self._entries
+                if all(w is None or w == k for w, k in zip(wanted, key))
+            ]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def load(self) -> None:
+        """Load the cache from its file, replacing the entries in memory."""
+
+        with open(self.path) as f:
+            entries = json.load(f)
+        loaded = dict()
+        for entry in entries:
+            if not entry["software_version"]:
+                continue
+            metadata = ElementTypeMetadata.from_dict(entry)
+            key = self._key(
+                entry["host"], entry["software_version"],
+                entry["api_version"], metadata.element_type
+            )
+            loaded[key] = metadata
+        with self._lock:
+            self._entries = loaded
+
+    def save(self) -> None:
+        """Write the cache to its file.
+
+        The file is replaced atomically, so a concurrent reader never sees a
+        partially written cache.
+        """
+
+        if not self.path:
+            raise ValueError("The cache has no path to save to")
+        with self._lock:
+            entries = [
+                dict(
+                    host=host, software_version=software_version,
+                    api_version=api_version, **metadata.to_dict()
+                )
+                for (host, software_version, api_version, _), metadata
+                in self._entries.items()
+                if software_version
+            ]
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
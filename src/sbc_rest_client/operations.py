@@ -0,0 +1,201 @@
+"""Poll asynchronous configuration operations until they finish.
+
+Verify, save and activate are asynchronous on the SBC. The API call returns
+a link to poll for the state of the operation. An OperationPoller polls that
+link with exponential backoff and jitter until the operation succeeds, fails
+or a deadline passes. Small configurations finish in well under a second, so
+the first polls come quickly. Large configurations are polled less often.
+
+Connection errors, 5xx and 429 responses are polled through. Any other 4xx
+response ends polling right away, asking again would get the same answer.
+Polling goes on only while the operation reports one of the in-progress
+states. Any other status ends it: success, a failure, or a status this
+module does not know, e.g., rejected or cancelled, which is logged.
+"""
+
+import logging
+import random
+import time
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Union
+
+from sbc_rest_client import parsing
+
+if TYPE_CHECKING:
+    import requests
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+logger = logging.getLogger(__name__)
+
+
+SUCCESS = "success"
+FAILURE_STATES = frozenset(("fail", "failed", "failure", "error", "aborted"))
+# Compared in lower case
+IN_PROGRESS_STATES = frozenset((
+    "inprogress", "in-progress", "in progress", "pending", "queued",
+    "running", "started",
+))
+# 4xx status codes of status requests that are worth sending again
+RETRY_CLIENT_ERRORS = frozenset((429,))
+
+
+class OperationState(object):
+    """The outcome of polling a configuration operation."""
+
+    __slots__ = ("operation", "status", "duration", "polls")
+
+    def __init__(self, operation: str, status: Union[str, None],
+                 duration: float, polls: int) -> None:
+        """Initialize an OperationState object.
+
+        Args:
+            operation: The operation. E.g., verify, save, activate
+            status: The last status reported by the SBC, or None if none was
+                reported.
+            duration: The number of seconds from the start of polling until
+                the operation finished or the deadline passed.
+            polls: The number of status requests sent.
+        """
+
+        self.operation = operation
+        self.status = status
+        self.duration = duration
+        self.polls = polls
+
+    @property
+    def succeeded(self) -> bool:
+        return self.status == SUCCESS
+
+    def __bool__(self) -> bool:
+        return self.succeeded
+
+    def __repr__(self) -> str:
+        return (
+            "{cls}(operation={operation!r}, status={status!r}, "
+            "duration={duration:.3f}, polls={polls})"
+        ).format(
+            cls=type(self).__name__, operation=self.operation,
+            status=self.status, duration=self.duration, polls=self.polls
+        )
+
+
+def parse_operation_state(content: bytes
+                          ) -> "tuple[Union[str, None], Union[str, None]]":
+    """Read the operation and status from an operation status response.
+
+    Only the operationState node is looked at.
+
+    Returns:
+        An (operation, status) tuple. Either is None if it is missing.
+    """
+
+    from lxml import etree
+    try:
+        tree = parsing.parse(content)
+    except etree.XMLSyntaxError:
+        return None, None
+    states = parsing.OPERATION_STATE(tree)
+    if not states:
+        return None, None
+    return states[0].findtext("operation"), states[0].findtext("status")
+
+
+class OperationPoller(object):
+    """Poll an operation status link with exponential backoff and jitter."""
+
+    def __init__(
+            self, initial_delay: float = 0.2, max_delay: float = 3.0,
+            multiplier: float = 1.6, jitter: float = 0.2,
+            timeout: float = 120.0,
+            in_progress_states: Iterable[str] = IN_PROGRESS_STATES
+        ) -> None:
+        """Initialize an OperationPoller object.
+
+        Args:
+            initial_delay: The number of seconds before the first poll.
+            max_delay: The maximum number of seconds between polls.
+            multiplier: The factor the delay grows with after every poll.
+            jitter: The fraction by which every delay is randomly shortened
+                or lengthened. Spreads polls of concurrent clients.
+            timeout: The number of seconds after which polling gives up.
+            in_progress_states: The statuses of an operation that is still
+                running, compared in lower case. Any other status ends
+                polling.
+        """
+
+        if initial_delay <= 0 or max_delay < initial_delay:
+            raise ValueError("0 < initial_delay <= max_delay is required")
+        if multiplier < 1:
+            raise ValueError("multiplier must be at least 1")
+        if not 0 <= jitter < 1:
+            raise ValueError("jitter must be between 0 and 1")
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.timeout = timeout
+        self.in_progress_states = frozenset(
+            state.lower() for state in in_progress_states
+        )
+
+    def delays(self) -> Iterator[float]:
+        """Generate the delays between polls."""
+
+        delay = self.initial_delay
+        while True:
+            spread = delay * self.jitter
+            yield delay + random.uniform(-spread, spread)
+            delay = min(delay * self.multiplier, self.max_delay)
+
+    def poll(self, fetch: Callable[[], "requests.Response"], operation: str
+             ) -> OperationState:
+        """Poll until the operation succeeds, fails or the timeout passes.
+
+        Args:
+            fetch: A callable that requests the operation status and returns
+                the requests.Response.
+            operation: The operation polled for. E.g., verify, save, activate
+
+        Returns:
+            An OperationState. It is truthy if the operation succeeded. Its
+            status is None if polling ended on a 4xx response, or the
+            timeout passed before a status was reported. If the timeout
+            passed while the operation was running, it is the in-progress
+            status.
+        """
+
+        import requests
+        start = time.monotonic()
+        deadline = start + self.timeout
+        status = None
+        polls = 0
+        for delay in self.delays():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(delay, remaining))
+            polls += 1
+            try:
+                r = fetch()
+            except requests.exceptions.RequestException:
+                continue
+            if r.status_code != 200:
+                if (400 <= r.status_code < 500
+                        and r.status_code not in RETRY_CLIENT_ERRORS):
+                    break
+                continue
+            reported, reported_status = parse_operation_state(r.content)
+            if reported != operation or not reported_status:
+                continue
+            status = reported_status
+            if status.lower() in self.in_progress_states:
+                continue
+            if status != SUCCESS and status not in FAILURE_STATES:
+                logger.warning("Unknown status of %s: %r, not polled further",
+                               operation, status)
+            break
+        return OperationState(
+            operation, status, time.monotonic() - start, polls
+        )
@@ -0,0 +1,128 @@
+"""Parse REST API responses.
+
+Every response of the REST API is an XML document like:
+
+    <response>
+        <data>...</data>
+        <messages/>
+        <links><link>...</link></links>
+        <errors><error><reason>...</reason><message>...</message></error></errors>
+    </response>
+
+This module is the one place responses are parsed:
+
+- parse() parses the raw response bytes with a reusable XMLParser per
+  thread. There is no decoding to str and encoding back to bytes, and the
+  parser does not resolve entities or touch the network.
+- The XPath expressions for the fields the client reads are compiled once,
+  on first use.
+- parse_error() extracts the errors of an error response the same way for
+  every API call.
+
+lxml is imported when the first response is parsed, not when this module is
+imported, so importing the client stays cheap.
+"""
+
+import threading
+from typing import TYPE_CHECKING, Union
+
+if TYPE_CHECKING:
+    from lxml import etree
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+_local = threading.local()
+
+
+def parser() -> "etree.XMLParser":
+    """The XMLParser of the current thread.
+
+    lxml parsers can be reused, but not by several threads at the same time.
+    """
+
+    p = getattr(_local, "parser", None)
+    if p is None:
+        from lxml import etree
+        p = etree.XMLParser(resolve_entities=False, no_network=True)
+        _local.parser = p
+    return p
+
+
+def parse(content: bytes) -> "etree._Element":
+    """Parse a response body.
+
+    Raises:
+        etree.XMLSyntaxError: content is not well-formed XML.
+    """
+
+    from lxml import etree
+    return etree.fromstring(content, parser())
+
+
+# The XPath expressions, compiled by __getattr__() on first use and then
+# kept as module attributes. string() returns "" if the node is missing.
+_XPATHS = {
+    "ACCESS_TOKEN": "string(/response/data//accessToken)",
+    "ROLE": "string(/response/data//role)",
+    "LATEST_VERSION": "string(/response/data//latestVersion)",
+    "VERSIONS": "/response/data//version/text()",
+    "LINK": "string(/response/links/link)",
+    "OPERATION_STATE": "/response/data/operationState",
+}
+
+
+def __getattr__(name: str) -> "etree.XPath":
+    """Compile an XPath expression of _XPATHS, e.g., parsing.ROLE, on first
+    use.
+    """
+
+    expression = _XPATHS.get(name)
+    if expression is None:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name)
+        )
+    from lxml import etree
+    xpath = etree.XPath(expression)
+    # Found directly from now on, __getattr__ is not called again
+    globals()[name] = xpath
+    return xpath
+
+
+def first_text(content: bytes, xpath: "etree.XPath") -> Union[str, None]:
+    """Parse content and evaluate a string() XPath on it.
+
+    Returns:
+        The text, or None if the node is missing, empty or content is not
+        XML.
+    """
+
+    from lxml import etree
+    try:
+        return xpath(parse(content)) or None
+    except etree.XMLSyntaxError:
+        return None
+
+
+def parse_error(content: bytes) -> Union[str, None]:
+    """Extract the error message from an SBC error response body.
+
+    Returns:
+        The messages of the errors node joined by "; ", or None if there
+        are none.
+    """
+
+    if not content:
+        return None
+    from lxml import etree
+    try:
+        tree = parse(content)
+    except etree.XMLSyntaxError:
+        return None
+    messages = [
+        error.findtext("message") or error.findtext("reason") or ""
+        for error in tree.iterfind("errors/error")
+    ]
+    messages = [m for m in messages if m]
+    return "; ".join(messages) if messages else None
@@ -0,0 +1,302 @@
+"""Keep the load on the management plane of an SBC within what it can take.
+
+The REST server of an SBC handles few requests at the same time. Fanning out
+from many threads makes requests queue up on the SBC until they time out,
+including the polls of running activate operations. A HostLimiter sits in
+front of every API call to one SBC and combines:
+
+- a token bucket, that limits the number of calls per second and allows
+  short bursts,
+- a cap on the number of calls in flight,
+- adaptation of both, additive increase and multiplicative decrease like TCP
+  congestion control. A 429 or 503 response, a timeout or a call slower than
+  latency_target shrinks the cap, once per round of calls in flight. Calls
+  that are fast enough grow it again by about one per round, up to
+  max_in_flight. Growing past the cap at which the SBC was overloaded before
+  is only tried once per probe_interval. The rate follows the cap. A
+  Retry-After header pauses all calls until then.
+
+The session of an Sbc object with a limiter does not retry 429 and 503
+responses itself, so every attempt takes a token and a slot and counts as
+an overload.
+
+Share one HostLimiter by every Sbc object for the same host, see
+shared_limiter(). To share it between processes, send their calls through
+one sbc-daemon, see sbc_rest_client.daemon.
+
+Example:
+
+    from sbc_rest_client.ratelimit import shared_limiter
+
+    sbcs = [
+        Sbc("admin", "password", "sbc1.example.com", lazy_login=True,
+            limiter=shared_limiter("sbc1.example.com", rate=20))
+        for _ in range(10)
+    ]
+"""
+
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Union
+
+if TYPE_CHECKING:
+    import requests
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+# Responses that mean the SBC is overloaded
+OVERLOAD_STATUSES = frozenset((429, 503))
+
+
+def _retry_after(r: "requests.Response") -> float:
+    """The number of seconds in the Retry-After header of r, or 0."""
+
+    value = r.headers.get("Retry-After")
+    if not value:
+        return 0.0
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(),
+                   0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class HostLimiter(object):
+    """An adaptive token bucket and concurrency cap for one SBC.
+
+    Safe to share between Sbc objects and threads.
+    """
+
+    def __init__(
+            self, rate: Union[float, None] = 20.0, burst: int = 10,
+            max_in_flight: int = 8, min_in_flight: int = 1,
+            min_rate: float = 1.0, latency_target: float = 2.0,
+            backoff: float = 0.5, probe_interval: float = 5.0,
+            adaptive: bool = True
+        ) -> None:
+        """Initialize a HostLimiter object.
+
+        Args:
+            rate: The maximum number of calls per second. None only caps
+                the calls in flight.
+            burst: The number of calls that may be sent at once after a
+                quiet period, the size of the bucket.
+            max_in_flight: The maximum number of calls in flight.
+            min_in_flight: The cap never shrinks below this.
+            min_rate: The rate never shrinks below this, or below rate if
+                that is lower. The rate shrinks and grows with the cap on
+                calls in flight.
+            latency_target: Calls slower than this many seconds count as a
+                sign of overload.
+            backoff: The factor the cap and the rate are multiplied with on
+                overload.
+            probe_interval: The number of seconds after an overload before
+                the cap may grow past the cap at which it happened.
+            adaptive: Adapt the cap and the rate. False keeps them fixed.
+        """
+
+        if max_in_flight < 1 or not 1 <= min_in_flight <= max_in_flight:
+            raise ValueError("1 <= min_in_flight <= max_in_flight required")
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be positive")
+        if not 0 < backoff < 1:
+            raise ValueError("backoff must be between 0 and 1")
+        self.max_rate = rate
+        self.burst = max(burst, 1)
+        self.max_in_flight = max_in_flight
+        self.min_in_flight = min_in_flight
+        self.min_rate = min_rate if rate is None else min(min_rate, rate)
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.probe_interval = probe_interval
+        self.adaptive = adaptive
+        # The current cap and rate
+        self.limit = float(max_in_flight)
+        self.rate = rate
+        self.in_flight = 0
+        # Counters, for monitoring
+        self.calls = 0
+        self.overloads = 0
+        self.wait_time = 0.0
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self._paused_until = 0.0
+        # Sequence numbers of calls, to decrease once per round
+        self._sent = 0
+        self._decreased = 0
+        # The cap at the last overload, and when to try to pass it again
+        self._ceiling = float("inf")
+        self._probe_at = 0.0
+        self._cond = threading.Condition(threading.Lock())
+
+    def _refill(self, now: float) -> None:
+        if self.rate is not None:
+            self._tokens = min(
+                self._tokens + (now - self._refilled) * self.rate,
+                float(self.burst)
+            )
+        self._refilled = now
+
+    def acquire(self) -> int:
+        """Wait for a token and a free slot, and take them.
+
+        Every acquire() must be followed by a release().
+
+        Returns:
+            The sequence number of the call, pass it on to release().
+        """
+
+        start = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self.in_flight >= int(self.limit):
+                    # Woken up by release()
+                    wait = None
+                elif self.rate is not None and self._tokens < 1:
+                    wait = (1 - self._tokens) / self.rate
+                else:
+                    break
+                self._cond.wait(wait)
+            if self.rate is not None:
+                self._tokens -= 1
+            self.in_flight += 1
+            self.calls += 1
+            self.wait_time += time.monotonic() - start
+            self._sent += 1
+            return self._sent
+
+    def release(self, sequence: int, latency: float,
+                overloaded: bool = False, retry_after: float = 0.0) -> None:
+        """Give back the slot of a finished call and adapt to how it went.
+
+        Args:
+            sequence: What acquire() returned for the call.
+            latency: The number of seconds the call took.
+            overloaded: The SBC signalled overload. E.g., a 503 response or
+                a timeout.
+            retry_after: The SBC asked to wait this many seconds before
+                sending another call.
+        """
+
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if retry_after:
+                self._paused_until = max(self._paused_until,
+                                         now + retry_after)
+            if self.adaptive:
+                if overloaded or latency > self.latency_target:
+                    self._decrease(sequence, now)
+                else:
+                    self._increase(now)
+            self._cond.notify_all()
+
+    def _decrease(self, sequence: int, now: float) -> None:
+        """Multiplicative decrease. Only for calls sent after the previous
+        decrease, the calls that were in flight with it tell nothing new.
+        """
+
+        self.overloads += 1
+        if sequence <= self._decreased:
+            return
+        self._decreased = self._sent
+        self._ceiling = int(self.limit)
+        self._probe_at = now + self.probe_interval
+        self._set_limit(self.limit * self.backoff)
+
+    def _increase(self, now: float) -> None:
+        """Additive increase. About one more slot per round of calls."""
+
+        limit = self.limit + 1 / self.limit
+        if self.limit >= self.max_in_flight or (
+                int(limit) >= self._ceiling and now < self._probe_at):
+            return
+        self._set_limit(limit)
+
+    def _set_limit(self, limit: float) -> None:
+        self.limit = min(max(limit, self.min_in_flight), self.max_in_flight)
+        if self.rate is not None:
+            self.rate = max(
+                self.max_rate * self.limit / self.max_in_flight,
+                self.min_rate
+            )
+
+    def call(self, send: Callable[[], "requests.Response"]
+             ) -> "requests.Response":
+        """Send a call with send() within the limits.
+
+        Streamed responses give back their slot when the headers are in,
+        not when the body is read.
+        """
+
+        import requests
+        sequence = self.acquire()
+        start = time.monotonic()
+        r = None
+        overloaded = False
+        try:
+            r = send()
+            return r
+        except requests.exceptions.Timeout:
+            overloaded = True
+            raise
+        finally:
+            retry_after = 0.0
+            if r is not None and r.status_code in OVERLOAD_STATUSES:
+                overloaded = True
+                retry_after = _retry_after(r)
+            self.release(
+                sequence, time.monotonic() - start, overloaded, retry_after
+            )
+
+    def __repr__(self) -> str:
+        return (
+            "{cls}(in_flight={in_flight}, limit={limit:.1f}, rate={rate}, "
+            "calls={calls}, overloads={overloads}, "
+            "wait_time={wait_time:.3f})"
+        ).format(
+            cls=type(self).__name__, in_flight=self.in_flight,
+            limit=self.limit,
+            rate=None if self.rate is None else round(self.rate, 1),
+            calls=self.calls, overloads=self.overloads,
+            wait_time=self.wait_time
+        )
+
+
+_shared_limiters: Dict[str, HostLimiter] = dict()
+_shared_limiters_lock = threading.Lock()
+
+
+def shared_limiter(host: str, **kwargs) -> HostLimiter:
+    """Get the HostLimiter shared by all users of host.
+
+    Args:
+        host: The hostname or ip-address of the SBC.
+        kwargs: Passed on to HostLimiter when it is created on first use.
+            Ignored after that.
+    """
+
+    with _shared_limiters_lock:
+        limiter = _shared_limiters.get(host)
+        if limiter is None:
+            limiter = HostLimiter(**kwargs)
+            _shared_limiters[host] = limiter
+        return limiter
+
+
+def reset_shared_limiters() -> None:
+    """Forget all shared limiters."""
+
+    with _shared_limiters_lock:
+        _shared_limiters.clear()
@@ -0,0 +1,401 @@
+"""Cache configuration reads, so unchanged configuration is not downloaded
+again.
+
+A reconciliation loop reads the same configuration elements over and over,
+and mostly nothing changed since the previous round. A ResponseCache keeps
+the responses of configuration GETs in memory, and optionally in a
+directory, keyed by URL.
+
+- Responses with an ETag or a Last-Modified header are revalidated with a
+  conditional request. The SBC answers 304 Not Modified without a body if
+  nothing changed.
+- Responses without them are reused as they are, until the configuration is
+  changed through an Sbc object that uses the cache. update, add and delete
+  of configuration elements and activate_config() invalidate the responses
+  of the host. Changes made by other clients, e.g., the Web GUI, are not
+  noticed, pass max_age to bound how long such responses are reused.
+
+A cache directory is shared by the processes that use it, invalidations
+included.
+
+Example:
+
+    from sbc_rest_client.responsecache import ResponseCache
+
+    cache = ResponseCache("~/.cache/sbc_rest_client/responses")
+    sbc = Sbc("admin", "password", "sbc.example.com", response_cache=cache)
+    sbc.get_config_elements("realm-config")
+    # From the cache, or a 304 Not Modified
+    sbc.get_config_elements("realm-config")
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Dict, List, Union
+
+if TYPE_CHECKING:
+    import requests
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+class CachedResponse(object):
+    """The body and validators of a cached 200 OK response."""
+
+    __slots__ = ("host", "url", "content", "etag", "last_modified", "sent")
+
+    def __init__(self, host: str, url: str, content: bytes,
+                 etag: Union[str, None] = None,
+                 last_modified: Union[str, None] = None,
+                 sent: float = 0.0) -> None:
+        """Initialize a CachedResponse object.
+
+        Args:
+            host: The SBC the response came from.
+            url: The URL of the request.
+            content: The body of the response.
+            etag: The ETag header of the response.
+            last_modified: The Last-Modified header of the response.
+            sent: When the request was sent, in seconds since the epoch. A
+                response to a request sent before an invalidation is stale.
+        """
+
+        self.host = host
+        self.url = url
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.sent = sent
+
+    @property
+    def validators(self) -> Dict[str, str]:
+        """The headers of a conditional request for the response."""
+
+        headers = dict()
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def response(self, revalidation: Union["requests.Response", None] = None
+                 ) -> "requests.Response":
+        """A requests.Response with the cached body.
+
+        Args:
+            revalidation: The 304 Not Modified response that revalidated
+                the cached response. Its elapsed time is taken over.
+        """
+
+        import datetime
+        import io
+        import requests
+
+        r = requests.Response()
+        r.status_code = 200
+        r.reason = "OK"
+        r.url = self.url
+        r.headers["Content-Type"] = "application/xml"
+        r._content = self.content
+        # For streaming readers, e.g., Sbc.iter_config_elements()
+        r.raw = io.BytesIO(self.content)
+        r.elapsed = (
+            revalidation.elapsed if revalidation is not None
+            else datetime.timedelta()
+        )
+        r.from_cache = True
+        return r
+
+    def header(self) -> dict:
+        return {
+            "host": self.host, "url": self.url, "etag": self.etag,
+            "last_modified": self.last_modified, "sent": self.sent,
+        }
+
+
+class _Tee(object):
+    """Read a streamed response body and cache it once it is read to the
+    end.
+    """
+
+    def __init__(self, raw, cache: "ResponseCache", host: str, url: str,
+                 r: "requests.Response", sent: float) -> None:
+        self._raw = raw
+        self._cache = cache
+        self._host = host
+        self._url = url
+        self._r = r
+        self._sent = sent
+        self._chunks: List[bytes] = list()
+
+    def __getattr__(self, name: str):
+        # E.g., close() and release_conn() of the urllib3 response
+        return getattr(self._raw, name)
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._raw.read(size)
+        if data:
+            self._chunks.append(data)
+        elif self._chunks is not None:
+            self._cache.put(
+                self._host, self._url, self._r, self._sent,
+                b"".join(self._chunks)
+            )
+            self._chunks = None
+        return data
+
+
+class ResponseCache(object):
+    """A cache of configuration GET responses, in memory and optionally in a
+    directory.
+
+    The cache is safe to share between Sbc objects and threads.
+    """
+
+    def __init__(self, path: Union[str, None] = None,
+                 max_bytes: int = 64 * 2 ** 20,
+                 max_age: Union[float, None] = None) -> None:
+        """Initialize a ResponseCache object.
+
+        Args:
+            path: A directory to keep the responses in as well. Created if
+                it does not exist. None keeps them in memory only.
+            max_bytes: The number of bytes of response bodies kept in
+                memory. The least recently used responses are dropped
+                first.
+            max_age: The number of seconds a response without an ETag or
+                Last-Modified header is reused. None reuses it until it is
+                invalidated.
+        """
+
+        self.path = os.path.expanduser(path) if path else None
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        # Counters, for monitoring
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._size = 0
+        # host: when its responses were last invalidated
+        self._invalidated: Dict[str, float] = dict()
+        self._lock = threading.Lock()
+
+    # Files
+
+    def _file(self, name: str) -> str:
+        import hashlib
+        return os.path.join(
+            self.path, hashlib.sha256(name.encode()).hexdigest()
+        )
+
+    def _write(self, file: str, data: bytes) -> None:
+        """Replace file atomically, a concurrent reader never sees it
+        partially written.
+        """
+
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, file)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def _invalidated_at(self, host: str) -> float:
+        invalidated = self._invalidated.get(host, 0.0)
+        if self.path:
+            # Other processes invalidate through the directory
+            try:
+                with open(self._file("invalidated:" + host), "rb") as f:
+                    invalidated = max(invalidated, float(f.read()))
+            except (OSError, ValueError):
+                pass
+        return invalidated
+
+    def _load(self, url: str) -> Union[CachedResponse, None]:
+        try:
+            with open(self._file(url), "rb") as f:
+                header = json.loads(f.readline())
+                return CachedResponse(content=f.read(), **header)
+        except (OSError, ValueError, TypeError):
+            return None
+
+    # Memory
+
+    def _remember(self, entry: CachedResponse) -> None:
+        """Keep entry in memory. Call with the lock held."""
+
+        old = self._entries.pop(entry.url, None)
+        if old is not None:
+            self._size -= len(old.content)
+        if len(entry.content) > self.max_bytes:
+            return
+        self._entries[entry.url] = entry
+        self._size += len(entry.content)
+        while self._size > self.max_bytes:
+            _, dropped = self._entries.popitem(last=False)
+            self._size -= len(dropped.content)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # Cache
+
+    def get(self, host: str, url: str) -> Union[CachedResponse, None]:
+        """The cached response to a GET of url, or None.
+
+        Responses to requests sent before the host was last invalidated are
+        not returned.
+        """
+
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+        if entry is None and self.path:
+            entry = self._load(url)
+            if entry is not None:
+                with self._lock:
+                    self._remember(entry)
+        if entry is None:
+            return None
+        if entry.sent <= self._invalidated_at(host):
+            self.discard(url)
+            return None
+        return entry
+
+    def fresh(self, entry: CachedResponse) -> bool:
+        """entry can be used without asking the SBC.
+
+        Only responses without validators, that are at most max_age old.
+        """
+
+        if entry.etag or entry.last_modified:
+            return False
+        return self.max_age is None or time.time() - entry.sent <= self.max_age
+
+    def put(self, host: str, url: str, r: "requests.Response", sent: float,
+            content: Union[bytes, None] = None) -> CachedResponse:
+        """Cache a 200 OK response to a GET of url.
+
+        Args:
+            host: The SBC the response came from.
+            url: The URL of the request.
+            r: The response.
+            sent: When the request was sent, see CachedResponse.
+            content: The body of the response, if r was streamed.
+        """
+
+        entry = CachedResponse(
+            host, url, r.content if content is None else content,
+            r.headers.get("ETag"), r.headers.get("Last-Modified"), sent
+        )
+        with self._lock:
+            self._remember(entry)
+        if self.path:
+            self._write(
+                self._file(url),
+                json.dumps(entry.header()).encode() + b"\n" + entry.content
+            )
+        return entry
+
+    def fetch(self, host: str, url: str,
+              send: Callable[[Union[Dict[str, str], None]],
+                             "requests.Response"],
+              stream: bool = False) -> "requests.Response":
+        """Get url from the cache, revalidate it or send a GET with send().
+
+        Args:
+            host: The SBC.
+            url: The URL to GET.
+            send: Sends the GET, with the conditional request headers it is
+                passed, if any.
+            stream: The body of the response is streamed. The raw body of a
+                200 OK response is decoded, and cached when it has been read
+                to the end.
+
+        Returns:
+            The response. A 200 OK with the cached body for cache hits and
+            responses that were not modified.
+        """
+
+        entry = self.get(host, url)
+        if entry is not None and self.fresh(entry):
+            with self._lock:
+                self.hits += 1
+            return entry.response()
+        sent = time.time()
+        r = send(entry.validators if entry is not None else None)
+        if r.status_code == 304 and entry is not None:
+            r.close()
+            with self._lock:
+                self.revalidated += 1
+            return entry.response(r)
+        with self._lock:
+            self.misses += 1
+        if r.status_code == 200:
+            if stream:
+                r.raw.decode_content = True
+                r.raw = _Tee(r.raw, self, host, url, r, sent)
+            else:
+                self.put(host, url, r, sent)
+        return r
+
+    def discard(self, url: str) -> None:
+        """Remove the cached response to a GET of url."""
+
+        with self._lock:
+            entry = self._entries.pop(url, None)
+            if entry is not None:
+                self._size -= len(entry.content)
+        if self.path:
+            try:
+                os.remove(self._file(url))
+            except FileNotFoundError:
+                pass
+
+    def invalidate(self, host: str) -> None:
+        """Forget the cached responses of host.
+
+        Called when the configuration of host is changed.
+        """
+
+        now = time.time()
+        with self._lock:
+            self._invalidated[host] = now
+            for url in [
+                url for url, entry in self._entries.items()
+                if entry.host == host
+            ]:
+                self._size -= len(self._entries.pop(url).content)
+        if self.path:
+            self._write(self._file("invalidated:" + host), repr(now).encode())
+
+    def clear(self) -> None:
+        """Forget all cached responses, in memory and in the directory."""
+
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+        if self.path:
+            for name in os.listdir(self.path):
+                os.remove(os.path.join(self.path, name))
+
+    def __repr__(self) -> str:
+        return (
+            "{cls}(responses={responses}, bytes={size}, hits={hits}, "
+            "revalidated={revalidated}, misses={misses})"
+        ).format(
+            cls=type(self).__name__, responses=len(self._entries),
+            size=self._size, hits=self.hits, revalidated=self.revalidated,
+            misses=self.misses
+        )
@@ -0,0 +1,112 @@
+"""Structured results of API calls.
+
+Methods of the Sbc class that change something on the SBC, like lock() or
+update_config_element(), return a Result. A Result is truthy if the call
+succeeded, so code like `if not sbc.lock(): ...` works as before, and it
+holds what you need to act on a failure: the status code, the reason, the
+error reported by the SBC and how long the call took.
+
+Example:
+
+    result = sbc.update_config_element(xml_str)
+    if not result:
+        print(result.status_code, result.error)
+"""
+
+from typing import TYPE_CHECKING, Any, Iterable, Union
+
+from sbc_rest_client.parsing import parse_error
+
+if TYPE_CHECKING:
+    import requests
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+class Result(object):
+    """The outcome of an API call."""
+
+    __slots__ = (
+        "action", "ok", "status_code", "reason", "elapsed", "error", "value"
+    )
+
+    def __init__(
+            self, action: str, ok: bool,
+            status_code: Union[int, None] = None,
+            reason: Union[str, None] = None, elapsed: float = 0.0,
+            error: Union[str, None] = None, value: Any = None
+        ) -> None:
+        """Initialize a Result object.
+
+        Args:
+            action: What was done. E.g., Lock config.
+            ok: The call succeeded.
+            status_code: The status code of the response, or None if no
+                response was received.
+            reason: The reason phrase of the response.
+            elapsed: The number of seconds the call took.
+            error: The error reported by the SBC, or the exception raised by
+                requests if no response was received.
+            value: What the call returned, if anything. E.g., the link to
+                poll for a reboot.
+        """
+
+        self.action = action
+        self.ok = ok
+        self.status_code = status_code
+        self.reason = reason
+        self.elapsed = elapsed
+        self.error = error
+        self.value = value
+
+    @classmethod
+    def from_response(cls, action: str, r: "requests.Response",
+                      ok_statuses: Iterable[int] = (200,),
+                      value: Any = None) -> "Result":
+        """Create a Result from a response.
+
+        The error body is only parsed if the call failed.
+        """
+
+        ok = r.status_code in ok_statuses
+        return cls(
+            action, ok, r.status_code, r.reason,
+            r.elapsed.total_seconds(),
+            None if ok else parse_error(r.content), value
+        )
+
+    @classmethod
+    def from_exception(cls, action: str,
+                       e: "requests.exceptions.RequestException"
+                       ) -> "Result":
+        """Create a Result for a call that got no response."""
+
+        return cls(action, False, error=repr(e))
+
+    def __bool__(self) -> bool:
+        return self.ok
+
+    def __str__(self) -> str:
+        """The result as a console message. E.g., Lock config.: Ok!"""
+
+        if self.ok:
+            return "{}: Ok!".format(self.action)
+        if self.status_code is None:
+            return "{}: Nok! {}".format(self.action, self.error)
+        msg = "{}: Nok! Status code = {}. Reason = {}".format(
+            self.action, self.status_code, self.reason
+        )
+        if self.error:
+            msg += ". Error = {}".format(self.error)
+        return msg
+
+    def __repr__(self) -> str:
+        return (
+            "{cls}(action={action!r}, ok={ok}, status_code={status_code}, "
+            "elapsed={elapsed:.3f}, error={error!r})"
+        ).format(
+            cls=type(self).__name__, action=self.action, ok=self.ok,
+            status_code=self.status_code, elapsed=self.elapsed,
+            error=self.error
+        )
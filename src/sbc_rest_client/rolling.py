@@ -0,0 +1,251 @@
+"""Reboot a fleet of HA pairs without an outage.
+
+A RollingRestart takes every site, an SbcHaPair, through these steps:
+
+1. reboot the standby peer and wait for it to come back as standby,
+2. switch over, so the freshly rebooted peer becomes active,
+3. reboot the other peer and wait for it to come back as standby,
+4. optionally switch back.
+
+Waiting polls the role of the rebooted peer with exponential backoff and
+jitter. A rebooted peer must stop answering at least once, within
+reboot_grace seconds, before its role counts. Otherwise the site fails
+before the switchover. Sites are handled in parallel, up to max_in_flight
+at a time, so a maintenance window takes about as long as the slowest batch
+of sites, not the sum of all reboots. After max_failures failed sites no new
+sites are started.
+
+Example:
+
+    from sbc_rest_client.rolling import RollingRestart
+
+    restart = RollingRestart(pairs, max_in_flight=10, max_failures=2)
+    for site in restart.run():
+        print(site)
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Tuple, Union
+
+from sbc_rest_client.ha import HaPairError, SbcHaPair
+from sbc_rest_client.operations import OperationPoller
+from sbc_rest_client.sbc import Sbc
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+logger = logging.getLogger(__name__)
+
+
+def wait_for_role(sbc: Sbc, roles: Iterable[str], poller: OperationPoller,
+                  grace: float = 0.0) -> Union[str, None]:
+    """Poll the role of an SBC until it reports one of roles.
+
+    Args:
+        sbc: The Sbc object of the SBC.
+        roles: The roles to wait for. E.g., ("standby",)
+        poller: Provides the delays between polls and the timeout.
+        grace: After a reboot, an SBC may still answer for a while before it
+            goes down. If grace is positive, its answers are ignored until
+            it did not answer once. An SBC that still answers after grace
+            seconds did not reboot and the wait fails.
+
+    Returns:
+        The role, or None if the timeout passed first or the SBC did not go
+        down within grace seconds.
+    """
+
+    roles = frozenset(roles)
+    start = time.monotonic()
+    deadline = start + poller.timeout
+    went_down = grace <= 0
+    for delay in poller.delays():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        time.sleep(min(delay, remaining))
+        try:
+            role = sbc.role
+        except Exception:
+            # E.g., no token while the SBC is booting
+            role = False
+        if role is False:
+            went_down = True
+            continue
+        if not went_down:
+            if time.monotonic() - start >= grace:
+                logger.warning(
+                    "%s: still answering %.0f seconds after the reboot",
+                    sbc.host, grace
+                )
+                return None
+            continue
+        if role in roles:
+            return role
+
+
+class SiteResult(object):
+    """The outcome of the rolling restart of one site."""
+
+    __slots__ = ("site", "ok", "skipped", "steps", "error")
+
+    def __init__(self, site: SbcHaPair) -> None:
+        self.site = site
+        self.ok = False
+        # Not started because too many sites failed
+        self.skipped = False
+        # (step, ok, seconds) tuples, in order
+        self.steps: List[Tuple[str, bool, float]] = list()
+        self.error: Union[str, None] = None
+
+    def __bool__(self) -> bool:
+        return self.ok
+
+    @property
+    def duration(self) -> float:
+        return sum(seconds for _, _, seconds in self.steps)
+
+    def __repr__(self) -> str:
+        return "{cls}({hosts}, ok={ok}, duration={duration:.1f}, " \
+            "error={error!r})".format(
+                cls=type(self).__name__,
+                hosts="/".join(sbc.host for sbc in self.site.peers),
+                ok=self.ok, duration=self.duration, error=self.error
+            )
+
+
+class RollingRestart(object):
+    """Reboot both peers of many HA pairs, one peer at a time per pair."""
+
+    def __init__(
+            self, sites: Iterable[SbcHaPair], max_in_flight: int = 10,
+            max_failures: int = 1, switch_back: bool = False,
+            reboot_poller: Union[OperationPoller, None] = None,
+            switchover_poller: Union[OperationPoller, None] = None,
+            reboot_grace: float = 30.0
+        ) -> None:
+        """Initialize a RollingRestart object.
+
+        Args:
+            sites: The HA pairs to restart.
+            max_in_flight: The maximum number of sites restarted at the same
+                time.
+            max_failures: Stop starting new sites after this many sites
+                failed. Sites in flight are finished.
+            switch_back: Switch over once more at the end, so the peer that
+                was active at the start is active again.
+            reboot_poller: Polls the role of a rebooted peer. Defaults to
+                polls between 5 and 30 seconds apart, for up to 15 minutes.
+            switchover_poller: Polls the role of the peer that becomes active
+                after a switchover. Defaults to polls between 1 and 5 seconds
+                apart, for up to 2 minutes.
+            reboot_grace: The number of seconds a rebooted peer may keep
+                answering before it goes down. A peer that did not go down
+                in time fails its site, so no switchover is done to a peer
+                that did not reboot. See wait_for_role()
+        """
+
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.sites = list(sites)
+        self.max_in_flight = max_in_flight
+        self.max_failures = max_failures
+        self.switch_back = switch_back
+        if reboot_poller is None:
+            reboot_poller = OperationPoller(
+                initial_delay=5, max_delay=30, timeout=900
+            )
+        if switchover_poller is None:
+            switchover_poller = OperationPoller(
+                initial_delay=1, max_delay=5, timeout=120
+            )
+        self.reboot_poller = reboot_poller
+        self.switchover_poller = switchover_poller
+        self.reboot_grace = reboot_grace
+        self._failures = 0
+        self._lock = threading.Lock()
+
+    @property
+    def aborted(self) -> bool:
+        return self._failures >= self.max_failures
+
+    def _step(self, result: SiteResult, step: str, ok: bool, start: float
+              ) -> bool:
+        result.steps.append((step, ok, time.monotonic() - start))
+        if not ok:
+            result.error = "{} failed".format(step)
+        return ok
+
+    def _reboot_standby(self, site: SbcHaPair, result: SiteResult,
+                        step: str) -> bool:
+        """Reboot the standby peer and wait for it to be standby again."""
+
+        start = time.monotonic()
+        standby = site.standby
+        logger.info("%s: %s", standby.host, step)
+        if not standby.reboot():
+            return self._step(result, step, False, start)
+        role = wait_for_role(
+            standby, ("standby",), self.reboot_poller, self.reboot_grace
+        )
+        return self._step(result, step, role is not None, start)
+
+    def _switchover(self, site: SbcHaPair, result: SiteResult, step: str
+                    ) -> bool:
+        """Switch over and wait for the new active peer to report it."""
+
+        start = time.monotonic()
+        logger.info("%s: %s", site.active.host, step)
+        if not site.switchover():
+            return self._step(result, step, False, start)
+        role = wait_for_role(site.active, ("active",), self.switchover_poller)
+        return self._step(result, step, role is not None, start)
+
+    def restart_site(self, site: SbcHaPair) -> SiteResult:
+        """Take one site through all steps. Stops at the first failed step.
+        """
+
+        result = SiteResult(site)
+        if self.aborted:
+            # Not a failure of this site, not counted in max_failures
+            result.skipped = True
+            result.error = "Not started, too many failed sites"
+            logger.info("%r", result)
+            return result
+        try:
+            site.resolve()
+            result.ok = (
+                self._reboot_standby(site, result, "reboot standby")
+                and self._switchover(site, result, "switchover")
+                and self._reboot_standby(site, result, "reboot other peer")
+                and (not self.switch_back
+                     or self._switchover(site, result, "switch back"))
+            )
+        except HaPairError as e:
+            result.error = str(e)
+        if not result.ok:
+            with self._lock:
+                self._failures += 1
+            logger.error("%r", result)
+        else:
+            logger.info("%r", result)
+        return result
+
+    def run(self) -> "list[SiteResult]":
+        """Restart all sites.
+
+        Returns:
+            A SiteResult per site, in the order of sites. Sites that were not
+            started because too many sites failed are falsy too, and have
+            skipped set.
+        """
+
+        workers = max(1, min(self.max_in_flight, len(self.sites)))
+        with ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="sbc-rolling"
+                ) as executor:
+            return list(executor.map(self.restart_site, self.sites))
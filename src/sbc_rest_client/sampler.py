@@ -0,0 +1,368 @@
+"""Continuously sample the KPI statistics of one or more SBCs.
+
+A KpiSampler polls the globalSessions KPIs of a set of Session Border
+Controllers at a fixed interval from a background thread. It logs in once per
+SBC and keeps its connections open. The samples of every SBC are kept in a
+RingBuffer: a bounded history stored in arrays of doubles, so memory use stays
+flat however long the sampler runs.
+
+Example:
+
+    from sbc_rest_client.sampler import KpiSampler
+
+    sampler = KpiSampler.from_hosts("admin", "password", hosts, interval=5)
+    with sampler:
+        time.sleep(60)
+        history = sampler.history("sbc1.example.com")
+        print(history.max("sysGlobalCPS", window=60))
+        print(history.percentile("sysGlobalConSessions", 95, window=60))
+"""
+
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Mapping, Sequence, Tuple, Union
+
+from sbc_rest_client.kpis import GlobalSessionsSnapshot
+from sbc_rest_client.sbc import Sbc
+from sbc_rest_client.transport import make_session
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+DEFAULT_FIELDS = ("sysGlobalCPS", "sysGlobalConSessions")
+
+
+class RingBuffer(object):
+    """A bounded history of numeric samples backed by arrays.
+
+    Every field, and the sample timestamps, is stored in its own array of
+    doubles of a fixed capacity. Once full, the oldest sample is overwritten.
+    Missing values are stored as NaN and ignored by the statistics.
+
+    Safe to append to from one thread while others query it. Queries copy
+    the samples they need under a lock and compute outside of it.
+    """
+
+    def __init__(self, capacity: int, fields: Sequence[str]) -> None:
+        """Initialize a RingBuffer object.
+
+        Args:
+            capacity: The maximum number of samples kept.
+            fields: The names of the fields of a sample.
+        """
+
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.fields = tuple(fields)
+        self._timestamps = array("d", bytes(8 * capacity))
+        self._columns = {
+            field: array("d", bytes(8 * capacity)) for field in self.fields
+        }
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, timestamp: float, values: Mapping[str, float]) -> None:
+        """Add a sample, overwriting the oldest one when full.
+
+        Args:
+            timestamp: The time of the sample in seconds, never less than
+                that of the previous sample. E.g., time.monotonic()
+            values: The field names mapped to their values. Fields that are
+                missing or not numeric are stored as NaN.
+        """
+
+        row = [
+            value if isinstance(value, (int, float)) else math.nan
+            for value in map(values.get, self._columns)
+        ]
+        with self._lock:
+            i = self._next
+            self._timestamps[i] = timestamp
+            for column, value in zip(self._columns.values(), row):
+                column[i] = value
+            self._next = (i + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def _ordered(self, column: array) -> array:
+        """A copy of the samples of column, oldest first.
+
+        The samples are one slice of the array, or two once they wrap
+        around its end. Call with the lock held.
+        """
+
+        start = (self._next - self._count) % self.capacity
+        end = start + self._count
+        if end <= self.capacity:
+            return column[start:end]
+        return column[start:] + column[:end - self.capacity]
+
+    def _window(self, fields: Sequence[str], window: Union[float, None]
+                ) -> Tuple[array, List[array]]:
+        """Copies of the timestamps and of the values of fields of the
+        samples in the window, oldest first.
+
+        The window is the number of seconds back from the latest sample.
+        None means all samples.
+        """
+
+        with self._lock:
+            timestamps = self._ordered(self._timestamps)
+            columns = [self._ordered(self._columns[f]) for f in fields]
+        if window is not None and timestamps:
+            # Timestamps never decrease
+            first = bisect_left(timestamps, timestamps[-1] - window)
+            if first:
+                timestamps = timestamps[first:]
+                columns = [column[first:] for column in columns]
+        return timestamps, columns
+
+    def timestamps(self, window: Union[float, None] = None) -> List[float]:
+        """The timestamps of the samples in the window, oldest first."""
+
+        return self._window((), window)[0].tolist()
+
+    def values(self, field: str, window: Union[float, None] = None
+               ) -> List[float]:
+        """The values of field in the window, oldest first, without NaNs.
+
+        Args:
+            field: The name of the field.
+            window: The number of seconds back from the latest sample. None
+                means all samples.
+        """
+
+        _, (column,) = self._window((field,), window)
+        return [value for value in column if not math.isnan(value)]
+
+    def latest(self, field: str) -> Union[float, None]:
+        """The most recent value of field or None if there are no samples."""
+
+        column = self._columns[field]
+        with self._lock:
+            if not self._count:
+                return None
+            return column[(self._next - 1) % self.capacity]
+
+    def min(self, field: str, window: Union[float, None] = None
+            ) -> Union[float, None]:
+        """The minimum of field in the window or None if it is empty."""
+
+        values = self.values(field, window)
+        return min(values) if values else None
+
+    def max(self, field: str, window: Union[float, None] = None
+            ) -> Union[float, None]:
+        """The maximum of field in the window or None if it is empty."""
+
+        values = self.values(field, window)
+        return max(values) if values else None
+
+    def mean(self, field: str, window: Union[float, None] = None
+             ) -> Union[float, None]:
+        """The mean of field in the window or None if it is empty."""
+
+        values = self.values(field, window)
+        return math.fsum(values) / len(values) if values else None
+
+    def percentile(self, field: str, q: float,
+                   window: Union[float, None] = None) -> Union[float, None]:
+        """The q-th percentile of field in the window.
+
+        Interpolates linearly between the closest ranks.
+
+        Args:
+            field: The name of the field.
+            q: The percentile, between 0 and 100.
+            window: The number of seconds back from the latest sample. None
+                means all samples.
+
+        Returns:
+            The percentile or None if the window is empty.
+        """
+
+        if not 0 <= q <= 100:
+            raise ValueError("q must be between 0 and 100")
+        values = sorted(self.values(field, window))
+        if not values:
+            return None
+        rank = (len(values) - 1) * q / 100
+        low = math.floor(rank)
+        high = math.ceil(rank)
+        return values[low] + (values[high] - values[low]) * (rank - low)
+
+    def rate(self, field: str, window: Union[float, None] = None
+             ) -> Union[float, None]:
+        """The change of field per second over the window.
+
+        Useful for fields that are counters.
+
+        Returns:
+            The rate or None if the window holds less than two samples of
+            field.
+        """
+
+        timestamps, (column,) = self._window((field,), window)
+        samples = [
+            (timestamp, value) for timestamp, value in zip(timestamps, column)
+            if not math.isnan(value)
+        ]
+        if len(samples) < 2:
+            return None
+        (t_first, v_first), (t_last, v_last) = samples[0], samples[-1]
+        if t_last == t_first:
+            return None
+        return (v_last - v_first) / (t_last - t_first)
+
+
+class KpiSampler(object):
+    """Poll the global session KPIs of SBCs at a fixed interval."""
+
+    def __init__(
+            self, sbcs: Iterable[Sbc],
+            interval: float = 5.0,
+            capacity: int = 720,
+            fields: Union[Sequence[str], None] = DEFAULT_FIELDS,
+            max_workers: int = 32
+        ) -> None:
+        """Initialize a KpiSampler object.
+
+        Args:
+            sbcs: The Sbc objects to sample.
+            interval: The number of seconds between samples.
+            capacity: The number of samples kept per SBC. The default keeps an
+                hour of samples at a 5 second interval.
+            fields: The KPI fields to keep. None keeps every numeric field of
+                the first snapshot of each SBC.
+            max_workers: The maximum number of SBCs polled at the same time.
+        """
+
+        self.sbcs = list(sbcs)
+        self.interval = interval
+        self.capacity = capacity
+        self.fields = fields
+        self.max_workers = max(1, min(max_workers, len(self.sbcs)))
+        self.errors: Dict[str, Exception] = dict()
+        self._history: Dict[str, RingBuffer] = dict()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+
+    @classmethod
+    def from_hosts(cls, user: str, passwd: str, hosts: Iterable[str],
+                   sbc_kwargs: Union[dict, None] = None,
+                   **kwargs) -> "KpiSampler":
+        """Create a sampler for hosts that share a single pooled session.
+
+        Args:
+            user: A user name with admin privileges.
+            passwd: The admin user password.
+            hosts: The hostnames or ip-addresses of the SBCs.
+            sbc_kwargs: Passed on to every Sbc. E.g., verify
+            kwargs: Passed on to KpiSampler. E.g., interval, capacity
+        """
+
+        hosts = list(hosts)
+        session = make_session(pool_connections=max(len(hosts), 1))
+        sbc_kwargs = dict(sbc_kwargs or {})
+        sbc_kwargs.setdefault("lazy_login", True)
+        sbcs = [
+            Sbc(user, passwd, host, session=session, **sbc_kwargs)
+            for host in hosts
+        ]
+        return cls(sbcs, **kwargs)
+
+    def history(self, host: str) -> Union[RingBuffer, None]:
+        """The sample history of host or None if it was not sampled yet."""
+
+        return self._history.get(host)
+
+    def _record(self, snapshot: GlobalSessionsSnapshot) -> None:
+        """Add a snapshot to the history of its host."""
+
+        history = self._history.get(snapshot.host)
+        if history is None:
+            fields = self.fields
+            if fields is None:
+                fields = [
+                    name for name, value in snapshot.fields.items()
+                    if isinstance(value, (int, float))
+                ]
+            history = RingBuffer(self.capacity, fields)
+            self._history[snapshot.host] = history
+        history.append(snapshot.timestamp, snapshot.fields)
+
+    def _sample(self, sbc: Sbc) -> None:
+        """Take and record a snapshot of one SBC."""
+
+        try:
+            snapshot = sbc.kpi_snapshot(max_age=0)
+        except Exception as e:
+            self.errors[sbc.host] = e
+            return
+        self.errors.pop(sbc.host, None)
+        self._record(snapshot)
+
+    def sample_once(self) -> None:
+        """Sample every SBC once, in parallel."""
+
+        if self._executor is not None:
+            list(self._executor.map(self._sample, self.sbcs))
+            return
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(self._sample, self.sbcs))
+
+    def _run(self) -> None:
+        """Sample at a fixed interval until stopped, without drifting."""
+
+        next_run = time.monotonic()
+        while not self._stop.is_set():
+            self.sample_once()
+            next_run += self.interval
+            delay = next_run - time.monotonic()
+            if delay < 0:
+                # A round took longer than the interval. Skip the missed ones.
+                next_run = time.monotonic()
+                delay = 0
+            self._stop.wait(delay)
+
+    def start(self) -> None:
+        """Start sampling in a background thread."""
+
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="sbc-sampler"
+        )
+        self._thread = threading.Thread(
+            target=self._run, name="sbc-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the background thread to finish."""
+
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._executor.shutdown()
+        self._executor = None
+
+    def __enter__(self) -> "KpiSampler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -1,31 +1,100 @@
-import requests
-from urllib3.exceptions import InsecureRequestWarning
-import polling2
 import base64
-from lxml import etree
-from typing import Union
+import logging
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Tuple, Union
 import os
+import threading
+from collections import deque
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
+
+from sbc_rest_client.auth import TokenManager
+from sbc_rest_client.elements import ConfigElement
+from sbc_rest_client.instrumentation import Instrumentation
+from sbc_rest_client.kpis import GlobalSessionsSnapshot
+from sbc_rest_client.metadata import ElementTypeMetadata, MetadataCache
+from sbc_rest_client.operations import OperationPoller
+from sbc_rest_client import parsing
+from sbc_rest_client.ratelimit import HostLimiter
+from sbc_rest_client.results import Result
+from sbc_rest_client.singleflight import SingleFlight
+
+# requests, urllib3 and lxml take most of the import time of the client.
+# They are imported on first use, when the first API call is sent or the
+# first response is parsed.
+if TYPE_CHECKING:
+    import requests
+    from lxml import etree
+    from urllib3.util.retry import Retry
+
+    from sbc_rest_client.responsecache import ResponseCache
 
 
 __author__ = '139928764+p4irin@users.noreply.github.com'
 
 
+logger = logging.getLogger(__name__)
+
+
+class _NoRole(Exception):
+    """The status response of the SBC holds no role."""
+
+
+class SbcError(Exception):
+    """The SBC answered an API request with an unexpected status code, or
+    with a response that lacks what was asked for.
+    """
+
+
+# Resolved once, not for every Sbc object
+_CA_BUNDLE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "letsencrypt.pem"
+)
+
+
 class Sbc(object):
-    """Interact with the REST API of a Session Border Controller."""
+    """Interact with the REST API of a Session Border Controller.
+
+    An Sbc object can be shared by threads. Its headers are immutable and
+    replaced as a whole when the access token is refreshed, and only one
+    thread refreshes the token at a time. See sbc_rest_client.fleet for
+    fanning out API calls over many SBCs with a thread pool.
+    """
 
-    _accept_header = { "Accept": "application/xml"}
+    _accept_header = MappingProxyType({"Accept": "application/xml"})
 
     def __init__(
             self, user: str, passwd: str, host: str,
             api_version: str = "v1.1",
-            request_timeout: int = 10,
+            request_timeout: Union[float, Tuple[float, float]] = 10,
             ssl_warnings: bool = True,
-            verify: bool = True
+            verify: bool = True,
+            lazy_login: bool = False,
+            token_lifetime: int = 600,
+            token_refresh_margin: int = 60,
+            kpi_cache_ttl: float = 0,
+            session: Union["requests.Session", None] = None,
+            metadata_cache: Union[MetadataCache, None] = None,
+            software_version: Union[str, None] = None,
+            operation_poller: Union[OperationPoller, None] = None,
+            scheme: str = "https",
+            connect_timeout: Union[float, None] = None,
+            pool_maxsize: int = 10,
+            pool_block: bool = False,
+            retries: Union["Retry", int, None] = None,
+            keep_alive_idle: Union[int, None] = 60,
+            share_pool: bool = False,
+            instrumentation: Union[Instrumentation, None] = None,
+            limiter: Union[HostLimiter, None] = None,
+            single_flight: Union[SingleFlight, None] = None,
+            response_cache: Union["ResponseCache", None] = None
         ) -> None:
 
         """Initialize an Sbc object.
 
         Getting and setting an access token for the object is done implicitly.
+        Tokens are refreshed shortly before they expire and API calls that
+        are rejected with a 401 Unauthorized are retried once with a fresh
+        token.
         
         Args:
             user: A user name with admin privileges.
@@ -34,48 +103,238 @@ class Sbc(object):
             api_version: Supported REST API version. The documentation uses
                 v1.1 in its examples. We'll stick to that.
             request_timeout: The timeout for API calls. API calls that time out
-                raise a requests.exceptions.RequestException.
+                raise a requests.exceptions.RequestException. A
+                (connect, read) tuple sets both timeouts.
             ssl_warnings: Enable or disable verbose SSL related warnings.
             verify: Enable or disable verification of the SBC certificate.
                 Disabling certificate verification results in verbose SSL
                 warnings on the concole. You can suppress those by passing
                 ssl_warnings=False.
+            lazy_login: Defer getting an access token to the first API call.
+                Instantiating the object then does no network I/O at all.
+                The session is always created on the first API call, so
+                with lazy_login=True creating an object is cheap and
+                requests is not even imported until it is used.
+            token_lifetime: The number of seconds an access token is valid.
+            token_refresh_margin: The number of seconds before expiry at which
+                an access token is refreshed.
+            kpi_cache_ttl: The number of seconds a KPI snapshot is reused by
+                kpi_snapshot() and the statistics properties. 0 disables
+                caching.
+            session: A requests.Session to send API calls on. Pass the same
+                session to several Sbc objects to share its connection pool.
+                Defaults to a new session for this object, see
+                sbc_rest_client.transport.make_session(). The pool_*,
+                retries and keep_alive_idle arguments do not apply to a
+                session you pass.
+            metadata_cache: A MetadataCache for element type metadata. Pass
+                the same cache to several Sbc objects, or one backed by a
+                file, to share it. Defaults to an in-memory cache for this
+                object.
+            software_version: The software version of the SBC. Cached
+                metadata is keyed by it, so metadata cached before an
+                upgrade is not used after it. Without it, metadata is not
+                persisted by the metadata_cache and is dropped when this
+                object reboots the SBC.
+            operation_poller: The OperationPoller that polls verify, save and
+                activate operations. Pass one to tune its backoff and
+                deadline. Defaults to an OperationPoller with a 120 second
+                deadline.
+            scheme: The URL scheme of the REST API. Only use http to talk to
+                a local simulator, see sbc_rest_client.simulator.
+            connect_timeout: The timeout for setting up a connection. Then
+                request_timeout is the read timeout. Defaults to
+                request_timeout.
+            pool_maxsize: The maximum number of connections kept open to the
+                SBC. Size it to the number of threads using the object.
+            pool_block: Make threads wait for a free pooled connection
+                instead of opening a connection that is discarded afterwards.
+            retries: The urllib3 Retry policy for idempotent API calls, or a
+                number of retries. Defaults to 2 retries of GETs on
+                connection errors and 502, 503 and 504. Pass 0 to disable.
+                With a limiter 429 and 503 responses are not retried, every
+                attempt has to go through the limiter.
+            keep_alive_idle: The number of idle seconds after which pooled
+                connections are probed with TCP keep-alive. None disables
+                the probes.
+            share_pool: Share the connection pool with other Sbc objects for
+                the same host and pool settings, see
+                sbc_rest_client.transport.shared_session().
+            instrumentation: An Instrumentation object that records the
+                latency of every API call, and the duration of verify, save
+                and activate operations. Pass the same object to several Sbc
+                objects to collect their calls in one place. None disables
+                instrumentation.
+            limiter: A HostLimiter that keeps the rate and the number of
+                concurrent API calls within what the SBC can take. Pass the
+                same limiter to every Sbc object for the host, see
+                sbc_rest_client.ratelimit.shared_limiter(). None sends calls
+                without limits.
+            single_flight: A SingleFlight that makes concurrent reads of
+                the role, the supported API versions, the KPIs, the element
+                types and their metadata share one API call, and caches
+                them per endpoint if you like. Pass the same SingleFlight to
+                several Sbc objects to share calls between them. Defaults to
+                one for this object, that does not cache.
+            response_cache: A ResponseCache for the responses of
+                get_config_elements(), iter_config_elements() and
+                config_elements(). Changing the configuration through this
+                object invalidates the cached responses of the host. None
+                does not cache them.
         """
         self.user = user
         self.passwd = passwd
         self.host = host
         self.api_version = api_version
-        self._session = requests.Session()
-        if verify:
-            module_path = os.path.abspath(__file__)
-            cert_path = os.path.dirname(module_path)
-            self._session.verify = cert_path + "/letsencrypt.pem"
-        else:
-            self._session.verify = False
-        if not ssl_warnings:
-            requests.packages.urllib3.disable_warnings(
-                category=InsecureRequestWarning
-            )
+        self.scheme = scheme
+        # Created by the session property on first use
+        self._session = session
+        self._pool = dict(
+            pool_maxsize=pool_maxsize, pool_block=pool_block,
+            retries=retries, keep_alive_idle=keep_alive_idle
+        )
+        self._share_pool = share_pool
+        self._ssl_warnings = ssl_warnings
+        self._session_lock = threading.Lock()
+        # Passed along with every API call, so a shared session is left as is
+        self._verify = _CA_BUNDLE if verify else False
+        if connect_timeout is not None and not isinstance(
+                request_timeout, tuple):
+            request_timeout = (connect_timeout, request_timeout)
         self._request_timeout = request_timeout
+        self._token_manager = TokenManager(
+            lifetime=token_lifetime, refresh_margin=token_refresh_margin
+        )
+        # (token, request headers, token header), replaced as a whole
+        self._headers = None
+        self._token_lock = threading.Lock()
+        self.kpi_cache_ttl = kpi_cache_ttl
+        self._kpi_snapshot = None
+        if metadata_cache is None:
+            metadata_cache = MetadataCache()
+        self.metadata_cache = metadata_cache
+        self.software_version = software_version
+        if operation_poller is None:
+            operation_poller = OperationPoller()
+        self.operation_poller = operation_poller
+        # The OperationState of the most recent verify, save and activate
+        # operations, oldest first
+        self.operation_history = deque(maxlen=100)
+        self.instrumentation = instrumentation
+        self.limiter = limiter
+        if single_flight is None:
+            single_flight = SingleFlight()
+        self.single_flight = single_flight
+        self.response_cache = response_cache
+
+        if not lazy_login:
+            self._get_token()
 
-        self._get_token()
+    @property
+    def session(self) -> "requests.Session":
+        """The requests.Session API calls are sent on.
+
+        Created on first use, see the session, pool_*, retries,
+        keep_alive_idle, share_pool and limiter arguments of Sbc.
+        """
 
-    def _print_response_code(self, r: requests.Response, text: bool = True):
-        """Print the response code and reason to the console.
+        session = self._session
+        if session is not None:
+            return session
+        with self._session_lock:
+            if self._session is None:
+                from sbc_rest_client.transport import (
+                    make_session, shared_session
+                )
+                if not self._ssl_warnings:
+                    import urllib3
+                    urllib3.disable_warnings(
+                        category=urllib3.exceptions.InsecureRequestWarning
+                    )
+                retry_overload = self.limiter is None
+                if self._share_pool:
+                    self._session = shared_session(
+                        self.host, retry_overload=retry_overload, **self._pool
+                    )
+                else:
+                    self._session = make_session(
+                        retry_overload=retry_overload, **self._pool
+                    )
+            return self._session
+
+    def _log_result(self, result: Result) -> Result:
+        """Log the result of an API call. Failures are logged as warnings."""
+
+        if result.ok:
+            logger.info("%s: %s", self.host, result)
+        else:
+            logger.warning("%s: %s", self.host, result)
+        return result
+
+    def _get(self, action: str, url: str, accept: bool = True
+             ) -> "requests.Response":
+        """GET url and check that the SBC answered with a 200 Ok.
+
+        For reads whose responses are parsed and cached, so an error
+        response is never taken for an empty result.
 
         Args:
-            r: A requests.Response object
-            text: Enable or disable printing the response text
+            action: What the call does, for the log and the exception. E.g.,
+                Get element type metadata
+            url: The URL of the API endpoint.
+            accept: See _request()
+
+        Raises:
+            requests.exceptions.RequestException: The API request failed for
+                some reason.
+            SbcError("Failed to <action>!"): The API request returned a
+                status code other than a 200 Ok.
         """
 
-        print("Response Code: {code}".format(code=r.status_code))
-        print("Reason: {reason}".format(reason=r.reason))
-        if text: print(r.text)
+        r = self._request("GET", url, accept=accept)
+        if r.status_code != 200:
+            self._log_result(Result.from_response(action, r))
+            raise SbcError("Failed to {}!".format(action.lower()))
+        return r
+
+    def _call(self, action: str, method: str, url: str,
+              ok_statuses: "tuple[int, ...]" = (200,), accept: bool = True,
+              parse: Union[Callable[[bytes], Any], None] = None,
+              **kwargs) -> Result:
+        """Send an API call and log its Result.
+
+        Args:
+            action: What the call does, for the Result and the log. E.g.,
+                Lock config.
+            method: The HTTP method.
+            url: The URL of the API endpoint.
+            ok_statuses: The status codes that mean success.
+            accept: See _request()
+            parse: Turns the body of a successful response into the value
+                of the Result.
+            kwargs: Passed on to _request()
+
+        Returns:
+            A Result. A requests.exceptions.RequestException is turned into
+            a failed Result.
+        """
+
+        import requests
+        try:
+            r = self._request(method, url, accept=accept, **kwargs)
+        except requests.exceptions.RequestException as e:
+            return self._log_result(Result.from_exception(action, e))
+        value = None
+        if parse is not None and r.status_code in ok_statuses:
+            value = parse(r.content)
+        return self._log_result(
+            Result.from_response(action, r, ok_statuses, value)
+        )
 
     @property
     def _base_url(self):
-        return "https://{sbc}/rest/{api_version}".format(
-            sbc=self.host, api_version=self.api_version
+        return "{scheme}://{sbc}/rest/{api_version}".format(
+            scheme=self.scheme, sbc=self.host, api_version=self.api_version
         )
 
     @property
@@ -96,8 +355,8 @@ class Sbc(object):
 
     @property
     def _supportedversion_url(self):
-        return "https://{sbc}/rest/api/supportedversions".format(
-            sbc=self.host
+        return "{scheme}://{sbc}/rest/api/supportedversions".format(
+            scheme=self.scheme, sbc=self.host
         )
 
     # Configuration endpoints
@@ -110,6 +369,10 @@ class Sbc(object):
     def _unlock_url(self):
         return "{base}/configuration/unlock".format(base=self._base_url)
 
+    @property
+    def _element_types_url(self):
+        return "{base}/configuration/elementTypes".format(base=self._base_url)
+
     @property
     def _element_types_meta_data_url(self):
         url = "{base}/configuration/elementTypes".format(base=self._base_url)
@@ -157,52 +420,157 @@ class Sbc(object):
         subsequent API calls.
         
         N.B:
-            Access tokens are valid for 10 minutes.
+            Access tokens are valid for 10 minutes. _request() calls this
+            again when the token is about to expire.
 
         Raises:
             requests.exceptions.RequestException: The API request failed for
                 some reason.
-            Exception("Failed to get a token!"): The API request returned a
+            SbcError("Failed to get a token!"): The API request returned a
                 status code other than a 200 Ok.
         """
 
-        msg = "Get a token from {}: ".format(self.host)
-
-        headers = self._accept_header
+        import requests
+        headers = dict(self._accept_header)
 
         creds = "{user}:{passwd}".format(user=self.user, passwd=self.passwd)
         creds = creds.encode('utf-8')
         creds_b64_bytestr = base64.encodebytes(creds).strip()
         creds_b64 = creds_b64_bytestr.decode('utf-8')
-        self._auth_header = { "Authorization": "Basic " + creds_b64 }
-
-        headers.update(self._auth_header)
+        headers["Authorization"] = "Basic " + creds_b64
         try:
-            r = self._session.post(
+            r = self.session.post(
                 self._token_url, headers=headers,
-                timeout=self._request_timeout
+                timeout=self._request_timeout, verify=self._verify
             )
         except requests.exceptions.RequestException as e:
-            print(e.args)
-            msg += "Nok!"
-            print(msg)
+            logger.error("Get a token from %s: Nok! %r", self.host, e)
             raise e
-        if r.status_code ==200:
-            msg += "Ok!"
-            print(msg)
+        if r.status_code == 200:
+            logger.info("Get a token from %s: Ok!", self.host)
+        else:
+            logger.error(
+                "Get a token from %s: Nok! Status code = %s, Reason = %s",
+                self.host, r.status_code, r.reason
+            )
+            raise SbcError("Failed to get a token!")
+        token = parsing.first_text(r.content, parsing.ACCESS_TOKEN)
+        if token is None:
+            logger.error("Get a token from %s: Nok! No access token in the "
+                         "response", self.host)
+            raise SbcError("Failed to get a token!")
+        token_header = MappingProxyType({"Authorization": "Bearer " + token})
+        request_headers = MappingProxyType(
+            dict(self._accept_header, **token_header)
+        )
+        # A single assignment, so concurrent API calls never mix the headers
+        # of two tokens
+        self._headers = (token, request_headers, token_header)
+        self._token_manager.set(token)
+
+    def _refresh_token(self, stale: Union[str, None] = None) -> None:
+        """Get a new access token, once, for all threads that need one.
+
+        Threads that find the token due for a refresh, or rejected, line up
+        on a lock. The first one gets a new token, the others use it.
+
+        Args:
+            stale: The token an API call was rejected with. A new token is
+                only fetched if it is still the current token.
+        """
+
+        with self._token_lock:
+            current = self._headers[0] if self._headers else None
+            if stale is not None and stale == current:
+                self._token_manager.invalidate()
+            if self._token_manager.needs_refresh:
+                self._get_token()
+
+    def _request(self, method: str, url: str, accept: bool = True,
+                 cache: bool = False, **kwargs) -> "requests.Response":
+        """Send an authenticated API request.
+
+        Gets an access token first if there is none yet or if it is about to
+        expire. A request that is rejected with a 401 Unauthorized is retried
+        once with a fresh token.
+
+        Args:
+            method: The HTTP method. E.g., GET, POST
+            url: The URL of the API endpoint.
+            accept: Send the Accept: application/xml header along with the
+                Authorization header.
+            cache: Get the response from the response_cache of the object,
+                if it has one. Only for GETs of the configuration.
+            kwargs: Passed on to requests.Session.request(). The timeout
+                defaults to the request_timeout of the object. headers are
+                sent along with the headers of the object.
+
+        Returns:
+            The requests.Response object.
+
+        Raises:
+            requests.exceptions.RequestException: The API request failed for
+                some reason.
+            SbcError("Failed to get a token!"): Getting a token failed.
+        """
+
+        if cache and self.response_cache is not None:
+            return self.response_cache.fetch(
+                self.host, url,
+                lambda headers: self._request(
+                    method, url, accept, headers=headers, **kwargs
+                ),
+                stream=kwargs.get("stream", False)
+            )
+        kwargs.setdefault("timeout", self._request_timeout)
+        kwargs.setdefault("verify", self._verify)
+        instrumentation = self.instrumentation
+        limiter = self.limiter
+        if limiter is None:
+            if instrumentation is None:
+                return self._send(method, url, accept, kwargs)
+            send = lambda: self._send(method, url, accept, kwargs)
         else:
-            msg += "Nok! Status code = {}, Reason = {}".format(
-                r.status_code, r.reason
+            send = lambda: limiter.call(
+                lambda: self._send(method, url, accept, kwargs)
             )
-            print(msg)
-            raise Exception("Failed to get a token!")
-        tree = etree.fromstring(r.text.encode())
-        self._token = tree.xpath("//accessToken")[0].text
-        self._token_header = {
-            "Authorization": "Bearer " + self._token
-        }
-        self._request_headers = self._accept_header
-        self._request_headers.update(self._token_header)
+            if instrumentation is None:
+                return send()
+        data = kwargs.get("data")
+        if isinstance(data, str):
+            data = data.encode()
+        # Measured around the limiter, so the time spent waiting for it
+        # shows up in the latencies
+        return instrumentation.measure(
+            self.host, method, url, send,
+            request_bytes=len(data) if isinstance(data, bytes) else 0,
+            stream=kwargs.get("stream", False)
+        )
+
+    def _send(self, method: str, url: str, accept: bool, kwargs: dict
+              ) -> "requests.Response":
+        """Send an API request, with a token refresh and a retry after a 401
+        as needed. See _request()
+        """
+
+        extra_headers = kwargs.pop("headers", None)
+        if self._token_manager.needs_refresh:
+            self._refresh_token()
+        token, request_headers, token_header = self._headers
+        headers = request_headers if accept else token_header
+        if extra_headers:
+            headers = dict(headers, **extra_headers)
+        session = self.session
+        r = session.request(method, url, headers=headers, **kwargs)
+        if r.status_code == 401:
+            r.close()
+            self._refresh_token(stale=token)
+            token, request_headers, token_header = self._headers
+            headers = request_headers if accept else token_header
+            if extra_headers:
+                headers = dict(headers, **extra_headers)
+            r = session.request(method, url, headers=headers, **kwargs)
+        return r
 
     @property
     def role(self) -> Union[str, bool]:
@@ -216,133 +584,238 @@ class Sbc(object):
                 that the API request failed for some reason.
         """
 
-        msg = "Get role: "
-
+        import requests
         try:
-            r = self._session.get(
-                self._status_url, headers=self._request_headers,
-                timeout=self._request_timeout
+            return self.single_flight.do(
+                "role", self._status_url, self._get_role
             )
         except requests.exceptions.RequestException as e:
-            print(e.args)
-            msg += "Nok!"
-            print(msg)
-            return False
-        tree = etree.fromstring(r.text.encode())
-        role = tree.xpath("///role")[0].text
-        msg += " {}".format(role)
+            logger.warning("%s: Get role: Nok! %r", self.host, e)
+        except _NoRole as e:
+            logger.warning("%s: Get role: Nok! %s", self.host, e)
+        return False
+
+    def _get_role(self) -> str:
+        """Read the role. Raises _NoRole if the response holds none, so a
+        failure is never cached.
+        """
+
+        r = self._request("GET", self._status_url)
+        role = parsing.first_text(r.content, parsing.ROLE)
+        if role is None:
+            raise _NoRole(
+                "Status code = {}, Reason = {}, Error = {}".format(
+                    r.status_code, r.reason, parsing.parse_error(r.content)
+                )
+            )
+        logger.debug("%s: Get role: %s", self.host, role)
         return role
 
-    def reboot(self) -> bool:
+    def reboot(self) -> Result:
         """Reboot a Session Border Controller.
 
         N.B.: A reboot takes about 2 min.
 
         Returns:
-            True: The reboot is executed
-            False: A requests.exceptions.RequestException occured, indicating
-                that the API request failed for some reason.
+            A Result. It is truthy if the reboot is executed. Its value is
+            the link to poll for the state of the reboot.
         """
 
-        msg = "Reboot: "
-
-        try:
-            r = self._session.post(
-                self._reboot_url, headers=self._request_headers,
-                timeout=self._request_timeout
-            )
-        except requests.exceptions.RequestException as e:
-            print(e.args)
-            msg += "Nok!"
-            print(msg)
-            return False
-
-        tree = etree.fromstring(r.text.encode())
-        link = tree.xpath("////link")[0].text
-        print(link)
-        return True
-
-    def switchover(self) -> bool:
+        result = self._call(
+            "Reboot", "POST", self._reboot_url, (200, 202),
+            parse=lambda content: parsing.first_text(content, parsing.LINK)
+        )
+        self.single_flight.invalidate("role", self._status_url)
+        if result and not self.software_version:
+            # An upgrade takes a reboot and nothing tells the metadata of
+            # the new software version apart
+            self.metadata_cache.invalidate(self.host, software_version="")
+        return result
+
+    def switchover(self) -> Result:
         """Switch the active Session Border Controller in an HA setup.
 
         Takes about 5 secs.
 
         Returns:
-            True: The switch over is executed.
-            False: A requests.exceptions.RequestException occured, indicating
-                that the API request failed for some reason.
+            A Result. It is truthy if the switch over is executed.
         """
 
-        msg = "Switchover: "
-
-        try:
-            r = self._session.post(
-                self._switchover_url, headers=self._request_headers,
-                timeout=self._request_timeout
-            )
-        except requests.exceptions.RequestException as e:
-            print(e.args)
-            msg += "Nok!"
-            print(msg)
-            return False
-        if r.status_code == 204:
-            msg += "Ok!"
-            print(msg)
-            return True
-        else:
-            msg += "Nok! Status code = {}, Reason = {}".format(
-                r.status_code, r.reason
-            )
-            print(msg)
-            return False
+        result = self._call(
+            "Switchover", "POST", self._switchover_url, (204,)
+        )
+        self.single_flight.invalidate("role", self._status_url)
+        return result
 
     @property
     def supported_rest_api_versions(self) -> "list[str]":
-        """Returns a list of supported API versions."""
+        """Returns a list of supported API versions.
+
+        Raises:
+            requests.exceptions.RequestException: The API request failed for
+                some reason.
+            SbcError("Failed to get supported api versions!"): The API
+                request returned a status code other than a 200 Ok.
+        """
 
-        versions = list()
-        r = self._session.get(
-            self._supportedversion_url, headers=self._token_header
+        def get() -> "list[str]":
+            r = self._get("Get supported API versions", url, accept=False)
+            tree = parsing.parse(r.content)
+            versions = list(parsing.VERSIONS(tree))
+            # A string() XPath, it is empty if there is no latest version
+            latest = parsing.LATEST_VERSION(tree)
+            if latest:
+                versions.append(latest)
+            return versions
+
+        url = self._supportedversion_url
+        # A copy, the list is shared
+        return list(
+            self.single_flight.do("supported_rest_api_versions", url, get)
         )
-        tree = etree.fromstring(r.text.encode())
-        latest_version = tree.xpath("///latestVersion")[0].text
-        other_versions = tree.xpath("////version")
-        for version in other_versions:
-            versions.append(version.text)
-        versions.append(latest_version)
-        return versions
 
     # Statistics
 
+    def kpi_snapshot(self, max_age: Union[float, None] = None
+                     ) -> GlobalSessionsSnapshot:
+        """Get all global session KPIs with a single API call.
+
+        Args:
+            max_age: Reuse the previous snapshot if it is at most this many
+                seconds old. Defaults to the kpi_cache_ttl of the object.
+
+        Returns:
+            A GlobalSessionsSnapshot holding every field of the response as
+            an int or a float.
+
+        Raises:
+            requests.exceptions.RequestException: The API request failed for
+                some reason.
+            SbcError("Failed to get global session kpis!"): The API request
+                returned a status code other than a 200 Ok. The previous
+                snapshot is kept.
+        """
+
+        if max_age is None:
+            max_age = self.kpi_cache_ttl
+        snapshot = self._kpi_snapshot
+        if snapshot is not None and max_age > 0 and snapshot.age <= max_age:
+            return snapshot
+        url = self._global_sessions_url
+        snapshot = self.single_flight.do(
+            "kpi_snapshot", url,
+            lambda: GlobalSessionsSnapshot.from_xml(
+                self.host, self._get("Get global session KPIs", url).content
+            )
+        )
+        self._kpi_snapshot = snapshot
+        return snapshot
+
     @property
     def global_cps(self) -> str:
         """Returns the global calls per second."""
 
-        r = self._session.get(
-            self._global_sessions_url, headers=self._request_headers
-        )
-        tree = etree.fromstring(r.text.encode())
-        cps = tree.xpath("///sysGlobalCPS")[0].text
-        return cps
+        return str(self.kpi_snapshot().cps)
 
     @property
     def global_con_sessions(self) -> str:
         """Returns the global number of connected sessions."""
 
-        r = self._session.get(
-            self._global_sessions_url, headers=self._request_headers
-        )
-        tree = etree.fromstring(r.text.encode())
-        con_sessions = tree.xpath("///sysGlobalConSessions")[0].text
-        return con_sessions
+        return str(self.kpi_snapshot().con_sessions)
 
     # Configuration
 
+    def config_element_types(self) -> "list[str]":
+        """Get the configuration element types supported by the SBC.
+
+        Raises:
+            requests.exceptions.RequestException: The API request failed for
+                some reason.
+            SbcError("Failed to get config. element types!"): The API
+                request returned a status code other than a 200 Ok.
+        """
+
+        def get() -> "list[str]":
+            tree = parsing.parse(
+                self._get("Get config. element types", url).content
+            )
+            # Every leaf node of the response data names an element type
+            return [
+                node.text for node in tree.iterfind("data//*")
+                if len(node) == 0 and node.text
+            ]
+
+        url = self._element_types_url
+        # A copy, the list is shared
+        return list(self.single_flight.do("config_element_types", url, get))
+
+    def element_type_metadata(self, element_type: str
+                              ) -> ElementTypeMetadata:
+        """Get the metadata of a configuration element type.
+
+        The metadata is taken from the metadata_cache of the object when it
+        is there, otherwise it is fetched and cached.
+
+        Args:
+            element_type: A configuration element type. E.g., session-group,
+                local-policy...
+
+        Returns:
+            An ElementTypeMetadata object holding the names of the attributes
+            and of the key attributes.
+
+        Raises:
+            requests.exceptions.RequestException: The API request failed for
+                some reason.
+            SbcError("Failed to get element type metadata!"): The API
+                request returned a status code other than a 200 Ok. Nothing
+                is cached then.
+        """
+
+        metadata = self.metadata_cache.get(
+            self.host, self.software_version, self.api_version, element_type
+        )
+        if metadata is not None:
+            return metadata
+        url = self._element_types_meta_data_url + element_type
+        metadata = self.single_flight.do(
+            "element_type_metadata", url,
+            lambda: ElementTypeMetadata.from_xml(
+                element_type,
+                self._get("Get element type metadata", url).content
+            )
+        )
+        self.metadata_cache.put(
+            self.host, self.software_version, self.api_version, metadata
+        )
+        return metadata
+
+    def prefetch_metadata(self, element_types: "list[str]" = None,
+                          max_workers: int = 4) -> int:
+        """Warm the metadata cache in one pass.
+
+        Args:
+            element_types: The element types to fetch metadata for. Defaults
+                to every element type supported by the SBC.
+            max_workers: The number of metadata requests in flight at the
+                same time.
+
+        Returns:
+            The number of element types in the cache for this SBC.
+        """
+
+        if element_types is None:
+            element_types = self.config_element_types()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(self.element_type_metadata, element_types))
+        return len(element_types)
+
     def config_element_key_attributes(self, element_type: str) -> "list[str]":
         """Get the key attributes of a configuration element.
         
         A helper method. To update a configuration element you need the
-        key attribute(s) that uniquely identifies it.
+        key attribute(s) that uniquely identifies it. The metadata is cached,
+        see element_type_metadata().
 
         Args:
             element_type: A configuration element type. E.g., session-group,
@@ -352,159 +825,178 @@ class Sbc(object):
             A list of a configuration element's key attributes.
         """
 
-        url = self._element_types_meta_data_url + element_type
-        r = self._session.get(
-            url, headers=self._request_headers
-        )
-        tree = etree.fromstring(r.text.encode())
-        metadatas = tree.xpath("/response/data/attributeMetadata")
-        key_attributes = list()
-        for metadata in metadatas:
-            name = metadata.xpath("name")[0].text
-            key = metadata.xpath("key")[0].text
-            if key == 'true':
-                key_attributes.append(name)
-        return key_attributes
+        metadata = self.element_type_metadata(element_type)
+        return list(metadata.key_attributes)
 
     def get_config_elements(self, element_type: str, key_attribs: str = None
-                            ) -> None:
+                            ) -> Result:
         """Get one or more configuration element instances.
 
-        A helper method. Prints the configuration element instances to console.
-        Example for key_attributes you pass: '&name1=value1&name2=value2'
+        A helper method. Returns the configuration element instances as the
+        XML of the response. Example for key_attributes you pass:
+        '&name1=value1&name2=value2'
 
         Args:
             element_type: The element type. E.g., session-group, local-policy
             key_attribs: String of query parameters that represent the key
                 attributes. E.g, &name1=value1&name2=value2. The string MUST
                 start with an &
+
+        Returns:
+            A Result. Its value is the response text, print it to see the
+            structure and nodes of the configElements.
         """
 
+        url = self._running_config_elements_url(element_type, key_attribs)
+        return self._call(
+            "Get config. elements", "GET", url,
+            parse=lambda content: content.decode(), cache=True
+        )
+
+    def _running_config_elements_url(
+            self, element_type: str, key_attribs: Union[str, None] = None
+        ) -> str:
+        """The URL to get running configuration element instances from."""
+
         url = self._config_elements_url + "?"
         url += "elementType=" + element_type + "&running=true"
         if key_attribs:
             url += key_attribs
+        return url
 
-        r = self._session.get(
-            url, headers=self._request_headers
-        )
-        print(r.text)
+    def iter_config_elements(
+            self, element_type: str, key_attribs: Union[str, None] = None
+        ) -> Iterator["etree._Element"]:
+        """Stream configuration element instances one at a time.
+
+        The response is parsed while it is downloaded, so memory use does not
+        grow with the size of the configuration and you can start working on
+        the first element before the last one arrived.
+
+        Each configElement node is cleared as soon as the next one is
+        requested. Copy what you need from it before that, e.g., with
+        etree.tostring(element).
 
-    def lock(self) -> bool:
+        Args:
+            element_type: The element type. E.g., session-group, local-policy
+            key_attribs: String of query parameters that represent the key
+                attributes. E.g, &name1=value1&name2=value2. The string MUST
+                start with an &
+
+        Yields:
+            An lxml configElement node per configuration element instance.
+
+        Raises:
+            requests.exceptions.RequestException: The API request failed for
+                some reason.
+            SbcError("Failed to get config. elements!"): The API request
+                returned a status code other than a 200 Ok.
+        """
+
+        from lxml import etree
+        url = self._running_config_elements_url(element_type, key_attribs)
+        r = self._request("GET", url, cache=True, stream=True)
+        try:
+            if r.status_code != 200:
+                self._log_result(
+                    Result.from_response("Get config. elements", r)
+                )
+                raise SbcError("Failed to get config. elements!")
+            r.raw.decode_content = True
+            for _, element in etree.iterparse(
+                    r.raw, tag="configElement", resolve_entities=False,
+                    no_network=True):
+                yield element
+                element.clear()
+                # Drop the cleared elements from the tree that is built up
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+        finally:
+            r.close()
+
+    def config_elements(
+            self, element_type: str, key_attribs: Union[str, None] = None
+        ) -> Iterator[ConfigElement]:
+        """Get configuration element instances as ConfigElement objects.
+
+        The instances are streamed, see iter_config_elements(). Every
+        ConfigElement refers to the cached metadata of its element type, so
+        ConfigElement.key() knows the key attributes.
+
+        Args:
+            element_type: The element type. E.g., session-group, local-policy
+            key_attribs: String of query parameters that represent the key
+                attributes. E.g, &name1=value1&name2=value2. The string MUST
+                start with an &
+
+        Yields:
+            A ConfigElement per configuration element instance.
+        """
+
+        metadata = self.element_type_metadata(element_type)
+        for node in self.iter_config_elements(element_type, key_attribs):
+            yield ConfigElement.from_node(node, metadata)
+
+    def lock(self) -> Result:
         """Lock the configuration.
 
         Returns:
-            True: The lock operation executed.
-            False: A requests.exceptions.RequestException occured, indicating
-                that the API request failed for some reason.
+            A Result. It is truthy if the lock operation executed.
         """
 
-        msg = "Lock config.: "
-
-        try:
-            r = self._session.post(
-                self._lock_url, headers=self._request_headers,
-                timeout=self._request_timeout
-            )
-        except requests.exceptions.RequestException as e:
-            print(e.args)
-            msg += "Nok!"
-            print(msg)
-            return False
-        if r.status_code == 204:
-            msg += "Ok!"
-            print(msg)
-            return True
-        else:
-            msg += "Nok! Status code = {}. Reason = {}".format(
-                r.status_code, r.reason
-            )
-            print(msg)
-            return False
+        return self._call("Lock config.", "POST", self._lock_url, (204,))
 
-    def unlock(self) -> bool:
+    def unlock(self) -> Result:
         """Unlock the configuration.
 
         Returns:
-            True: The unlock operation executed.
-            False: A requests.exceptions.RequestException occured, indicating
-                that the API request failed for some reason.        
+            A Result. It is truthy if the unlock operation executed.
         """
 
-        msg = "Unlock config.: "
+        return self._call("Unlock config.", "POST", self._unlock_url, (204,))
 
-        try:
-            r = self._session.post(
-                self._unlock_url, headers=self._request_headers,
-                timeout=self._request_timeout
-            )
-        except requests.exceptions.RequestException as e:
-            print(e.args)
-            msg += "Nok!"
-            print(msg)
-            return False
-        if r.status_code == 204:
-            msg += "Ok!"
-            print(msg)
-            return True
-        else:
-            msg += "Nok! Status code = {}. Reason = {}".format(
-                r.status_code, r.reason
-            )
-            print(msg)
-            return False            
-
-    def update_config_element(self, xml_str: str) -> bool:
+    def update_config_element(self, xml_str: Union[str, ConfigElement]
+                           ) -> Result:
         """Update a configuration element.
 
         To identify a configuration element you need to set the key attributes
         in xml_str. [Also see self.config_element_key_attributes()]
 
         Args:
-            xml_str:
+            xml_str: The configElement XML. A ConfigElement is serialised
+                with ConfigElement.to_xml().
 
         Returns:
-            True: The configuration element was updated
-            False: A status code other than 200 Ok was returned or a
-                requests.exceptions.RequestException occured.
+            A Result. It is truthy if the configuration element was updated.
+            Otherwise it holds the status code and the error reported by the
+            SBC.
         """
 
-        msg = "Update config. element: "
+        if isinstance(xml_str, ConfigElement):
+            xml_str = xml_str.to_xml()
 
-        try:
-            r = self._session.put(
-                self._config_elements_url, headers=self._token_header,
-                data=xml_str, timeout=self._request_timeout
-            )
-        except requests.exceptions.RequestException as e:
-            print(e.args)
-            msg += "Nok!"
-            print(msg)
-            return False
-        if r.status_code == 200:
-            msg += "Ok!"
-            print(msg)
-            return True
-        else:
-            msg += "Nok! Status code = {}. Reason = {}".format(
-                r.status_code, r.reason
-            )
-            print(msg)
-            return False  
+        result = self._call(
+            "Update config. element", "PUT", self._config_elements_url,
+            accept=False, data=xml_str
+        )
+        self._config_changed()
+        return result
 
-    def add_config_element(self, xml_str: str) -> bool:
+    def add_config_element(self, xml_str: Union[str, ConfigElement]
+                           ) -> Result:
         """Add a configuration element.
 
         To identify a configuration element you need to set the key
         attributes in xml_str. [Also see self.config_element_key_attributes()]
 
         Args:
-            xml_str:
+            xml_str: The configElement XML. A ConfigElement is serialised
+                with ConfigElement.to_xml().
 
         Returns:
-            True: The configuration element was added
-            False: A status code other than 200 Ok was returned or a
-            requests.exceptions.RequestException occured.
+            A Result. It is truthy if the configuration element was added.
+            Otherwise it holds the status code and the error reported by the
+            SBC.
 
         Note:
             From the documentation:
@@ -520,31 +1012,18 @@ class Sbc(object):
             and then call update_config_element() with the full xml_str.
         """
 
-        msg = "Add config. element: "
+        if isinstance(xml_str, ConfigElement):
+            xml_str = xml_str.to_xml()
 
-        try:
-            r = self._session.post(
-                self._config_elements_url, headers=self._token_header,
-                data=xml_str, timeout=self._request_timeout
-            )
-        except requests.exceptions.RequestException as e:
-            print(e.args)
-            msg += "Nok!"
-            print(msg)
-            return False
-        if r.status_code == 200:
-            msg += "Ok!"
-            print(msg)
-            return True
-        else:
-            msg += "Nok! Status code = {}. Reason = {}".format(
-                r.status_code, r.reason
-            )
-            print(msg)
-            return False  
+        result = self._call(
+            "Add config. element", "POST", self._config_elements_url,
+            accept=False, data=xml_str
+        )
+        self._config_changed()
+        return result
 
     def delete_config_element(self, element_type: str, key_attribs: Union[str, None] = None
-                            ) -> bool:
+                            ) -> Result:
         """Delete one configuration element instances.
 
         Delete the configuration element.
@@ -555,211 +1034,114 @@ class Sbc(object):
             key_attribs: String of query parameters that represent the key
                 attributes. E.g, &name1=value1&name2=value2. The string MUST
                 start with an &
+
+        Returns:
+            A Result. It is truthy if the configuration element was deleted.
         """
 
-        msg = "Delete config. element: "
+        url = self._config_elements_url + "?"
+        url += "elementType=" + element_type
+        if key_attribs:
+            url += key_attribs
 
-        try:
-            url = self._config_elements_url + "?"
-            url += "elementType=" + element_type
-            if key_attribs:
-                url += key_attribs
+        result = self._call(
+            "Delete config. element", "DELETE", url, (204,)
+        )
+        self._config_changed()
+        return result
 
-            r = self._session.delete(
-                url, headers=self._request_headers
-            )
-            print(r.text)
-        except requests.exceptions.RequestException as e:
-            print(e.args)
-            msg += "Nok!"
-            print(msg)
-            return False
-        if r.status_code == 204:
-            msg += "Ok!"
-            print(msg)
-            return True
-        else:
-            msg += "Nok! Status code = {}. Reason = {}".format(
-                r.status_code, r.reason
-            )
-            print(msg)
-            return False  
+    def _config_changed(self) -> None:
+        """Invalidate the cached configuration responses of the host.
 
-    def _verify_config_status(self, r:requests.Response) -> bool:
-        """Return the status of the verify configuration operation."""
+        Also after failed changes, they may have been applied partly.
+        """
 
-        if r.status_code != 200:
-            self._print_response_code(r)
-            return False
-        tree = etree.fromstring(r.text.encode())
-        operation = tree.xpath(
-            "/response/data/operationState/operation"
-        )[0].text
-        status = tree.xpath("/response/data/operationState/status")[0].text
-        msg = "Operation: {}, Status: {}".format(operation, status)
-        print(msg)                
-        if operation == "verify" and status == "success":
-            return True
-        else:
-            return False                       
+        if self.response_cache is not None:
+            self.response_cache.invalidate(self.host)
 
-    def _verify_config(self) -> bool:
-        """Verify the configuration.
+    def _run_operation(self, method: str, url: str, operation: str
+                       ) -> Result:
+        """Start an asynchronous configuration operation and poll it.
+
+        The SBC responds with a link to poll for the state of the operation.
+        The link is polled by the operation_poller of the object. The
+        resulting OperationState, including how long the operation took, is
+        appended to operation_history.
+
+        Args:
+            method: The HTTP method that starts the operation.
+            url: The URL that starts the operation.
+            operation: The operation. E.g., verify, save, activate
 
         Returns:
-            True: Verification of the configuration was succesful.
-            False: Verification of the confguration was NOT successful or a
-                requests.exceptions.RequestException occured indicating the
-                API request failed for some reason.
+            A Result. It is truthy if the operation was successful. Its value
+            is the OperationState and elapsed is the duration of the
+            operation. It is falsy if the operation failed, did not finish in
+            time or a requests.exceptions.RequestException occured.
         """
 
+        import requests
+        action = "{} config.".format(operation.capitalize())
+
         try:
-            r = self._session.put(
-                self._verify_config_url, headers=self._request_headers,
-                timeout=self._request_timeout
-            )
+            r = self._request(method, url)
         except requests.exceptions.RequestException as e:
-            print(e.args)
-            msg +="Nok!"
-            print(msg)
-            return False
-
-        tree = etree.fromstring(r.text.encode())
-        link = tree.xpath("/response/links/link")[0].text
-
-        try:                  
-            polling2.poll(
-                self._session.get, step=3, args=(link,),
-                kwargs={
-                    'headers': self._request_headers,
-                    'timeout': self._request_timeout
-                },
-                timeout=15,
-                check_success=self._verify_config_status
-            )
-            return True
-        except Exception as e:
-            print(e.args)
-            msg +="Nok!"
-            print(msg)            
-            return False
-
-    def _save_config_status(self, r:requests.Response) -> bool:
-        """Return the status of the save configuration operation."""
-
-        if r.status_code != 200:
-            self._print_response_code(r)
-            return False
-        tree = etree.fromstring(r.text.encode())
-        operation = tree.xpath(
-            "/response/data/operationState/operation"
-        )[0].text
-        status = tree.xpath("/response/data/operationState/status")[0].text
-        msg = "Operation: {}, Status: {}".format(operation, status)
-        print(msg)                
-        if operation == "save" and status == "success":
-            return True
-        else:
-            return False            
-
-    def _save_config(self) -> bool:
-        """Save the configuration."""
+            return self._log_result(Result.from_exception(action, e))
 
-        msg = "Save config.: "
+        link = parsing.first_text(r.content, parsing.LINK)
+        if not link:
+            return self._log_result(
+                Result.from_response(action, r, ok_statuses=())
+            )
 
-        try:
-            r = self._session.put(
-                self._save_config_url, headers=self._request_headers,
-                timeout=self._request_timeout
+        state = self.operation_poller.poll(
+            lambda: self._request("GET", link), operation
+        )
+        self.operation_history.append(state)
+        if self.instrumentation is not None:
+            self.instrumentation.observe(
+                self.host, "operation/" + operation, state.duration
             )
-        except requests.exceptions.RequestException as e:
-            print(e.args)
-            msg +="Nok!"
-            print(msg)            
-            return False
+        return self._log_result(Result(
+            action, state.succeeded, r.status_code, r.reason,
+            state.duration, None if state else "Status = {}".format(
+                state.status
+            ),
+            state
+        ))
+
+    def _verify_config(self) -> Result:
+        """Verify the configuration.
 
-        tree = etree.fromstring(r.text.encode())
-        link = tree.xpath("/response/links/link")[0].text
+        Returns:
+            A Result. It is truthy if verification of the configuration was
+                successful. It is falsy if it was NOT successful or a
+                requests.exceptions.RequestException occured indicating the
+                API request failed for some reason.
+        """
 
-        try:
-            polling2.poll(
-                self._session.get, step=2, args=(link,),
-                kwargs={
-                    'headers': self._request_headers,
-                    'timeout': self._request_timeout
-                },
-                timeout=15,
-                check_success=self._save_config_status
-            )
-            return True            
-        except Exception as e:
-            print(e.args)
-            msg +="Nok!"
-            print(msg)            
-            return False
+        return self._run_operation("PUT", self._verify_config_url, "verify")
 
-    def _activate_config_status(self, r:requests.Response):
-        """Return the status of the activate configuration operation."""
+    def _save_config(self) -> Result:
+        """Save the configuration."""
 
-        if r.status_code != 200:
-            self._print_response_code(r)
-            return False
-        tree = etree.fromstring(r.text.encode())
-        operation = tree.xpath(
-            "/response/data/operationState/operation"
-        )[0].text
-        status = tree.xpath("/response/data/operationState/status")[0].text
-        msg = "Operation: {}, Status: {}".format(operation, status)
-        print(msg)                
-        if operation == "activate" and status == "success":
-            return True
-        else:
-            return False            
+        return self._run_operation("PUT", self._save_config_url, "save")
 
-    def activate_config(self) -> bool:
+    def activate_config(self) -> Result:
         """Activate the configuration.
 
-        This will verify and save the configuration first
+        This will verify and save the configuration first. The duration of
+        each phase is recorded in operation_history.
         """
 
-        msg = "Activate config.: "        
-
-        if (not self._verify_config()) or (not self._save_config()):
-            msg +="Nok!"
-            print(msg)            
-            return False
-
-        try:
-            r = self._session.post(
-                self._activate_config_url, headers=self._request_headers,
-                timeout=self._request_timeout
-            )
-        except requests.exceptions.RequestException as e:
-            print(e.args)
-            msg +="Nok!"
-            print(msg)            
-            return False
-
-        tree = etree.fromstring(r.text.encode())
-        link = tree.xpath("/response/links/link")[0].text
+        for phase in (self._verify_config, self._save_config):
+            result = phase()
+            if not result:
+                logger.warning("%s: Activate config.: Nok!", self.host)
+                return result
 
-        try:
-            r = self._session.get(
-                link, headers=self._request_headers,
-                timeout=self._request_timeout
-            )
-            polling2.poll(
-                self._session.get, step=2, args=(link,),
-                kwargs={
-                    'headers': self._request_headers,
-                    'timeout': self._request_timeout
-                },
-                timeout=15,
-                check_success=self._activate_config_status
-            )
-            return True            
-        except Exception as e:
-            print(e.args)
-            msg +="Nok!"
-            print(msg)            
-            return False
+        result = self._run_operation(
+            "POST", self._activate_config_url, "activate"
+        )
+        self._config_changed()
+        return result
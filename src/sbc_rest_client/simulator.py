@@ -0,0 +1,714 @@
+"""A local stand-in for the REST API of a Session Border Controller.
+
+The SbcSimulator implements the endpoints the Sbc class uses, so the client
+can be tested and benchmarked without a real SBC:
+
+- auth/token, with Basic authentication and expiring Bearer tokens,
+- system/status, api/supportedversions and statistics/kpis,
+- configuration/lock and configuration/unlock,
+- configuration/elementTypes and configuration/elementTypes/metadata,
+- configuration/configElements, backed by an in-memory store,
+- configuration/management verify, save and activate, as asynchronous
+  operations with a link to poll,
+- admin/reboot and admin/switchover. Two simulators can be paired with
+  pair_with() to act as an HA pair.
+
+Latency, payload sizes and failures are configurable.
+
+Example:
+
+    from sbc_rest_client.simulator import SbcSimulator
+
+    with SbcSimulator(latency=0.02, element_count=10000) as simulator:
+        sbc = simulator.sbc()
+        print(sbc.role)
+
+Or from the command line:
+
+    $ sbc-simulator --port 8080 --latency 0.05 --element-count 1000
+"""
+
+import argparse
+import base64
+import itertools
+import random
+import ssl
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple, Union
+from urllib.parse import parse_qsl, urlsplit
+from xml.sax.saxutils import escape
+
+from lxml import etree
+
+from sbc_rest_client.parsing import parse
+from sbc_rest_client.sbc import Sbc
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+# Element types and their key attributes
+ELEMENT_TYPES = OrderedDict((
+    ("session-agent", ("hostname",)),
+    ("session-group", ("group-name",)),
+    ("local-policy", ("from-address", "to-address", "source-realm")),
+    ("realm-config", ("identifier",)),
+))
+
+API_VERSIONS = ("v1.0", "v1.1")
+
+
+def _response(data: str = "", links: str = "") -> bytes:
+    """Wrap data and links in the response envelope of the REST API."""
+
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        "<response><data>{data}</data><messages/><links>{links}</links>"
+        "</response>"
+    ).format(data=data, links=links).encode()
+
+
+def _error(reason: str, message: str) -> bytes:
+    """An error response body."""
+
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        "<response><data/><messages/><links/><errors><error>"
+        "<reason>{reason}</reason><message>{message}</message>"
+        "</error></errors></response>"
+    ).format(reason=escape(reason), message=escape(message)).encode()
+
+
+class _Operation(object):
+    """An asynchronous operation in progress."""
+
+    __slots__ = ("operation", "done_at")
+
+    def __init__(self, operation: str, duration: float) -> None:
+        self.operation = operation
+        self.done_at = time.monotonic() + duration
+
+    @property
+    def status(self) -> str:
+        if time.monotonic() >= self.done_at:
+            return "success"
+        return "inProgress"
+
+
+class SbcSimulator(object):
+    """Serve a simulated SBC REST API from a background thread."""
+
+    def __init__(
+            self, host: str = "127.0.0.1", port: int = 0,
+            user: str = "admin", passwd: str = "admin",
+            latency: float = 0.0, jitter: float = 0.0,
+            failure_rate: float = 0.0, failure_status: int = 503,
+            element_count: int = 100, attribute_count: int = 20,
+            value_size: int = 16, operation_duration: float = 0.5,
+            token_lifetime: float = 600, role: str = "standalone",
+            reboot_duration: float = 0.0, capacity: int = 0,
+            etags: bool = False,
+            certfile: Union[str, None] = None,
+            keyfile: Union[str, None] = None,
+            seed: Union[int, None] = None
+        ) -> None:
+        """Initialize an SbcSimulator object.
+
+        Args:
+            host: The address to listen on.
+            port: The port to listen on. 0 picks a free port.
+            user: The user name that is allowed to log in.
+            passwd: The password of user.
+            latency: The number of seconds every response is delayed.
+            jitter: Up to this many seconds are randomly added to latency.
+            failure_rate: The fraction of requests, between 0 and 1, that
+                fail with failure_status.
+            failure_status: The status code of injected failures.
+            element_count: The number of instances of every element type.
+            attribute_count: The number of attributes of every instance,
+                including the key attributes.
+            value_size: The length of generated attribute values.
+            operation_duration: The number of seconds verify, save, activate
+                and reboot take.
+            token_lifetime: The number of seconds access tokens are valid.
+            role: The initial role. standalone, active or standby
+            reboot_duration: The number of seconds the simulator answers
+                every request with a 503 after a reboot. Tokens issued
+                before the reboot are no longer valid.
+            capacity: The number of requests the simulator serves at the
+                same time. More concurrent requests are answered with a 503
+                with a Retry-After, like an overloaded management plane. 0
+                serves any number.
+            etags: Send an ETag with configuration elements, and answer
+                conditional requests for them with a 304 Not Modified if
+                the configuration did not change.
+            certfile: A certificate file to serve HTTPS with. Serves HTTP if
+                None.
+            keyfile: The private key of certfile.
+            seed: Seed the random generator for reproducible latency and
+                failures.
+        """
+
+        self.user = user
+        self.passwd = passwd
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.attribute_count = attribute_count
+        self.value_size = value_size
+        self.operation_duration = operation_duration
+        self.token_lifetime = token_lifetime
+        self.role = role
+        self.reboot_duration = reboot_duration
+        self.reboots = 0
+        self.capacity = capacity
+        self.etags = etags
+        # Changed with every change of the configuration, for the ETags
+        self.config_version = 0
+        self.in_flight = 0
+        self.rejected = 0
+        self.peer: Union["SbcSimulator", None] = None
+        self._down_until = 0.0
+        self.request_count = 0
+        self.locked = False
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens: Dict[str, float] = dict()
+        self._operations: Dict[str, _Operation] = dict()
+        self._operation_ids = itertools.count(1)
+        self._store: Dict[str, "OrderedDict[tuple, List[tuple]]"] = {
+            element_type: self._generate(element_type, element_count)
+            for element_type in ELEMENT_TYPES
+        }
+        self._rendered: Dict[str, bytes] = dict()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self.scheme = "http"
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self._server.socket = context.wrap_socket(
+                self._server.socket, server_side=True
+            )
+            self.scheme = "https"
+        self._thread = None
+
+    # Data
+
+    def _generate(self, element_type: str, count: int
+                  ) -> "OrderedDict[tuple, List[tuple]]":
+        """Generate count instances of element_type."""
+
+        keys = ELEMENT_TYPES[element_type]
+        others = max(self.attribute_count - len(keys), 0)
+        filler = "x" * self.value_size
+        elements = OrderedDict()
+        for i in range(count):
+            key = tuple(
+                "{}-{}".format(name, i) for name in keys
+            )
+            attributes = list(zip(keys, key))
+            attributes += [
+                ("attribute-{}".format(n), filler) for n in range(others)
+            ]
+            elements[key] = attributes
+        return elements
+
+    def _attribute_names(self, element_type: str) -> List[str]:
+        keys = ELEMENT_TYPES[element_type]
+        others = max(self.attribute_count - len(keys), 0)
+        return list(keys) + [
+            "attribute-{}".format(n) for n in range(others)
+        ]
+
+    @staticmethod
+    def _element_xml(element_type: str, attributes: List[tuple]) -> str:
+        parts = ["<configElement><elementType>", element_type,
+                 "</elementType>"]
+        for name, value in attributes:
+            parts.append("<attribute><name>")
+            parts.append(escape(name))
+            parts.append("</name><value>")
+            parts.append(escape(value))
+            parts.append("</value></attribute>")
+        parts.append("</configElement>")
+        return "".join(parts)
+
+    def _render(self, element_type: str) -> bytes:
+        """The configElements response of all instances of element_type.
+
+        Rendered once and reused until the instances change.
+        """
+
+        body = self._rendered.get(element_type)
+        if body is None:
+            elements = self._store[element_type]
+            body = _response("".join(
+                self._element_xml(element_type, attributes)
+                for attributes in elements.values()
+            ))
+            self._rendered[element_type] = body
+        return body
+
+    # Serving
+
+    @property
+    def address(self) -> str:
+        """The host:port the simulator listens on."""
+
+        host, port = self._server.server_address[:2]
+        return "{}:{}".format(host, port)
+
+    def sbc(self, **kwargs) -> Sbc:
+        """Create an Sbc object that talks to the simulator.
+
+        Args:
+            kwargs: Passed on to Sbc. Login is lazy unless lazy_login=False
+                is passed.
+        """
+
+        kwargs.setdefault("lazy_login", True)
+        kwargs.setdefault("scheme", self.scheme)
+        if self.scheme == "https":
+            kwargs.setdefault("verify", False)
+            kwargs.setdefault("ssl_warnings", False)
+        return Sbc(self.user, self.passwd, self.address, **kwargs)
+
+    def start(self) -> None:
+        """Serve from a background thread."""
+
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._server.serve_forever, name="sbc-simulator",
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop serving."""
+
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self) -> "SbcSimulator":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _handler(self) -> type:
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, avoid delayed ACKs
+            disable_nagle_algorithm = True
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+            def _handle(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                status, headers, payload = simulator._dispatch(
+                    self.command, self.path, self.headers, body
+                )
+                self.send_response(status)
+                for name, value in headers:
+                    self.send_header(name, value)
+                if payload:
+                    self.send_header("Content-Type", "application/xml")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                if payload:
+                    self.wfile.write(payload)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+        return Handler
+
+    # Request handling
+
+    def _authorized(self, headers) -> bool:
+        auth = headers.get("Authorization", "")
+        if not auth.startswith("Bearer "):
+            return False
+        expires = self._tokens.get(auth[len("Bearer "):])
+        return expires is not None and expires > time.monotonic()
+
+    def _dispatch(self, method: str, path: str, headers, body: bytes
+                  ) -> Tuple[int, list, bytes]:
+        """Route a request. Returns (status, headers, body)."""
+
+        with self._lock:
+            self.request_count += 1
+            if self.capacity and self.in_flight >= self.capacity:
+                self.rejected += 1
+                return 503, [("Retry-After", "1")], _error(
+                    "Service Unavailable", "Too many requests"
+                )
+            self.in_flight += 1
+        try:
+            return self._serve(method, path, headers, body)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _serve(self, method: str, path: str, headers, body: bytes
+               ) -> Tuple[int, list, bytes]:
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            fail = self._random.random() < self.failure_rate
+        if delay:
+            time.sleep(delay)
+        if time.monotonic() < self._down_until:
+            return 503, [], _error("Service Unavailable", "Rebooting")
+        if fail:
+            return self.failure_status, [("Retry-After", "1")], _error(
+                "Service Unavailable", "Injected failure"
+            )
+
+        url = urlsplit(path)
+        query = dict(parse_qsl(url.query, keep_blank_values=True))
+        parts = url.path.strip("/").split("/")
+        # /rest/api/supportedversions or /rest/{version}/...
+        if parts[:3] == ["rest", "api", "supportedversions"]:
+            return self._supported_versions()
+        if len(parts) < 3 or parts[0] != "rest" or \
+                parts[1] not in API_VERSIONS:
+            return 404, [], _error("Not Found", url.path)
+        endpoint = "/".join(parts[2:])
+
+        if endpoint == "auth/token" and method == "POST":
+            return self._token(headers)
+        if not self._authorized(headers):
+            return 401, [], _error("Unauthorized", "Invalid access token")
+
+        handler = {
+            ("GET", "system/status"): self._status,
+            ("GET", "statistics/kpis"): self._kpis,
+            ("POST", "admin/reboot"): self._reboot,
+            ("POST", "admin/switchover"): self._switchover,
+            ("POST", "configuration/lock"): self._config_lock,
+            ("POST", "configuration/unlock"): self._config_unlock,
+            ("GET", "configuration/elementTypes"): self._element_types,
+            ("GET", "configuration/elementTypes/metadata"): self._metadata,
+            ("GET", "configuration/configElements"): self._get_elements,
+            ("PUT", "configuration/configElements"): self._put_element,
+            ("POST", "configuration/configElements"): self._post_element,
+            ("DELETE", "configuration/configElements"): self._delete_element,
+            ("PUT", "configuration/management"): self._management,
+            ("POST", "configuration/management"): self._management,
+        }.get((method, endpoint))
+        if handler is None and endpoint.startswith("operations/"):
+            return self._operation_status(endpoint.split("/", 1)[1])
+        if handler is None:
+            return 404, [], _error("Not Found", url.path)
+        return handler(query, body, headers)
+
+    def _token(self, headers) -> Tuple[int, list, bytes]:
+        auth = headers.get("Authorization", "")
+        expected = base64.b64encode(
+            "{}:{}".format(self.user, self.passwd).encode()
+        ).decode()
+        if auth != "Basic " + expected:
+            return 401, [], _error("Unauthorized", "Invalid credentials")
+        token = uuid.uuid4().hex
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = {
+                t: expires for t, expires in self._tokens.items()
+                if expires > now
+            }
+            self._tokens[token] = now + self.token_lifetime
+        return 200, [], _response(
+            "<accessToken>{}</accessToken>".format(token)
+        )
+
+    def _supported_versions(self) -> Tuple[int, list, bytes]:
+        return 200, [], _response(
+            "<versions>{}</versions><latestVersion>{}</latestVersion>".format(
+                "".join(
+                    "<version>{}</version>".format(v)
+                    for v in API_VERSIONS[:-1]
+                ),
+                API_VERSIONS[-1]
+            )
+        )
+
+    def _status(self, query, body, headers) -> Tuple[int, list, bytes]:
+        return 200, [], _response("<role>{}</role>".format(self.role))
+
+    def _kpis(self, query, body, headers) -> Tuple[int, list, bytes]:
+        if query.get("type") != "globalSessions":
+            return 400, [], _error("Bad Request", "Unsupported KPI type")
+        with self._lock:
+            cps = round(self._random.uniform(0, 50), 2)
+            sessions = self._random.randint(0, 5000)
+        return 200, [], _response(
+            "<globalSessions>"
+            "<sysGlobalConSessions>{sessions}</sysGlobalConSessions>"
+            "<sysGlobalCPS>{cps}</sysGlobalCPS>"
+            "<sysGlobalTotalSessions>{total}</sysGlobalTotalSessions>"
+            "</globalSessions>".format(
+                sessions=sessions, cps=cps, total=self.request_count
+            )
+        )
+
+    def _start_operation(self, operation: str) -> Tuple[int, list, bytes]:
+        operation_id = str(next(self._operation_ids))
+        with self._lock:
+            self._operations[operation_id] = _Operation(
+                operation, self.operation_duration
+            )
+        link = "{scheme}://{address}/rest/{version}/operations/{id}".format(
+            scheme=self.scheme, address=self.address,
+            version=API_VERSIONS[-1], id=operation_id
+        )
+        return 202, [], _response(links="<link>{}</link>".format(link))
+
+    def _operation_status(self, operation_id: str
+                          ) -> Tuple[int, list, bytes]:
+        operation = self._operations.get(operation_id)
+        if operation is None:
+            return 404, [], _error("Not Found", "Unknown operation")
+        return 200, [], _response(
+            "<operationState><operation>{}</operation>"
+            "<status>{}</status></operationState>".format(
+                operation.operation, operation.status
+            )
+        )
+
+    def pair_with(self, peer: "SbcSimulator") -> None:
+        """Make this simulator and peer an HA pair.
+
+        A switchover on the active peer swaps the roles of both. A rebooted
+        active peer comes back as standby, its peer takes over.
+        """
+
+        self.peer = peer
+        peer.peer = self
+
+    def _reboot(self, query, body, headers) -> Tuple[int, list, bytes]:
+        response = self._start_operation("reboot")
+        with self._lock:
+            self.reboots += 1
+            self._tokens.clear()
+            self.locked = False
+            self._down_until = time.monotonic() + self.reboot_duration
+        if self.peer is not None and self.role == "active":
+            self.role, self.peer.role = "standby", "active"
+        return response
+
+    def _switchover(self, query, body, headers) -> Tuple[int, list, bytes]:
+        if self.role == "standalone":
+            return 400, [], _error("Bad Request", "Not in an HA pair")
+        if self.peer is not None:
+            if self.role != "active":
+                return 400, [], _error("Bad Request", "Not the active peer")
+            self.role, self.peer.role = "standby", "active"
+            return 204, [], b""
+        self.role = "standby" if self.role == "active" else "active"
+        return 204, [], b""
+
+    def _config_lock(self, query, body, headers) -> Tuple[int, list, bytes]:
+        with self._lock:
+            if self.locked:
+                return 409, [], _error("Conflict", "Configuration locked")
+            self.locked = True
+        return 204, [], b""
+
+    def _config_unlock(self, query, body, headers
+                       ) -> Tuple[int, list, bytes]:
+        with self._lock:
+            self.locked = False
+        return 204, [], b""
+
+    def _management(self, query, body, headers) -> Tuple[int, list, bytes]:
+        action = query.get("action")
+        if action not in ("verify", "save", "activate"):
+            return 400, [], _error("Bad Request", "Unsupported action")
+        return self._start_operation(action)
+
+    def _element_types(self, query, body, headers
+                       ) -> Tuple[int, list, bytes]:
+        return 200, [], _response("<elementTypes>{}</elementTypes>".format(
+            "".join(
+                "<name>{}</name>".format(element_type)
+                for element_type in ELEMENT_TYPES
+            )
+        ))
+
+    def _metadata(self, query, body, headers) -> Tuple[int, list, bytes]:
+        element_type = query.get("elementType")
+        if element_type not in ELEMENT_TYPES:
+            return 404, [], _error("Not Found", "Unknown element type")
+        keys = ELEMENT_TYPES[element_type]
+        return 200, [], _response("".join(
+            "<attributeMetadata><name>{name}</name><type>string</type>"
+            "<key>{key}</key></attributeMetadata>".format(
+                name=name, key="true" if name in keys else "false"
+            )
+            for name in self._attribute_names(element_type)
+        ))
+
+    def _get_elements(self, query, body, headers
+                      ) -> Tuple[int, list, bytes]:
+        element_type = query.get("elementType")
+        if element_type not in ELEMENT_TYPES:
+            return 404, [], _error("Not Found", "Unknown element type")
+        headers_out = list()
+        if self.etags:
+            etag = '"{}"'.format(self.config_version)
+            if headers.get("If-None-Match") == etag:
+                return 304, [("ETag", etag)], b""
+            headers_out.append(("ETag", etag))
+        keys = ELEMENT_TYPES[element_type]
+        if not any(name in query for name in keys):
+            return 200, headers_out, self._render(element_type)
+        elements = self._store[element_type]
+        matches = [
+            attributes for key, attributes in elements.items()
+            if all(
+                query.get(name, value) == value
+                for name, value in zip(keys, key)
+            )
+        ]
+        return 200, headers_out, _response("".join(
+            self._element_xml(element_type, attributes)
+            for attributes in matches
+        ))
+
+    def _parse_element(self, body: bytes
+                       ) -> Union[Tuple[str, tuple, List[tuple]], None]:
+        """Parse a configElement request body.
+
+        Returns:
+            (element_type, key, attributes) or None if it is not valid.
+        """
+
+        try:
+            tree = parse(body)
+        except etree.XMLSyntaxError:
+            return None
+        element_type = tree.findtext("elementType")
+        if element_type not in ELEMENT_TYPES:
+            return None
+        attributes = [
+            (a.findtext("name"), a.findtext("value") or "")
+            for a in tree.iterfind("attribute")
+        ]
+        values = dict(attributes)
+        key = tuple(
+            values.get(name, "") for name in ELEMENT_TYPES[element_type]
+        )
+        return element_type, key, attributes
+
+    def _put_element(self, query, body, headers) -> Tuple[int, list, bytes]:
+        parsed = self._parse_element(body)
+        if parsed is None:
+            return 400, [], _error("Bad Request", "Invalid configElement")
+        element_type, key, attributes = parsed
+        with self._lock:
+            elements = self._store[element_type]
+            if key not in elements:
+                return 404, [], _error("Not Found", "No such element")
+            merged = OrderedDict(elements[key])
+            merged.update(attributes)
+            elements[key] = list(merged.items())
+            self._rendered.pop(element_type, None)
+            self.config_version += 1
+        return 200, [], _response(
+            self._element_xml(element_type, elements[key])
+        )
+
+    def _post_element(self, query, body, headers) -> Tuple[int, list, bytes]:
+        parsed = self._parse_element(body)
+        if parsed is None:
+            return 400, [], _error("Bad Request", "Invalid configElement")
+        element_type, key, attributes = parsed
+        with self._lock:
+            elements = self._store[element_type]
+            if key in elements:
+                return 409, [], _error("Conflict", "Element exists")
+            elements[key] = attributes
+            self._rendered.pop(element_type, None)
+            self.config_version += 1
+        return 200, [], _response(
+            self._element_xml(element_type, attributes)
+        )
+
+    def _delete_element(self, query, body, headers
+                        ) -> Tuple[int, list, bytes]:
+        element_type = query.get("elementType")
+        if element_type not in ELEMENT_TYPES:
+            return 404, [], _error("Not Found", "Unknown element type")
+        key = tuple(query.get(name, "") for name in ELEMENT_TYPES[element_type])
+        with self._lock:
+            if self._store[element_type].pop(key, None) is None:
+                return 404, [], _error("Not Found", "No such element")
+            self._rendered.pop(element_type, None)
+            self.config_version += 1
+        return 204, [], b""
+
+
+def main(argv: Union[List[str], None] = None) -> int:
+    """The entry point of the sbc-simulator console script."""
+
+    parser = argparse.ArgumentParser(
+        prog="sbc-simulator",
+        description="Serve a simulated Session Border Controller REST API."
+    )
+    parser.add_argument("--address", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--user", default="admin")
+    parser.add_argument("--passwd", default="admin")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--capacity", type=int, default=0)
+    parser.add_argument("--etags", action="store_true")
+    parser.add_argument("--element-count", type=int, default=100)
+    parser.add_argument("--attribute-count", type=int, default=20)
+    parser.add_argument("--operation-duration", type=float, default=0.5)
+    parser.add_argument(
+        "--role", default="standalone",
+        choices=("standalone", "active", "standby")
+    )
+    parser.add_argument("--certfile")
+    parser.add_argument("--keyfile")
+    args = parser.parse_args(argv)
+
+    simulator = SbcSimulator(
+        host=args.address, port=args.port, user=args.user,
+        passwd=args.passwd, latency=args.latency, jitter=args.jitter,
+        failure_rate=args.failure_rate, element_count=args.element_count,
+        attribute_count=args.attribute_count,
+        operation_duration=args.operation_duration, role=args.role,
+        capacity=args.capacity, etags=args.etags, certfile=args.certfile,
+        keyfile=args.keyfile
+    )
+    print("Serving a simulated SBC on {}://{}".format(
+        simulator.scheme, simulator.address
+    ))
+    try:
+        simulator._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator._server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
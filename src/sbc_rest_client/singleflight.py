@@ -0,0 +1,143 @@
+"""Share one API call between threads that read the same thing at once.
+
+Dashboards, alerting and automation tend to ask an SBC for its role or its
+KPIs at the same moment. A SingleFlight makes concurrent identical reads
+share one GET and one parsed result: the first thread sends the call, the
+others wait for it and get what it got, or the exception it raised.
+
+Reads of endpoints that rarely change can also be cached for a short time,
+per endpoint. The endpoints are named after the Sbc methods and properties
+that read them:
+
+- role
+- supported_rest_api_versions
+- kpi_snapshot, also used by global_cps and global_con_sessions
+- config_element_types
+- element_type_metadata
+
+Only reads that complete are cached. The Sbc methods raise when a read
+fails, also when the SBC answers with an error, so a failure is never
+cached. Sbc.role catches the exception and returns False.
+
+Every Sbc object has a SingleFlight of its own. Pass the same SingleFlight
+to several Sbc objects, or to the AsyncSbc objects of an event loop, to
+share calls between them. Calls are keyed by URL, so one SingleFlight can
+serve many SBCs. To share calls between processes, send them through one
+sbc-daemon, see sbc_rest_client.daemon.
+
+Example:
+
+    from sbc_rest_client.singleflight import SingleFlight
+
+    single_flight = SingleFlight(
+        ttls={"supported_rest_api_versions": 3600, "kpi_snapshot": 1}
+    )
+    sbc = Sbc("admin", "password", "sbc.example.com",
+              single_flight=single_flight)
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Tuple, Union
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+class SingleFlight(object):
+    """Coalesce identical concurrent reads, and cache them per endpoint.
+
+    Safe to share between Sbc objects and threads.
+    """
+
+    def __init__(self, ttls: Union[Dict[str, float], None] = None) -> None:
+        """Initialize a SingleFlight object.
+
+        Args:
+            ttls: The number of seconds the result of a read of an endpoint
+                is reused, by endpoint name. E.g.,
+                {"supported_rest_api_versions": 3600}. Endpoints that are not
+                in it are not cached, only coalesced.
+        """
+
+        self.ttls = dict(ttls or {})
+        # Counters, for monitoring
+        self.calls = 0
+        self.shared = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Tuple[str, str], Future] = dict()
+        # (endpoint, key): (expires, value)
+        self._cache: Dict[Tuple[str, str], Tuple[float, Any]] = dict()
+
+    def do(self, endpoint: str, key: str, read: Callable[[], Any]) -> Any:
+        """Read with read(), unless the same read is in flight or cached.
+
+        Args:
+            endpoint: The name of the endpoint, to look up its TTL.
+            key: Identifies the read. E.g., the URL of the API call.
+            read: Sends the call and parses the response. It must raise if
+                the read fails, what it returns is cached.
+
+        Returns:
+            What read() returned, for this thread or for the thread that
+            sent the call. Treat it as read only, it is shared.
+
+        Raises:
+            Whatever read() raised.
+        """
+
+        ttl = self.ttls.get(endpoint, 0)
+        flight = (endpoint, key)
+        with self._lock:
+            if ttl:
+                cached = self._cache.get(flight)
+                if cached is not None and cached[0] > time.monotonic():
+                    self.hits += 1
+                    return cached[1]
+            future = self._in_flight.get(flight)
+            if future is not None:
+                self.shared += 1
+                leader = False
+            else:
+                future = self._in_flight[flight] = Future()
+                self.calls += 1
+                leader = True
+        if not leader:
+            return future.result()
+
+        try:
+            value = read()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[flight]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            # Reads that start from now on send a call of their own
+            del self._in_flight[flight]
+            if ttl:
+                self._cache[flight] = (time.monotonic() + ttl, value)
+        future.set_result(value)
+        return value
+
+    def invalidate(self, endpoint: Union[str, None] = None,
+                   key: Union[str, None] = None) -> None:
+        """Forget cached reads.
+
+        Args:
+            endpoint: Only of this endpoint. None forgets all.
+            key: Only with this key. E.g., the URL of one SBC.
+        """
+
+        with self._lock:
+            for flight in list(self._cache):
+                if endpoint in (None, flight[0]) and key in (None, flight[1]):
+                    del self._cache[flight]
+
+    def __repr__(self) -> str:
+        return "{cls}(calls={calls}, shared={shared}, hits={hits})".format(
+            cls=type(self).__name__, calls=self.calls, shared=self.shared,
+            hits=self.hits
+        )
@@ -0,0 +1,289 @@
+"""Bring the configuration of an SBC in line with a desired state.
+
+The desired state is a file with configElement nodes, e.g., kept in git. Like
+for update_config_element(), an element only needs its key attributes and
+the attributes you want to manage. sync_config() fetches the running
+configuration of the element types in the desired state, indexes it by key
+attributes and computes a minimal diff:
+
+- adds: desired elements that are not running,
+- updates: desired elements whose managed attributes or sub elements differ
+  from the running ones. Only the key attributes and the changed attributes
+  are sent,
+- deletes: running elements that are not desired. Only with prune=True.
+
+Sub elements are compared like elements, only the attributes a desired
+sub element has count. They are matched by sub element type and position.
+If the desired and running sub elements of a type differ in number or in a
+desired attribute, the whole desired element is sent, its sub elements
+replace the running ones. Sub element types a desired element does not
+have are left alone, like attributes it does not have. So a diff never
+removes all sub elements of a type. Do that with an explicit
+update_config_element().
+
+The diff is applied in a single ConfigTransaction, so a push costs one lock
+and one activate and scales with the size of the change, not of the config.
+
+Example:
+
+    from sbc_rest_client.sync import sync_config
+
+    diff = sync_config(sbc, "sbc1.xml", dry_run=True)
+    print(diff.summary())
+    sync_config(sbc, "sbc1.xml")
+"""
+
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Sequence, Tuple, Union
+
+from sbc_rest_client.elements import ConfigElement
+from sbc_rest_client.sbc import Sbc
+from sbc_rest_client.transaction import ConfigTransaction
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+Key = Tuple
+
+
+class ConfigDiff(object):
+    """The changes that bring running configuration elements to a desired
+    state.
+
+    Attributes:
+        adds: ConfigElements to add.
+        updates: ConfigElements to update, holding only the key attributes and
+            the changed attributes, or the whole desired element if its sub
+            elements changed.
+        deletes: (element_type, key_attribs) tuples of elements to delete.
+    """
+
+    __slots__ = ("adds", "updates", "deletes")
+
+    def __init__(self) -> None:
+        self.adds: List[ConfigElement] = list()
+        self.updates: List[ConfigElement] = list()
+        self.deletes: List[Tuple[str, str]] = list()
+
+    def __len__(self) -> int:
+        return len(self.adds) + len(self.updates) + len(self.deletes)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def extend(self, other: "ConfigDiff") -> None:
+        """Add the changes of another diff to this one."""
+
+        self.adds.extend(other.adds)
+        self.updates.extend(other.updates)
+        self.deletes.extend(other.deletes)
+
+    def summary(self) -> str:
+        return "{} to add, {} to update, {} to delete".format(
+            len(self.adds), len(self.updates), len(self.deletes)
+        )
+
+    def __repr__(self) -> str:
+        return "{cls}({summary})".format(
+            cls=type(self).__name__, summary=self.summary()
+        )
+
+
+def index_elements(elements: Iterable[ConfigElement],
+                   key_attributes: Sequence[str]
+                   ) -> "OrderedDict[Key, ConfigElement]":
+    """Index configuration elements by the values of their key attributes.
+
+    Raises:
+        ValueError: Two elements have the same key.
+    """
+
+    index = OrderedDict()
+    for element in elements:
+        key = element.key(key_attributes)
+        if key in index:
+            raise ValueError("Duplicate {} with key {}".format(
+                element.element_type, dict(zip(key_attributes, key))
+            ))
+        index[key] = element
+    return index
+
+
+def _matches(current: ConfigElement, desired: ConfigElement) -> bool:
+    """current has the attribute values and sub elements desired has."""
+
+    for name, value in desired.items():
+        if current.get(name) != value:
+            return False
+    return _sub_elements_match(current, desired)
+
+
+def _sub_elements_match(current: ConfigElement, desired: ConfigElement
+                        ) -> bool:
+    """The sub elements of current match those of desired, by type and
+    position. Sub element types desired does not have are not compared.
+    """
+
+    if not desired.sub_elements:
+        return True
+    running = dict()
+    for element in current.sub_elements:
+        running.setdefault(element.element_type, list()).append(element)
+    wanted = OrderedDict()
+    for element in desired.sub_elements:
+        wanted.setdefault(element.element_type, list()).append(element)
+    for element_type, elements in wanted.items():
+        others = running.get(element_type, ())
+        if len(others) != len(elements) or not all(
+                _matches(other, element)
+                for other, element in zip(others, elements)):
+            return False
+    return True
+
+
+def diff_elements(running: Iterable[ConfigElement],
+                  desired: Iterable[ConfigElement],
+                  key_attributes: Sequence[str],
+                  prune: bool = False) -> ConfigDiff:
+    """Compute the diff between the running and desired elements of one
+    element type.
+
+    Args:
+        running: The running configuration elements.
+        desired: The desired configuration elements.
+        key_attributes: The names of the key attributes of the element type.
+        prune: Delete running elements that are not desired.
+
+    Returns:
+        A ConfigDiff.
+
+    Raises:
+        ValueError: Two running, or two desired, elements have the same key.
+    """
+
+    key_attributes = tuple(key_attributes)
+    running = index_elements(running, key_attributes)
+    desired = index_elements(desired, key_attributes)
+    diff = ConfigDiff()
+    for key, element in desired.items():
+        current = running.get(key)
+        if current is None:
+            diff.adds.append(element)
+            continue
+        if not _sub_elements_match(current, element):
+            diff.updates.append(element)
+            continue
+        changed = [
+            name for name, value in element.items()
+            if name not in key_attributes and current.get(name) != value
+        ]
+        if changed:
+            diff.updates.append(
+                element.subset(key_attributes + tuple(changed))
+            )
+    if prune:
+        for key, element in running.items():
+            if key not in desired:
+                diff.deletes.append(
+                    (element.element_type, element.key_attribs(key_attributes))
+                )
+    return diff
+
+
+def load_desired_state(path: str) -> "OrderedDict[str, List[ConfigElement]]":
+    """Load a desired state file.
+
+    The file holds configElement nodes under any root node, e.g.,
+    <configElements><configElement>...</configElement>...</configElements>
+
+    Returns:
+        The element types, in file order, mapped to their ConfigElements.
+    """
+
+    with open(path, "rb") as f:
+        content = f.read()
+    by_type = OrderedDict()
+    for element in ConfigElement.iter_xml(content):
+        by_type.setdefault(element.element_type, list()).append(element)
+    return by_type
+
+
+def diff_config(sbc: Sbc,
+                desired: Union[str, Dict[str, List[ConfigElement]]],
+                prune: bool = False) -> ConfigDiff:
+    """Compute the diff between the running configuration of an SBC and a
+    desired state.
+
+    Only the element types in the desired state are fetched and compared.
+
+    Args:
+        sbc: The Sbc object of the SBC.
+        desired: The path of a desired state file, or element types mapped
+            to their desired ConfigElements.
+        prune: Delete running elements of the desired element types that are
+            not in the desired state.
+
+    Returns:
+        A ConfigDiff.
+    """
+
+    if isinstance(desired, str):
+        desired = load_desired_state(desired)
+    diff = ConfigDiff()
+    for element_type, elements in desired.items():
+        key_attributes = sbc.config_element_key_attributes(element_type)
+        running = list(sbc.config_elements(element_type))
+        diff.extend(diff_elements(running, elements, key_attributes, prune))
+    return diff
+
+
+def apply_diff(sbc: Sbc, diff: ConfigDiff, max_workers: int = 4,
+               activate: bool = True) -> None:
+    """Apply a diff in a single ConfigTransaction.
+
+    Raises:
+        ConfigTransactionError: Locking, an operation or the activation
+            failed.
+    """
+
+    if not diff:
+        return
+    with ConfigTransaction(sbc, max_workers=max_workers,
+                           activate=activate) as tx:
+        for element_type, key_attribs in diff.deletes:
+            tx.delete(element_type, key_attribs)
+        for element in diff.adds:
+            tx.add(element.to_xml())
+        for element in diff.updates:
+            tx.update(element.to_xml())
+
+
+def sync_config(sbc: Sbc,
+                desired: Union[str, Dict[str, List[ConfigElement]]],
+                prune: bool = False, dry_run: bool = False,
+                max_workers: int = 4) -> ConfigDiff:
+    """Bring the running configuration of an SBC in line with a desired
+    state.
+
+    Args:
+        sbc: The Sbc object of the SBC.
+        desired: The path of a desired state file, or element types mapped
+            to their desired ConfigElements.
+        prune: Delete running elements of the desired element types that are
+            not in the desired state.
+        dry_run: Only compute the diff, do not apply it.
+        max_workers: The number of requests in flight at the same time while
+            applying the diff.
+
+    Returns:
+        The ConfigDiff that was, or with dry_run would be, applied.
+
+    Raises:
+        ConfigTransactionError: Applying the diff failed.
+    """
+
+    diff = diff_config(sbc, desired, prune)
+    if not dry_run:
+        apply_diff(sbc, diff, max_workers=max_workers)
+    return diff
@@ -0,0 +1,345 @@
+"""Apply many configuration changes with one lock/activate cycle.
+
+A ConfigTransaction locks the configuration, queues element operations,
+sends them concurrently over the pooled session of the Sbc object and
+activates the configuration once at the end. If an operation or the
+activation fails, the operations that were applied are undone and the
+configuration is unlocked.
+
+Example:
+
+    from sbc_rest_client.transaction import ConfigTransaction
+
+    with ConfigTransaction(sbc) as tx:
+        for xml_str in session_agents:
+            tx.update(xml_str)
+        tx.delete("local-policy", "&from-address=*&to-address=10.0.0.1")
+"""
+
+import logging
+from collections import Counter
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Tuple, Union
+from urllib.parse import parse_qsl
+
+from sbc_rest_client.elements import ConfigElement
+from sbc_rest_client.results import Result
+from sbc_rest_client.sbc import Sbc
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+logger = logging.getLogger(__name__)
+
+# Operations are sent phase by phase, in this order
+_PHASES = ("delete", "add", "update")
+
+
+def _key_values(key_attribs: Union[str, None], key_attributes: Iterable[str]
+                ) -> Union[Tuple[str, ...], None]:
+    """The values of the key attributes in key_attribs query parameters.
+
+    Returns:
+        The values, in the order of key_attributes, or None if the query
+        parameters are not exactly the key attributes.
+    """
+
+    key_attributes = tuple(key_attributes)
+    params = dict(
+        parse_qsl((key_attribs or "").lstrip("&"), keep_blank_values=True)
+    )
+    if set(params) != set(key_attributes):
+        return None
+    return tuple(params[name] for name in key_attributes)
+
+
+class ConfigTransactionError(Exception):
+    """A configuration transaction failed.
+
+    Attributes:
+        failures: A list of (operation, argument) tuples of the element
+            operations that failed.
+        undo_failures: The same for the applied operations that could not
+            be undone. Those stay in the editing configuration.
+    """
+
+    def __init__(self, msg: str, failures: List[Tuple[str, Any]] = None
+                 ) -> None:
+        super().__init__(msg)
+        self.failures = failures or list()
+        self.undo_failures: List[Tuple[str, Any]] = list()
+
+
+class ConfigTransaction(object):
+    """Queue configuration element operations and apply them in one go.
+
+    Operations are sent in three phases: deletes, then adds, then updates.
+    Within a phase they are sent concurrently. Adding a singleton and then
+    updating it, as described in Sbc.add_config_element(), works within one
+    transaction.
+
+    An operation is undone with the opposite operation: an add with a
+    delete, a delete with an add and an update with an update, of the
+    elements as they are in the running configuration. Those are read before
+    the deletes and updates are sent, with one request per element type.
+    """
+
+    def __init__(self, sbc: Sbc, max_workers: int = 4, activate: bool = True,
+                 undo: bool = True) -> None:
+        """Initialize a ConfigTransaction object.
+
+        Args:
+            sbc: The Sbc object to apply the operations on.
+            max_workers: The number of requests in flight at the same time.
+                Keep this at or below the connection pool size of the session
+                of the Sbc object. The requests default is 10.
+            activate: Activate the configuration after all operations
+                succeeded. Otherwise the changes are only applied to the
+                editing configuration.
+            undo: Undo the applied operations when the transaction fails.
+                Costs a GET of the running elements per element type of the
+                deletes and of the updates. False leaves them in the editing
+                configuration.
+        """
+
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.sbc = sbc
+        self.max_workers = max_workers
+        self.activate = activate
+        self.undo = undo
+        self._operations = {phase: list() for phase in _PHASES}
+        # (phase, args, elements before) of the operations that were applied
+        self._applied: List[Tuple[str, tuple, List[str]]] = list()
+        self._locked = False
+
+    def __len__(self) -> int:
+        return sum(len(ops) for ops in self._operations.values())
+
+    def update(self, xml_str: str) -> None:
+        """Queue an update. See Sbc.update_config_element()"""
+
+        self._operations["update"].append((xml_str,))
+
+    def add(self, xml_str: str) -> None:
+        """Queue an add. See Sbc.add_config_element()"""
+
+        self._operations["add"].append((xml_str,))
+
+    def delete(self, element_type: str, key_attribs: str = None) -> None:
+        """Queue a delete. See Sbc.delete_config_element()"""
+
+        self._operations["delete"].append((element_type, key_attribs))
+
+    def _method(self, phase: str) -> Callable[..., Result]:
+        return getattr(self.sbc, phase + "_config_element")
+
+    def _key(self, xml_str: Union[str, ConfigElement]) -> Tuple[str, str]:
+        """The element type and key attributes of the element in xml_str.
+        """
+
+        element = xml_str
+        if not isinstance(element, ConfigElement):
+            element = ConfigElement.from_xml(xml_str)
+        metadata = self.sbc.element_type_metadata(element.element_type)
+        return (
+            element.element_type,
+            element.key_attribs(metadata.key_attributes)
+        )
+
+    def _read(self, element_type: str, key_attribs: Union[str, None]
+              ) -> List[str]:
+        """The XML of the running elements matching key_attribs."""
+
+        return [
+            element.to_xml()
+            for element in self.sbc.config_elements(element_type, key_attribs)
+        ]
+
+    def _read_type(self, element_type: str
+                   ) -> Dict[Tuple[str, ...], List[str]]:
+        """The XML of every running element of an element type, by the
+        values of its key attributes.
+        """
+
+        key_attributes = self.sbc.element_type_metadata(
+            element_type
+        ).key_attributes
+        running: Dict[Tuple[str, ...], List[str]] = dict()
+        for element in self.sbc.config_elements(element_type):
+            values = tuple(
+                value if isinstance(value, str) else ",".join(value)
+                for value in element.key(key_attributes)
+            )
+            running.setdefault(values, list()).append(element.to_xml())
+        return running
+
+    def _befores(self, executor: Executor, phase: str,
+                 operations: List[tuple]) -> List[List[str]]:
+        """The XML of the running elements every operation of a phase
+        changes.
+
+        The running elements of an element type with several operations are
+        read with one request. Other operations read their own elements.
+
+        Raises:
+            Exception: The elements could not be read.
+        """
+
+        if not self.undo or phase == "add":
+            return [list() for _ in operations]
+        keys = [
+            args if phase == "delete" else self._key(args[0])
+            for args in operations
+        ]
+        counts = Counter(element_type for element_type, _ in keys)
+        shared = [element_type for element_type, n in counts.items() if n > 1]
+        running = dict(zip(shared, executor.map(self._read_type, shared)))
+        befores: List[Union[List[str], None]] = list()
+        reads = list()
+        for i, (element_type, key_attribs) in enumerate(keys):
+            if element_type in running:
+                values = _key_values(
+                    key_attribs,
+                    self.sbc.element_type_metadata(
+                        element_type
+                    ).key_attributes
+                )
+                if values is not None:
+                    befores.append(running[element_type].get(values, []))
+                    continue
+            befores.append(None)
+            reads.append(i)
+        for i, before in zip(
+                reads, executor.map(lambda i: self._read(*keys[i]), reads)):
+            befores[i] = before
+        return befores
+
+    def _send(self) -> None:
+        """Send all queued operations, phase by phase.
+
+        Raises:
+            ConfigTransactionError: One or more operations failed. The
+                remaining phases are not sent.
+        """
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for phase in _PHASES:
+                operations = self._operations[phase]
+                method = self._method(phase)
+                befores = self._befores(executor, phase, operations)
+                results = executor.map(lambda args: method(*args), operations)
+                failures = list()
+                for args, before, ok in zip(operations, befores, results):
+                    if ok:
+                        if self.undo:
+                            self._applied.append((phase, args, before))
+                    else:
+                        failures.append(
+                            (phase, args if len(args) > 1 else args[0])
+                        )
+                if failures:
+                    raise ConfigTransactionError(
+                        "{} of {} {} operations failed".format(
+                            len(failures), len(operations), phase
+                        ),
+                        failures
+                    )
+
+    def begin(self) -> None:
+        """Lock the configuration.
+
+        Raises:
+            ConfigTransactionError: The configuration could not be locked.
+        """
+
+        if not self.sbc.lock():
+            raise ConfigTransactionError("Failed to lock the config.!")
+        self._locked = True
+
+    def commit(self) -> None:
+        """Send the queued operations, activate and unlock.
+
+        If sending or activating fails, the operations that were applied
+        are undone before the configuration is unlocked, see rollback().
+
+        Raises:
+            ConfigTransactionError: An operation or the activation failed.
+                Its undo_failures lists the operations that could not be
+                undone.
+        """
+
+        try:
+            self._send()
+            if self.activate and len(self) and not self.sbc.activate_config():
+                raise ConfigTransactionError("Failed to activate config.!")
+        except ConfigTransactionError as e:
+            e.undo_failures = self.rollback()
+            raise
+        except BaseException:
+            self.rollback()
+            raise
+        self._applied.clear()
+        for operations in self._operations.values():
+            operations.clear()
+        self._unlock()
+
+    def rollback(self) -> List[Tuple[str, Any]]:
+        """Undo the applied operations, drop the queued ones and unlock the
+        configuration.
+
+        Operations are undone one at a time, the last applied first. The
+        configuration is unlocked even if undoing fails.
+
+        Returns:
+            A list of (operation, argument) tuples of the operations that
+            could not be undone.
+        """
+
+        undo_failures = list()
+        try:
+            while self._applied:
+                phase, args, before = self._applied.pop()
+                try:
+                    undone = self._undo(phase, args, before)
+                except Exception:
+                    logger.exception("Failed to undo %s %s", phase, args)
+                    undone = False
+                if not undone:
+                    undo_failures.append(
+                        (phase, args if len(args) > 1 else args[0])
+                    )
+        finally:
+            self._applied.clear()
+            for operations in self._operations.values():
+                operations.clear()
+            self._unlock()
+        return undo_failures
+
+    def _undo(self, phase: str, args: tuple, before: List[str]) -> bool:
+        """Undo an applied operation. True if it was undone."""
+
+        if phase == "add":
+            return bool(self.sbc.delete_config_element(*self._key(args[0])))
+        if phase == "delete":
+            # Re-add the elements that were deleted
+            return all([self.sbc.add_config_element(xml) for xml in before])
+        # Put back the attribute values of the running configuration
+        return all([self.sbc.update_config_element(xml) for xml in before])
+
+    def _unlock(self) -> None:
+        if self._locked:
+            self._locked = False
+            self.sbc.unlock()
+
+    def __enter__(self) -> "ConfigTransaction":
+        self.begin()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
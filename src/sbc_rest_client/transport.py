@@ -0,0 +1,314 @@
+"""Pooled, kept-alive HTTP sessions for the REST API.
+
+A TLS handshake with an SBC costs more than most API calls themselves, so
+connections should be reused as much as possible:
+
+- make_session() creates a requests.Session with a tuned connection pool,
+  TCP keep-alive on idle connections and a Retry policy for idempotent
+  requests.
+- shared_session() returns one such session per host and pool settings, so
+  several Sbc objects pointing at the same SBC share their connections.
+
+Sessions of Sbc objects with a HostLimiter do not retry 429 and 503
+responses. A retry would be sent within the slot of the first attempt,
+hidden from the limiter, see sbc_rest_client.ratelimit.
+
+Connections of these sessions time how long setting them up takes. See
+connection_timings().
+
+Example:
+
+    from sbc_rest_client.transport import shared_session
+
+    session = shared_session("sbc1.example.com", pool_maxsize=32)
+    sbc1 = Sbc("admin", "password", "sbc1.example.com", session=session)
+    sbc2 = Sbc("admin", "password", "sbc1.example.com", session=session)
+"""
+
+import socket
+import threading
+import time
+from typing import Dict, Iterable, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from sbc_rest_client.ratelimit import OVERLOAD_STATUSES
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+# Requests that are safe to retry. PUT and DELETE are idempotent too, but
+# configuration changes are only retried by the caller.
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+RETRY_STATUSES = (502, 503, 504)
+
+
+def make_retry(total: int = 2, backoff_factor: float = 0.2,
+               status_forcelist: Iterable[int] = RETRY_STATUSES,
+               methods: Iterable[str] = IDEMPOTENT_METHODS) -> Retry:
+    """Create a Retry policy for idempotent API calls.
+
+    Connection errors and the status codes in status_forcelist are retried
+    with exponential backoff. A Retry-After header is respected. After the
+    last attempt the response is returned as is, so callers still see the
+    status code.
+
+    Args:
+        total: The maximum number of retries.
+        backoff_factor: The backoff factor of urllib3. Retries wait
+            backoff_factor * 2 ** (retry - 1) seconds.
+        status_forcelist: The status codes to retry.
+        methods: The HTTP methods to retry.
+    """
+
+    kwargs = dict(
+        total=total, backoff_factor=backoff_factor,
+        status_forcelist=tuple(status_forcelist), raise_on_status=False,
+        respect_retry_after_header=True
+    )
+    try:
+        return Retry(allowed_methods=frozenset(methods), **kwargs)
+    except TypeError:
+        # urllib3 < 1.26
+        return Retry(method_whitelist=frozenset(methods), **kwargs)
+
+
+def without_overload_retries(retries: Union[Retry, int, None]
+                             ) -> Union[Retry, int]:
+    """retries, without retries of 429 and 503 responses.
+
+    Neither when they are in its status_forcelist, nor when they have a
+    Retry-After header. Leave those to a HostLimiter.
+
+    Args:
+        retries: A Retry policy, or a number of retries. None is
+            make_retry(). A number of retries only retries connection
+            errors, it is returned as is.
+    """
+
+    if retries is None:
+        retries = make_retry()
+    if not isinstance(retries, Retry):
+        return retries
+    return retries.new(
+        status_forcelist=tuple(
+            status for status in retries.status_forcelist or ()
+            if status not in OVERLOAD_STATUSES
+        ),
+        respect_retry_after_header=False
+    )
+
+
+def keep_alive_options(idle: int = 60, interval: int = 10, count: int = 3
+                       ) -> "list[tuple]":
+    """Socket options that enable TCP keep-alive.
+
+    Idle pooled connections are probed, so connections dropped by a firewall
+    or NAT box are noticed before a request is sent on them. The idle,
+    interval and count options are only set where the platform has them.
+
+    Args:
+        idle: The number of idle seconds before the first probe.
+        interval: The number of seconds between probes.
+        count: The number of unanswered probes after which the connection
+            is dropped.
+    """
+
+    options = list(HTTPConnection.default_socket_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    for name, value in (("TCP_KEEPIDLE", idle), ("TCP_KEEPINTVL", interval),
+                        ("TCP_KEEPCNT", count)):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return options
+
+
+# The connection set up times of the current thread, see connection_timings()
+_timings = threading.local()
+
+
+def reset_connection_timings() -> None:
+    """Zero the connection timings of the current thread."""
+
+    _timings.connect = 0.0
+    _timings.tls = 0.0
+
+
+def connection_timings() -> "tuple[float, float]":
+    """The seconds spent setting up connections in the current thread since
+    reset_connection_timings().
+
+    Returns:
+        A (connect, tls) tuple. connect includes the DNS lookup. Both are 0
+        if a pooled connection was reused.
+    """
+
+    return getattr(_timings, "connect", 0.0), getattr(_timings, "tls", 0.0)
+
+
+class TimedHTTPConnection(HTTPConnection):
+    """An HTTPConnection that times setting up the TCP connection."""
+
+    def _new_conn(self) -> socket.socket:
+        start = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            _timings.connect = (
+                getattr(_timings, "connect", 0.0)
+                + time.perf_counter() - start
+            )
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    """An HTTPSConnection that times the TCP connection and TLS handshake."""
+
+    def _new_conn(self) -> socket.socket:
+        start = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            _timings.connect = (
+                getattr(_timings, "connect", 0.0)
+                + time.perf_counter() - start
+            )
+
+    def connect(self) -> None:
+        connect_before = getattr(_timings, "connect", 0.0)
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            elapsed = time.perf_counter() - start
+            connect = getattr(_timings, "connect", 0.0) - connect_before
+            _timings.tls = getattr(_timings, "tls", 0.0) + elapsed - connect
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class PoolAdapter(HTTPAdapter):
+    """An HTTPAdapter whose connections use the given socket options and
+    time their set up.
+    """
+
+    def __init__(self, socket_options: Union["list[tuple]", None] = None,
+                 **kwargs) -> None:
+        self.socket_options = socket_options
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        if self.socket_options is not None:
+            kwargs["socket_options"] = self.socket_options
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+
+def make_session(pool_connections: int = 1, pool_maxsize: int = 10,
+                 pool_block: bool = False,
+                 retries: Union[Retry, int, None] = None,
+                 keep_alive_idle: Union[int, None] = 60,
+                 retry_overload: bool = True
+                 ) -> requests.Session:
+    """Create a requests.Session with a tuned connection pool.
+
+    Args:
+        pool_connections: The number of hosts to keep a pool for.
+        pool_maxsize: The maximum number of connections kept per host. Size
+            it to the number of threads that use the session at the same
+            time, otherwise connections are discarded and set up again.
+        pool_block: Make threads wait for a free connection instead of
+            opening one that is discarded afterwards.
+        retries: The Retry policy, or a number of retries. Defaults to
+            make_retry(). Pass 0 to disable retries.
+        keep_alive_idle: The number of idle seconds after which pooled
+            connections are probed with TCP keep-alive. None disables TCP
+            keep-alive probes.
+        retry_overload: Retry 429 and 503 responses as retries says. False
+            never retries them, for calls that go through a HostLimiter.
+    """
+
+    if not retry_overload:
+        retries = without_overload_retries(retries)
+    elif retries is None:
+        retries = make_retry()
+    socket_options = None
+    if keep_alive_idle is not None:
+        socket_options = keep_alive_options(idle=keep_alive_idle)
+    adapter = PoolAdapter(
+        socket_options=socket_options, pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize, pool_block=pool_block,
+        max_retries=retries
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_shared_sessions: Dict[Tuple, requests.Session] = dict()
+_shared_sessions_lock = threading.Lock()
+
+
+def _retry_key(retries: Union[Retry, int, None]) -> Union[tuple, int, None]:
+    """retries as part of the key of a shared session.
+
+    Retry policies with the same parameters have the same key. The repr()
+    of a Retry leaves most of them out.
+    """
+
+    if not isinstance(retries, Retry):
+        return retries
+    return tuple(sorted(
+        (name, frozenset(value) if isinstance(value, (set, list)) else value)
+        for name, value in vars(retries).items()
+    ))
+
+
+def shared_session(host: str, pool_maxsize: int = 10,
+                   pool_block: bool = False,
+                   retries: Union[Retry, int, None] = None,
+                   keep_alive_idle: Union[int, None] = 60,
+                   retry_overload: bool = True
+                   ) -> requests.Session:
+    """Get the session shared by all users of host with the same settings.
+
+    The session is created with make_session() on first use.
+    """
+
+    key = (
+        host, pool_maxsize, pool_block, _retry_key(retries), keep_alive_idle,
+        retry_overload
+    )
+    with _shared_sessions_lock:
+        session = _shared_sessions.get(key)
+        if session is None:
+            session = make_session(
+                pool_maxsize=pool_maxsize, pool_block=pool_block,
+                retries=retries, keep_alive_idle=keep_alive_idle,
+                retry_overload=retry_overload
+            )
+            _shared_sessions[key] = session
+        return session
+
+
+def close_shared_sessions() -> None:
+    """Close all shared sessions and their connections."""
+
+    with _shared_sessions_lock:
+        for session in _shared_sessions.values():
+            session.close()
+        _shared_sessions.clear()
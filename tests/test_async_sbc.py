@@ -0,0 +1,36 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from sbc_rest_client.async_sbc import AsyncSbc, run_on_fleet_async
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+class _CountingExecutor(ThreadPoolExecutor):
+
+    def __init__(self) -> None:
+        super().__init__(max_workers=1)
+        self.submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+def test_own_executor_is_used_within_run_on_fleet_async():
+    executor = _CountingExecutor()
+    sbcs = [
+        AsyncSbc("admin", "admin", "sbc.example.com", executor=executor),
+        AsyncSbc("admin", "admin", "sbc.example.com"),
+    ]
+
+    async def main():
+        return await run_on_fleet_async(
+            sbcs, lambda sbc: sbc._run(lambda: sbc.host)
+        )
+
+    assert asyncio.run(main()) == ["sbc.example.com"] * 2
+    # Only the call of the object that was given the executor
+    assert executor.submitted == 1
+    executor.shutdown()
@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+from sbc_rest_client.backup import ConfigArchive, export_config
+from sbc_rest_client.metadata import ElementTypeMetadata
+from sbc_rest_client.simulator import SbcSimulator
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+ELEMENT_TYPES = ["session-agent", "realm-config", "local-policy"]
+
+
+@pytest.fixture
+def simulator():
+    with SbcSimulator(element_count=20, attribute_count=5) as simulator:
+        yield simulator
+
+
+@pytest.mark.parametrize("name", ["sbc.sqlite", "sbc.xml.gz"])
+def test_round_trip(simulator, tmp_path, name):
+    path = str(tmp_path / name)
+    sbc = simulator.sbc()
+    result = export_config(sbc, path, ELEMENT_TYPES)
+    assert result
+    assert result.value == {element_type: 20 for element_type in
+                            ELEMENT_TYPES}
+    assert not os.path.exists(path + ".tmp")
+    with ConfigArchive(path) as archive:
+        assert archive.meta["host"] == sbc.host
+        assert archive.meta["errors"] == {}
+        assert archive.element_types() == ELEMENT_TYPES
+        assert len(archive) == 60
+        for element_type in ELEMENT_TYPES:
+            running = list(sbc.config_elements(element_type))
+            assert list(archive.elements(element_type)) == running
+            assert archive.keys(element_type) == [
+                element.key_attribs() for element in running
+            ]
+            assert archive.metadata(element_type).key_attributes == \
+                sbc.element_type_metadata(element_type).key_attributes
+            for element in running[::7]:
+                assert archive.get(element_type, element.key_attribs()) == \
+                    element
+        assert archive.get("session-agent", "&hostname=missing") is None
+        assert archive.get("missing-type") is None
+        assert list(archive.elements("missing-type")) == []
+
+
+@pytest.mark.parametrize("name", ["sbc.sqlite", "sbc.xml.gz"])
+def test_elements_without_key_attributes(simulator, tmp_path, name,
+                                         monkeypatch):
+    path = str(tmp_path / name)
+    sbc = simulator.sbc()
+    running = list(sbc.config_elements("session-agent"))
+    metadata = sbc.element_type_metadata("session-agent")
+    monkeypatch.setattr(
+        sbc, "element_type_metadata",
+        lambda element_type: ElementTypeMetadata(
+            element_type, metadata.attributes, ()
+        )
+    )
+    assert export_config(sbc, path, ["session-agent"])
+    with ConfigArchive(path) as archive:
+        assert archive.keys("session-agent") == [""] * 20
+        # None of them is lost
+        assert list(archive.elements("session-agent")) == running
+        assert archive.count("session-agent") == 20
+        assert archive.get("session-agent") == running[0]
+
+
+def test_failed_element_type_is_reported(simulator, tmp_path):
+    path = str(tmp_path / "sbc.sqlite")
+    result = export_config(
+        simulator.sbc(), path, ["session-agent", "no-such-type"]
+    )
+    assert not result
+    assert result.value == {"session-agent": 20}
+    with ConfigArchive(path) as archive:
+        assert archive.element_types() == ["session-agent"]
+        assert list(archive.meta["errors"]) == ["no-such-type"]
+
+
+def test_unknown_format(simulator, tmp_path):
+    with pytest.raises(ValueError):
+        export_config(simulator.sbc(), str(tmp_path / "sbc.zip"))
@@ -0,0 +1,112 @@
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import pytest
+
+from sbc_rest_client import daemon as daemon_module
+from sbc_rest_client.daemon import (
+    DaemonClient, DaemonError, SbcDaemon, default_socket_path,
+    private_directory
+)
+from sbc_rest_client.simulator import SbcSimulator
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+def test_not_idle_while_calls_are_running(monkeypatch):
+    daemon = SbcDaemon(idle_timeout=0.05)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow(line):
+        started.set()
+        release.wait(5)
+        return {"ok": True, "value": None}
+
+    monkeypatch.setattr(daemon, "_handle", slow)
+    thread = threading.Thread(target=daemon.handle, args=(b"{}",))
+    thread.start()
+    started.wait(5)
+    time.sleep(0.1)
+    assert not daemon.idle
+    release.set()
+    thread.join()
+    # Counted from when the call finished
+    assert not daemon.idle
+    time.sleep(0.1)
+    assert daemon.idle
+
+
+def test_calls_and_idle_shutdown():
+    path = os.path.join(tempfile.mkdtemp(), "sbc.sock")
+    with SbcSimulator() as simulator:
+        daemon = SbcDaemon(path, idle_timeout=0.5).start()
+        client = DaemonClient(path)
+        assert client.call(
+            simulator.address, simulator.user, simulator.passwd, "role",
+            options={"scheme": simulator.scheme}
+        ) == "standalone"
+        # Pings are requests too, watch the socket instead
+        deadline = time.monotonic() + 5
+        while os.path.exists(path) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        assert not os.path.exists(path)
+        daemon.stop()
+
+
+@pytest.fixture
+def served():
+    path = os.path.join(tempfile.mkdtemp(), "sbc.sock")
+    daemon = SbcDaemon(path).start()
+    yield path
+    daemon.stop()
+
+
+def test_default_socket_in_private_directory(tmp_path, monkeypatch):
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    path = default_socket_path()
+    assert os.path.dirname(os.path.dirname(path)) == str(tmp_path)
+    daemon = SbcDaemon().start()
+    try:
+        assert DaemonClient().available()
+        assert os.stat(os.path.dirname(path)).st_mode & 0o777 == 0o700
+    finally:
+        daemon.stop()
+
+
+def test_private_directory_rejects_shared_directories(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir(mode=0o777)
+    shared.chmod(0o777)
+    with pytest.raises(DaemonError):
+        private_directory(str(shared))
+    link = tmp_path / "link"
+    link.symlink_to(private_directory(str(tmp_path / "private")))
+    with pytest.raises(DaemonError):
+        private_directory(str(link))
+
+
+def test_client_rejects_socket_of_other_user(served, monkeypatch):
+    uid = os.getuid() + 1
+    monkeypatch.setattr(daemon_module.os, "getuid", lambda: uid)
+    client = DaemonClient(served)
+    with pytest.raises(DaemonError, match="another user"):
+        client.call("sbc.example.com", "admin", "password", "role")
+    assert not client.available()
+
+
+def test_client_checks_peer_credentials(served, monkeypatch):
+    if not hasattr(socket, "SO_PEERCRED"):
+        pytest.skip("No SO_PEERCRED on this platform")
+    monkeypatch.setattr(daemon_module, "_check_owner", lambda path: None)
+    uid = os.getuid() + 1
+    monkeypatch.setattr(daemon_module.os, "getuid", lambda: uid)
+    with pytest.raises(DaemonError, match="another user"):
+        DaemonClient(served).call(
+            "sbc.example.com", "admin", "password", "role"
+        )
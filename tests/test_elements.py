@@ -0,0 +1,127 @@
+import pytest
+
+from sbc_rest_client import elements
+from sbc_rest_client.elements import ConfigElement
+from sbc_rest_client.metadata import ElementTypeMetadata
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+def _attribute(name: str, *values: str) -> str:
+    return "<attribute><name>{}</name>{}</attribute>".format(
+        name, "".join("<value>{}</value>".format(v) for v in values)
+    )
+
+
+def _sub(element_type: str, *children: str) -> str:
+    return (
+        "<subElement><subElementType>{}</subElementType>{}</subElement>"
+    ).format(element_type, "".join(children))
+
+
+def _element(*children: str) -> str:
+    return (
+        "<configElement><elementType>session-agent</elementType>{}"
+        "</configElement>"
+    ).format("".join(children))
+
+
+ROUND_TRIPS = [
+    _element(_attribute("hostname", "sa1.example.com")),
+    # Multi-valued, empty and escaped values
+    _element(
+        _attribute("hostname", "sa1"), _attribute("ip", "10.0.0.1", "::1"),
+        _attribute("description", ""), _attribute("no-value"),
+        _attribute("match", "a &lt; b &amp; c"),
+    ),
+    # Nested sub elements
+    _element(
+        _attribute("hostname", "sa1"),
+        _sub("auth-attribute", _attribute("name", "x"),
+             _sub("value", _attribute("v", "1"))),
+        _sub("auth-attribute", _attribute("name", "y")),
+    ),
+    # Other child nodes stay in place
+    _element(
+        "<comment>first</comment>", _attribute("hostname", "sa1"),
+        "<comment>between</comment>", _attribute("state", "enabled"),
+        _sub("auth-attribute", "<x/>", _attribute("name", "x")),
+        "<comment>before sub</comment>",
+        _sub("auth-attribute", _attribute("name", "y")),
+        "<comment>last</comment>",
+    ),
+]
+
+
+@pytest.mark.parametrize("xml", ROUND_TRIPS)
+def test_round_trip(xml):
+    element = ConfigElement.from_xml(xml)
+    assert element.to_xml(declaration=False) == xml
+    assert ConfigElement.from_xml(element.to_xml()) == element
+
+
+def test_parsed_values():
+    element = ConfigElement.from_xml(ROUND_TRIPS[1])
+    assert element["ip"] == ("10.0.0.1", "::1")
+    assert element["description"] == ""
+    assert element["no-value"] == ()
+    assert element["match"] == "a < b & c"
+    assert element.get("missing") is None
+    with pytest.raises(KeyError):
+        element["missing"]
+
+
+def test_iter_xml():
+    xml = "<response><data><configElements>{}{}</configElements></data>" \
+        "</response>".format(ROUND_TRIPS[0], ROUND_TRIPS[2])
+    assert [e.to_xml(declaration=False)
+            for e in ConfigElement.iter_xml(xml)] == [
+        ROUND_TRIPS[0], ROUND_TRIPS[2]
+    ]
+    assert len(list(ConfigElement.iter_xml(ROUND_TRIPS[1]))) == 1
+
+
+def test_replace_keeps_other_child_nodes_in_place():
+    element = ConfigElement.from_xml(ROUND_TRIPS[3])
+    replaced = element.replace({"state": "disabled", "new": "x"})
+    assert replaced.to_xml(declaration=False) == _element(
+        "<comment>first</comment>", _attribute("hostname", "sa1"),
+        "<comment>between</comment>", _attribute("state", "disabled"),
+        _attribute("new", "x"),
+        _sub("auth-attribute", "<x/>", _attribute("name", "x")),
+        "<comment>before sub</comment>",
+        _sub("auth-attribute", _attribute("name", "y")),
+        "<comment>last</comment>",
+    )
+
+
+def test_key_attribs():
+    metadata = ElementTypeMetadata(
+        "session-agent", ["hostname", "state"], ["hostname"]
+    )
+    element = ConfigElement.from_xml(
+        _element(_attribute("hostname", "a b&amp;c")), metadata
+    )
+    assert element.key() == ("a b&c",)
+    assert element.key_attribs() == "&hostname=a%20b%26c"
+    with pytest.raises(ValueError):
+        ConfigElement.from_xml(ROUND_TRIPS[0]).key()
+
+
+def test_names_are_shared():
+    first = ConfigElement("realm-config", [("identifier", "a")])
+    second = ConfigElement("realm-config", [("identifier", "b")])
+    assert first._names is second._names
+
+
+def test_shared_names_are_bounded(monkeypatch):
+    monkeypatch.setattr(elements, "_shared_names", dict())
+    monkeypatch.setattr(elements, "_SHARED_NAMES_MAX", 2)
+    for i in range(5):
+        ConfigElement("realm-config", [("attribute-{}".format(i), "x")])
+    assert len(elements._shared_names) == 2
+    # Still shared once they are known
+    first = ConfigElement("realm-config", [("attribute-0", "a")])
+    second = ConfigElement("realm-config", [("attribute-0", "b")])
+    assert first._names is second._names
@@ -0,0 +1,99 @@
+import logging
+import threading
+import urllib.request
+
+from sbc_rest_client.exporter import CONTENT_TYPE, SbcExporter
+from sbc_rest_client.kpis import GlobalSessionsSnapshot
+from sbc_rest_client.sbc import SbcError
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+class _Sbc(object):
+    """Stands in for an Sbc object."""
+
+    def __init__(self, host: str, role="active", error=None) -> None:
+        self.host = host
+        self._role = role
+        self.error = error
+
+    def kpi_snapshot(self, max_age=None) -> GlobalSessionsSnapshot:
+        if self.error is not None:
+            raise self.error
+        return GlobalSessionsSnapshot(self.host, {
+            "sysGlobalCPS": 12.5, "sysGlobalConSessions": 40,
+            "sysGlobalState": "up",
+        })
+
+    @property
+    def role(self):
+        return self._role
+
+
+def _samples(exporter: SbcExporter) -> dict:
+    """The samples of the rendered metrics, by name and labels."""
+
+    samples = dict()
+    for line in exporter.metrics.decode().splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = value
+    return samples
+
+
+def test_exposition():
+    exporter = SbcExporter([_Sbc("sbc1"), _Sbc("sbc2", role="standby")])
+    exporter.refresh()
+    text = exporter.metrics.decode()
+    assert "# TYPE sbc_up gauge\n" in text
+    assert text.endswith("\n")
+    samples = _samples(exporter)
+    assert samples['sbc_up{host="sbc1"}'] == "1"
+    assert samples['sbc_role{host="sbc1",role="active"}'] == "1"
+    assert samples['sbc_role{host="sbc1",role="standby"}'] == "0"
+    assert samples['sbc_role{host="sbc2",role="standby"}'] == "1"
+    assert samples['sbc_global_cps{host="sbc1"}'] == "12.5"
+    assert samples['sbc_global_con_sessions{host="sbc2"}'] == "40"
+    assert samples[
+        'sbc_global_sessions{host="sbc1",field="sysGlobalConSessions"}'
+    ] == "40"
+    # Not numeric, not exported
+    assert "sysGlobalState" not in text
+
+
+def test_failed_refresh_is_down(caplog):
+    exporter = SbcExporter([
+        _Sbc("no-role", role=False),
+        _Sbc("no-kpis", error=SbcError("Failed to get global session kpis!")),
+    ])
+    with caplog.at_level(logging.WARNING, logger="sbc_rest_client.exporter"):
+        exporter.refresh()
+    samples = _samples(exporter)
+    assert samples['sbc_up{host="no-role"}'] == "0"
+    assert samples['sbc_up{host="no-kpis"}'] == "0"
+    assert not any(name.startswith("sbc_role") for name in samples)
+    assert sorted(record.getMessage().split(":")[0]
+                  for record in caplog.records) == ["no-kpis", "no-role"]
+
+
+def test_label_values_are_escaped():
+    exporter = SbcExporter([_Sbc('sbc"1\\')])
+    exporter.refresh()
+    assert 'sbc_up{host="sbc\\"1\\\\"} 1' in exporter.metrics.decode()
+
+
+def test_server():
+    exporter = SbcExporter([_Sbc("sbc1")])
+    exporter.refresh()
+    server = exporter.make_server("127.0.0.1", 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = "http://127.0.0.1:{}/metrics".format(server.server_port)
+        with urllib.request.urlopen(url) as r:
+            assert r.headers["Content-Type"] == CONTENT_TYPE
+            assert r.read() == exporter.metrics
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,112 @@
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import pytest
+
+from sbc_rest_client.fleet import FleetExecutor, run_on_fleet
+from sbc_rest_client.simulator import SbcSimulator
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+class _Sbc(object):
+    """Stands in for an Sbc object."""
+
+    def __init__(self, host: str, delay: float = 0.0,
+                 error: Exception = None) -> None:
+        self.host = host
+        self.delay = delay
+        self.error = error
+
+    def read(self) -> str:
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.host
+
+
+def test_map_keeps_order_and_isolates_failures():
+    error = RuntimeError("sbc2 failed")
+    sbcs = [
+        _Sbc("sbc1", delay=0.05), _Sbc("sbc2", error=error), _Sbc("sbc3"),
+    ]
+    with FleetExecutor(max_workers=3) as fleet:
+        assert fleet.map(lambda sbc: sbc.read(), sbcs) == [
+            "sbc1", error, "sbc3"
+        ]
+        with pytest.raises(RuntimeError, match="sbc2 failed"):
+            fleet.map(lambda sbc: sbc.read(), sbcs, return_exceptions=False)
+
+
+def test_as_completed_yields_results_as_they_come_in():
+    error = RuntimeError("sbc3 failed")
+    sbcs = [
+        _Sbc("sbc1", delay=0.2), _Sbc("sbc2"), _Sbc("sbc3", error=error),
+    ]
+    with FleetExecutor(max_workers=3) as fleet:
+        results = list(fleet.as_completed(lambda sbc: sbc.read(), sbcs))
+    assert results[-1] == (sbcs[0], "sbc1")
+    assert sorted(results[:2], key=lambda r: r[0].host) == [
+        (sbcs[1], "sbc2"), (sbcs[2], error)
+    ]
+
+
+def test_map_timeout():
+    release = threading.Event()
+    sbcs = [_Sbc("sbc1"), _Sbc("sbc2"), _Sbc("sbc3")]
+
+    def operation(sbc):
+        if sbc.host != "sbc1":
+            release.wait(5)
+        return sbc.host
+
+    with FleetExecutor(max_workers=2) as fleet:
+        start = time.monotonic()
+        results = fleet.map(operation, sbcs, timeout=0.1)
+        assert time.monotonic() - start < 1
+        release.set()
+    assert results[0] == "sbc1"
+    assert all(isinstance(r, FutureTimeoutError) for r in results[1:])
+
+
+def test_as_completed_timeout():
+    release = threading.Event()
+    sbcs = [_Sbc("sbc1"), _Sbc("sbc2")]
+
+    def operation(sbc):
+        if sbc.host == "sbc2":
+            release.wait(5)
+        return sbc.host
+
+    with FleetExecutor(max_workers=2) as fleet:
+        results = list(fleet.as_completed(operation, sbcs, timeout=0.1))
+        release.set()
+    assert results[0] == (sbcs[0], "sbc1")
+    assert results[1][0] is sbcs[1]
+    assert isinstance(results[1][1], FutureTimeoutError)
+
+
+def test_run_on_fleet_does_not_wait_for_timed_out_operations():
+    release = threading.Event()
+    start = time.monotonic()
+    results = run_on_fleet(
+        [_Sbc("sbc1")], lambda sbc: release.wait(5), timeout=0.1
+    )
+    assert time.monotonic() - start < 1
+    release.set()
+    assert isinstance(results[0], FutureTimeoutError)
+
+
+def test_max_workers():
+    with pytest.raises(ValueError):
+        FleetExecutor(max_workers=0)
+
+
+def test_run_on_fleet_with_simulators():
+    with SbcSimulator() as first, SbcSimulator(role="active") as second:
+        sbcs = [first.sbc(), second.sbc()]
+        assert run_on_fleet(sbcs, lambda sbc: sbc.role) == [
+            "standalone", "active"
+        ]
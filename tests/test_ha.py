@@ -0,0 +1,118 @@
+import requests
+
+from sbc_rest_client.ha import SbcHaPair
+from sbc_rest_client.results import Result
+from sbc_rest_client.sbc import SbcError
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+ACTION = "Update config. element"
+NO_RESPONSE = Result.from_exception(
+    ACTION, requests.exceptions.ConnectionError()
+)
+
+
+class _Peer(object):
+    """Stands in for the Sbc object of a peer."""
+
+    def __init__(self, host: str, role: str) -> None:
+        self.host = host
+        self._role = role
+        self.role_requests = 0
+        self.results = list()
+        self.calls = 0
+        # Raised by reads
+        self.read_error = None
+
+    @property
+    def role(self) -> str:
+        self.role_requests += 1
+        return self._role
+
+    @property
+    def global_cps(self) -> str:
+        if self.read_error is not None:
+            raise self.read_error
+        return self.host
+
+    def update_config_element(self, xml_str: str) -> Result:
+        self.calls += 1
+        if self.results:
+            return self.results.pop(0)
+        return Result(ACTION, True, 200, "OK")
+
+
+def _pair():
+    first, second = _Peer("sbc1", "active"), _Peer("sbc2", "standby")
+    return SbcHaPair(first, second), first, second
+
+
+def test_roles_are_resolved_once():
+    pair, first, second = _pair()
+    assert pair.update_config_element("<xml/>")
+    assert pair.update_config_element("<xml/>")
+    assert first.calls == 2
+    assert first.role_requests == 1
+    assert second.role_requests == 0
+
+
+def test_other_failures_do_not_resolve_roles():
+    pair, first, second = _pair()
+    pair.roles
+    first.results.append(Result(ACTION, False, 404, "Not Found"))
+    result = pair.update_config_element("<xml/>")
+    assert result.status_code == 404
+    assert first.role_requests == 1
+    assert first.calls == 1 and second.calls == 0
+
+
+def test_retried_on_new_active_peer_after_role_change():
+    for failure in (
+            NO_RESPONSE, Result(ACTION, False, 403, "Forbidden"),
+            Result(ACTION, False, 409, "Conflict")):
+        pair, first, second = _pair()
+        pair.roles
+        first.results.append(failure)
+        first._role, second._role = "standby", "active"
+        assert pair.update_config_element("<xml/>")
+        assert pair.active is second
+        assert first.calls == 1 and second.calls == 1
+
+
+def test_not_retried_if_roles_did_not_change():
+    pair, first, second = _pair()
+    pair.roles
+    first.results.append(Result(ACTION, False, 409, "Conflict"))
+    assert not pair.update_config_element("<xml/>")
+    assert first.role_requests == 2
+    assert first.calls == 1 and second.calls == 0
+
+
+def test_failure_returned_if_no_peer_is_active():
+    pair, first, second = _pair()
+    pair.roles
+    first.results.append(NO_RESPONSE)
+    first._role = second._role = False
+    result = pair.update_config_element("<xml/>")
+    assert not result and result.status_code is None
+
+
+def test_reads_fail_over_to_other_peer():
+    for error in (
+            SbcError("Failed to get global session kpis!"),
+            requests.exceptions.ConnectionError()):
+        pair, first, second = _pair()
+        first.read_error = error
+        assert pair.global_cps == "sbc2"
+        # The roles are resolved again
+        assert first.role_requests == 2
+
+
+def test_reads_from_standby_fail_over_to_active():
+    first, second = _Peer("sbc1", "active"), _Peer("sbc2", "standby")
+    pair = SbcHaPair(first, second, read_from="standby")
+    assert pair.global_cps == "sbc2"
+    second.read_error = SbcError("Failed to get global session kpis!")
+    assert pair.global_cps == "sbc1"
@@ -0,0 +1,110 @@
+import random
+
+import pytest
+
+from sbc_rest_client.instrumentation import (
+    Instrumentation, LatencyHistogram, RequestRecord, endpoint_template
+)
+from sbc_rest_client.simulator import SbcSimulator
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+@pytest.mark.parametrize("precision_bits", [2, 7, 10])
+def test_buckets(precision_bits):
+    histogram = LatencyHistogram(precision_bits)
+    # The relative width of a bucket
+    error = 1 / 2 ** (precision_bits - 1)
+    rng = random.Random(precision_bits)
+    values = list(range(0, 5000)) + [
+        rng.randrange(1, 10 ** 9) for _ in range(5000)
+    ] + [2 ** n + d for n in range(1, 40) for d in (-1, 0, 1)]
+    for us in values:
+        index = histogram._index(us)
+        upper = histogram._upper(index)
+        # us is counted in the bucket it falls in, not in the one below
+        assert index == 0 or histogram._upper(index - 1) < us <= upper
+        assert upper - us <= max(us * error, 0)
+        assert histogram._index(upper) == index
+
+
+def test_small_values_are_exact():
+    histogram = LatencyHistogram()
+    for us in range(128):
+        assert histogram._upper(histogram._index(us)) == us
+
+
+def test_percentiles():
+    histogram = LatencyHistogram()
+    values = [n / 1000 for n in range(1, 1001)]
+    random.Random(0).shuffle(values)
+    for seconds in values:
+        histogram.record(seconds)
+    assert histogram.count == 1000
+    assert histogram.mean == pytest.approx(0.5005)
+    assert histogram.min == 0.001
+    assert histogram.max == 1.0
+    for p in (1, 10, 50, 90, 99, 99.9):
+        expected = p / 100
+        assert expected <= histogram.percentile(p) <= expected * 1.016
+    # Capped at the maximum
+    assert histogram.percentile(100) == 1.0
+    assert histogram.percentile(0) == pytest.approx(0.001, rel=0.016)
+    with pytest.raises(ValueError):
+        histogram.percentile(101)
+
+
+def test_percentile_of_a_single_value():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) == 0.0
+    histogram.record(0.123456)
+    for p in (0, 50, 100):
+        assert histogram.percentile(p) == 0.123456
+
+
+def test_merge():
+    first, second, both = (LatencyHistogram() for _ in range(3))
+    for n in range(1, 101):
+        (first if n % 2 else second).record(n / 100)
+        both.record(n / 100)
+    first.merge(second)
+    assert first.counts == both.counts
+    assert first.count == 100
+    assert (first.min, first.max) == (both.min, both.max)
+    assert first.to_dict() == both.to_dict()
+    with pytest.raises(ValueError):
+        first.merge(LatencyHistogram(precision_bits=8))
+
+
+@pytest.mark.parametrize("url, endpoint", [
+    ("https://sbc/rest/v1.1/configuration/configElements?elementType=x",
+     "configuration/configElements"),
+    ("https://sbc/rest/v1.0/operations/123", "operations/{id}"),
+    ("https://sbc/rest/api/versions", "versions"),
+    ("http://sbc:8080/rest/v1.1/system/status/", "system/status"),
+])
+def test_endpoint_template(url, endpoint):
+    assert endpoint_template(url) == endpoint
+
+
+def test_records_api_calls():
+    instrumentation = Instrumentation()
+    records = list()
+    instrumentation.add_callback(records.append)
+    with SbcSimulator(operation_duration=0.01) as simulator:
+        sbc = simulator.sbc(instrumentation=instrumentation)
+        sbc.role
+        sbc.role
+        assert sbc.lock()
+    status = [r for r in records if r.endpoint == "system/status"]
+    assert len(status) == 2
+    assert all(isinstance(r, RequestRecord) for r in records)
+    assert status[0].method == "GET" and status[0].status_code == 200
+    assert status[0].response_bytes > 0
+    rows = {row["endpoint"]: row for row in instrumentation.summary()}
+    assert rows["system/status"]["count"] == 2
+    assert rows["system/status"]["host"] == sbc.host
+    assert "configuration/lock" in rows
+    instrumentation.reset()
+    assert instrumentation.summary() == []
@@ -0,0 +1,29 @@
+from sbc_rest_client.inventory import jsonable, read_inventory
+from sbc_rest_client.metadata import ElementTypeMetadata
+from sbc_rest_client.results import Result
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+def test_read_inventory(tmp_path):
+    path = tmp_path / "sbcs.txt"
+    path.write_text(
+        "# Lab\nsbc1.example.com\n\n  sbc2.example.com  # standby\n"
+    )
+    assert read_inventory(str(path)) == [
+        "sbc1.example.com", "sbc2.example.com"
+    ]
+
+
+def test_jsonable():
+    metadata = ElementTypeMetadata("realm-config", ["identifier"],
+                                   ["identifier"])
+    assert jsonable({1: ("a", None), "b": [1.5, True]}) == {
+        "1": ["a", None], "b": [1.5, True]
+    }
+    assert jsonable(metadata) == metadata.to_dict()
+    assert jsonable(Result("Get role", True, 200, "OK", 0.1)) == {
+        "action": "Get role", "ok": True, "status_code": 200,
+        "reason": "OK", "elapsed": 0.1, "error": None, "value": None
+    }
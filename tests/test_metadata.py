@@ -0,0 +1,123 @@
+import json
+
+import pytest
+
+from sbc_rest_client.metadata import ElementTypeMetadata, MetadataCache
+from sbc_rest_client.simulator import ELEMENT_TYPES, SbcSimulator
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+VERSION = "SCZ8.3.0 MR-1 Patch 9"
+
+
+def _metadata(element_type: str = "session-agent") -> ElementTypeMetadata:
+    return ElementTypeMetadata(
+        element_type, ["hostname", "state"], ["hostname"]
+    )
+
+
+def test_get_put_and_invalidate():
+    cache = MetadataCache()
+    cache.put("sbc1", VERSION, "v1.1", _metadata())
+    cache.put("sbc1", VERSION, "v1.1", _metadata("realm-config"))
+    cache.put("sbc2", VERSION, "v1.1", _metadata())
+    metadata = cache.get("sbc1", VERSION, "v1.1", "session-agent")
+    assert metadata.key_attributes == ("hostname",)
+    assert cache.get("sbc1", "SCZ9.0.0", "v1.1", "session-agent") is None
+    assert cache.get("sbc1", VERSION, "v1.0", "session-agent") is None
+    assert cache.invalidate(host="sbc1", element_type="realm-config") == 1
+    assert cache.invalidate(host="sbc1") == 1
+    assert len(cache) == 1
+    assert cache.invalidate() == 1
+    assert len(cache) == 0
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "metadata.json")
+    cache = MetadataCache(path)
+    cache.put("sbc1", VERSION, "v1.1", _metadata())
+    cache.save()
+    loaded = MetadataCache(path)
+    assert len(loaded) == 1
+    metadata = loaded.get("sbc1", VERSION, "v1.1", "session-agent")
+    assert metadata.attributes == ("hostname", "state")
+    assert metadata.key_attributes == ("hostname",)
+
+
+def test_metadata_without_software_version_is_not_persisted(tmp_path):
+    path = str(tmp_path / "metadata.json")
+    cache = MetadataCache(path)
+    cache.put("sbc1", None, "v1.1", _metadata())
+    cache.put("sbc2", VERSION, "v1.1", _metadata())
+    # In memory it is used
+    assert cache.get("sbc1", None, "v1.1", "session-agent") is not None
+    cache.save()
+    with open(path) as f:
+        assert [entry["host"] for entry in json.load(f)] == ["sbc2"]
+    # Nor loaded from a file written by an older release
+    with open(path, "w") as f:
+        json.dump([dict(
+            host="sbc1", software_version=None, api_version="v1.1",
+            **_metadata().to_dict()
+        )], f)
+    assert len(MetadataCache(path)) == 0
+
+
+def test_save_without_path():
+    with pytest.raises(ValueError):
+        MetadataCache().save()
+
+
+def test_metadata_is_fetched_once():
+    with SbcSimulator() as simulator:
+        sbc = simulator.sbc(software_version=VERSION)
+        metadata = sbc.element_type_metadata("session-agent")
+        assert metadata.key_attributes == ("hostname",)
+        requests_before = simulator.request_count
+        assert sbc.config_element_key_attributes("session-agent") == [
+            "hostname"
+        ]
+        assert simulator.request_count == requests_before
+
+
+def test_prefetch_metadata(tmp_path):
+    path = str(tmp_path / "metadata.json")
+    with SbcSimulator() as simulator:
+        cache = MetadataCache(path)
+        sbc = simulator.sbc(metadata_cache=cache, software_version=VERSION)
+        assert sbc.prefetch_metadata() == len(ELEMENT_TYPES)
+        assert len(cache) == len(ELEMENT_TYPES)
+        cache.save()
+        # Another run is served from the file
+        sbc = simulator.sbc(
+            metadata_cache=MetadataCache(path), software_version=VERSION
+        )
+        requests_before = simulator.request_count
+        for element_type in ELEMENT_TYPES:
+            sbc.element_type_metadata(element_type)
+        assert simulator.request_count == requests_before
+        # After an upgrade nothing is served from the file
+        sbc = simulator.sbc(
+            metadata_cache=MetadataCache(path), software_version="SCZ9.0.0"
+        )
+        sbc.element_type_metadata("session-agent")
+        assert simulator.request_count > requests_before
+
+
+def test_reboot_drops_metadata_without_software_version():
+    with SbcSimulator(operation_duration=0.01) as simulator:
+        cache = MetadataCache()
+        sbc = simulator.sbc(metadata_cache=cache)
+        versioned = simulator.sbc(
+            metadata_cache=cache, software_version=VERSION
+        )
+        sbc.element_type_metadata("session-agent")
+        versioned.element_type_metadata("session-agent")
+        assert len(cache) == 2
+        assert sbc.reboot()
+        assert len(cache) == 1
+        assert cache.get(
+            sbc.host, VERSION, sbc.api_version, "session-agent"
+        ) is not None
@@ -0,0 +1,98 @@
+import requests
+
+from sbc_rest_client.operations import OperationPoller
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+def _response(status: int, content: bytes = b"") -> requests.Response:
+    r = requests.Response()
+    r.status_code = status
+    r._content = content
+    return r
+
+
+def _state(operation: str, status: str) -> requests.Response:
+    return _response(200, (
+        "<response><data><operationState><operation>{}</operation>"
+        "<status>{}</status></operationState></data></response>"
+    ).format(operation, status).encode())
+
+
+def _poller() -> OperationPoller:
+    return OperationPoller(initial_delay=0.001, max_delay=0.001, timeout=5)
+
+
+def _fetch(responses):
+    responses = iter(responses)
+
+    def fetch():
+        r = next(responses)
+        if isinstance(r, Exception):
+            raise r
+        return r
+
+    return fetch
+
+
+def test_polls_until_success():
+    state = _poller().poll(_fetch([
+        _state("activate", "inProgress"), _state("activate", "success")
+    ]), "activate")
+    assert state.succeeded
+    assert state.polls == 2
+
+
+def test_stops_on_failure_state():
+    state = _poller().poll(_fetch([_state("verify", "failed")]), "verify")
+    assert not state
+    assert state.status == "failed"
+
+
+def test_stops_on_unknown_state(caplog):
+    for status in ("rejected", "cancelled"):
+        state = _poller().poll(_fetch([
+            _state("activate", "pending"), _state("activate", status),
+            _state("activate", "success")
+        ]), "activate")
+        assert not state
+        assert state.status == status
+        assert state.polls == 2
+    assert "'rejected'" in caplog.text and "'cancelled'" in caplog.text
+
+
+def test_in_progress_states():
+    poller = OperationPoller(initial_delay=0.001, max_delay=0.001, timeout=5,
+                             in_progress_states=("Busy",))
+    state = poller.poll(_fetch([
+        _state("save", "busy"), _state("save", "success")
+    ]), "save")
+    assert state.succeeded
+    assert state.polls == 2
+
+
+def test_retries_connection_errors_5xx_and_429():
+    state = _poller().poll(_fetch([
+        requests.exceptions.ConnectionError(), _response(503),
+        _response(500), _response(429), _state("save", "success")
+    ]), "save")
+    assert state.succeeded
+    assert state.polls == 5
+
+
+def test_fails_fast_on_other_4xx():
+    for status in (400, 401, 403, 404):
+        state = _poller().poll(_fetch([
+            _response(status), _state("save", "success")
+        ]), "save")
+        assert not state
+        assert state.status is None
+        assert state.polls == 1
+
+
+def test_gives_up_after_timeout():
+    poller = OperationPoller(initial_delay=0.01, max_delay=0.01, timeout=0.05)
+    state = poller.poll(lambda: _response(503), "activate")
+    assert not state
+    assert state.status is None
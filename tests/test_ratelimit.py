@@ -0,0 +1,174 @@
+import email.utils
+import threading
+import time
+
+import pytest
+import requests
+
+from sbc_rest_client.ratelimit import HostLimiter, _retry_after
+from sbc_rest_client.simulator import SbcSimulator
+from sbc_rest_client.transport import make_retry, without_overload_retries
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+def _response(status: int, retry_after: str = None) -> requests.Response:
+    r = requests.Response()
+    r.status_code = status
+    if retry_after is not None:
+        r.headers["Retry-After"] = retry_after
+    return r
+
+
+def test_overload_decreases_once_per_round():
+    limiter = HostLimiter(rate=None, max_in_flight=8, backoff=0.5)
+    sequences = [limiter.acquire() for _ in range(4)]
+    # The calls of one round all see the overload
+    for sequence in sequences:
+        limiter.release(sequence, 0.0, overloaded=True)
+    assert limiter.limit == 4
+    assert limiter.overloads == 4
+    # A call sent after the decrease decreases again
+    limiter.release(limiter.acquire(), 0.0, overloaded=True)
+    assert limiter.limit == 2
+
+
+def test_slow_call_counts_as_overload():
+    limiter = HostLimiter(rate=None, max_in_flight=8, latency_target=1.0)
+    limiter.release(limiter.acquire(), 2.0)
+    assert limiter.limit == 4
+
+
+def test_limit_never_below_min_in_flight():
+    limiter = HostLimiter(rate=None, max_in_flight=4, min_in_flight=2)
+    for _ in range(5):
+        limiter.release(limiter.acquire(), 0.0, overloaded=True)
+    assert limiter.limit == 2
+
+
+def test_additive_increase_up_to_max_in_flight():
+    limiter = HostLimiter(rate=None, max_in_flight=4, probe_interval=0)
+    limiter.release(limiter.acquire(), 0.0, overloaded=True)
+    assert limiter.limit == 2
+    # About one more slot per round of limit calls
+    for _ in range(3):
+        limiter.release(limiter.acquire(), 0.0)
+    assert int(limiter.limit) == 3
+    for _ in range(100):
+        limiter.release(limiter.acquire(), 0.0)
+    assert limiter.limit == 4
+
+
+def test_increase_past_ceiling_waits_for_probe_interval():
+    limiter = HostLimiter(rate=None, max_in_flight=8, probe_interval=60)
+    limiter.release(limiter.acquire(), 0.0, overloaded=True)
+    for _ in range(100):
+        limiter.release(limiter.acquire(), 0.0)
+    # Up to just below the cap at which the SBC was overloaded
+    assert int(limiter.limit) == 7
+    limiter._probe_at = 0.0
+    for _ in range(100):
+        limiter.release(limiter.acquire(), 0.0)
+    assert limiter.limit == 8
+
+
+def test_rate_follows_limit():
+    limiter = HostLimiter(rate=20, max_in_flight=8, min_rate=1)
+    limiter.release(limiter.acquire(), 0.0, overloaded=True)
+    assert limiter.rate == 10
+    for _ in range(5):
+        limiter.release(limiter.acquire(), 0.0, overloaded=True)
+    assert limiter.rate == pytest.approx(2.5)
+
+
+def test_not_adaptive_keeps_limits():
+    limiter = HostLimiter(rate=20, max_in_flight=8, adaptive=False)
+    limiter.release(limiter.acquire(), 0.0, overloaded=True)
+    assert limiter.limit == 8
+    assert limiter.rate == 20
+
+
+def test_in_flight_cap_blocks_until_release():
+    limiter = HostLimiter(rate=None, max_in_flight=1)
+    sequence = limiter.acquire()
+    acquired = threading.Event()
+    thread = threading.Thread(
+        target=lambda: (limiter.acquire(), acquired.set())
+    )
+    thread.start()
+    assert not acquired.wait(0.05)
+    limiter.release(sequence, 0.0)
+    assert acquired.wait(5)
+    thread.join()
+
+
+@pytest.mark.parametrize("value, seconds", [
+    (None, 0.0),
+    ("2", 2.0),
+    ("1.5", 1.5),
+    ("-3", 0.0),
+    ("soon", 0.0),
+])
+def test_retry_after_seconds(value, seconds):
+    assert _retry_after(_response(503, value)) == seconds
+
+
+def test_retry_after_http_date():
+    value = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 28 < _retry_after(_response(503, value)) <= 30
+    value = email.utils.formatdate(time.time() - 30, usegmt=True)
+    assert _retry_after(_response(503, value)) == 0.0
+
+
+def test_retry_after_pauses_calls():
+    limiter = HostLimiter(rate=None, adaptive=False)
+    limiter.call(lambda: _response(503, "0.2"))
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.15
+
+
+@pytest.mark.parametrize("status, overloaded", [
+    (200, False), (404, False), (429, True), (503, True),
+])
+def test_call_counts_overload_statuses(status, overloaded):
+    limiter = HostLimiter(rate=None)
+    r = limiter.call(lambda: _response(status))
+    assert r.status_code == status
+    assert limiter.overloads == int(overloaded)
+    assert limiter.in_flight == 0
+
+
+def test_call_counts_timeouts():
+    limiter = HostLimiter(rate=None)
+
+    def send():
+        raise requests.exceptions.Timeout()
+
+    with pytest.raises(requests.exceptions.Timeout):
+        limiter.call(send)
+    assert limiter.overloads == 1
+    assert limiter.in_flight == 0
+
+
+def test_without_overload_retries():
+    retries = without_overload_retries(make_retry(total=3))
+    assert retries.total == 3
+    assert set(retries.status_forcelist) == {502, 504}
+    assert not retries.respect_retry_after_header
+    assert without_overload_retries(2) == 2
+
+
+def test_every_attempt_goes_through_limiter():
+    with SbcSimulator() as simulator:
+        limiter = HostLimiter(rate=None)
+        sbc = simulator.sbc(limiter=limiter)
+        sbc.role
+        simulator.failure_rate = 1
+        requests_before = simulator.request_count
+        with pytest.raises(Exception):
+            sbc.supported_rest_api_versions
+        # No retries hidden within the limiter slot of the first attempt
+        assert simulator.request_count - requests_before == 1
+        assert limiter.overloads == 1
@@ -0,0 +1,215 @@
+import time
+
+import pytest
+import requests
+
+from sbc_rest_client.responsecache import ResponseCache
+from sbc_rest_client.simulator import SbcSimulator
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+HOST = "sbc.example.com"
+URL = "https://sbc.example.com/rest/v1.1/configuration/configElements"
+
+
+def _xml(element_type: str, **attributes: str) -> str:
+    return (
+        "<configElement><elementType>{}</elementType>{}</configElement>"
+    ).format(
+        element_type, "".join(
+            "<attribute><name>{}</name><value>{}</value></attribute>".format(
+                name.replace("_", "-"), value
+            )
+            for name, value in attributes.items()
+        )
+    )
+
+
+def _response(content: bytes, **headers: str) -> requests.Response:
+    r = requests.Response()
+    r.status_code = 200
+    r._content = content
+    r.headers.update(
+        (name.replace("_", "-"), value) for name, value in headers.items()
+    )
+    return r
+
+
+@pytest.fixture
+def simulator():
+    with SbcSimulator(element_count=3, attribute_count=2,
+                      operation_duration=0.01) as simulator:
+        yield simulator
+
+
+def _get(sbc) -> str:
+    result = sbc.get_config_elements("session-agent")
+    assert result
+    return result.value
+
+
+def test_reused_until_invalidated(simulator):
+    cache = ResponseCache()
+    sbc = simulator.sbc(response_cache=cache)
+    first = _get(sbc)
+    count = simulator.request_count
+    assert _get(sbc) == first
+    assert simulator.request_count == count
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_revalidated_with_etags():
+    with SbcSimulator(element_count=3, attribute_count=2,
+                      etags=True) as simulator:
+        cache = ResponseCache()
+        sbc = simulator.sbc(response_cache=cache)
+        first = _get(sbc)
+        count = simulator.request_count
+        # Asked again, answered with a 304 Not Modified
+        assert _get(sbc) == first
+        assert simulator.request_count == count + 1
+        assert cache.revalidated == 1 and cache.hits == 0
+        # Changed by another client, the ETag no longer matches
+        other = simulator.sbc()
+        assert other.update_config_element(_xml(
+            "session-agent", hostname="hostname-0", attribute_0="changed"
+        ))
+        assert "changed" in _get(sbc)
+        assert cache.revalidated == 1 and cache.misses == 2
+
+
+@pytest.mark.parametrize("change, changes_elements", [
+    (lambda sbc: sbc.update_config_element(_xml(
+        "session-agent", hostname="hostname-0", attribute_0="changed"
+    )), True),
+    (lambda sbc: sbc.add_config_element(
+        _xml("session-agent", hostname="new")
+    ), True),
+    (lambda sbc: sbc.delete_config_element(
+        "session-agent", "&hostname=hostname-1"
+    ), True),
+    (lambda sbc: sbc.activate_config(), False),
+], ids=["update", "add", "delete", "activate"])
+def test_changes_invalidate(simulator, change, changes_elements):
+    cache = ResponseCache()
+    sbc = simulator.sbc(response_cache=cache)
+    first = _get(sbc)
+    assert len(cache) == 1
+    assert change(sbc)
+    assert len(cache) == 0
+    count = simulator.request_count
+    second = _get(sbc)
+    assert simulator.request_count == count + 1
+    assert cache.misses == 2
+    assert (second != first) == changes_elements
+
+
+def test_failed_changes_invalidate(simulator):
+    cache = ResponseCache()
+    sbc = simulator.sbc(response_cache=cache)
+    _get(sbc)
+    assert not sbc.update_config_element(
+        _xml("session-agent", hostname="missing", attribute_0="x")
+    )
+    assert len(cache) == 0
+
+
+def test_streamed_responses_are_cached_when_read_to_the_end(simulator):
+    cache = ResponseCache()
+    sbc = simulator.sbc(response_cache=cache)
+    hostnames = [
+        e.get("hostname") for e in sbc.config_elements("session-agent")
+    ]
+    assert hostnames == ["hostname-0", "hostname-1", "hostname-2"]
+    assert len(cache) == 1
+    count = simulator.request_count
+    assert [
+        e.get("hostname") for e in sbc.config_elements("session-agent")
+    ] == hostnames
+    assert simulator.request_count == count
+    assert cache.hits == 1
+    # The same URL as get_config_elements()
+    assert "hostname-2" in _get(sbc)
+    assert cache.hits == 2
+
+
+def test_streamed_responses_read_partly_are_not_cached(simulator):
+    cache = ResponseCache()
+    sbc = simulator.sbc(response_cache=cache)
+    elements = sbc.iter_config_elements("session-agent")
+    next(elements)
+    elements.close()
+    assert len(cache) == 0
+
+
+def test_cache_directory_is_shared(simulator, tmp_path):
+    first = simulator.sbc(response_cache=ResponseCache(str(tmp_path)))
+    second_cache = ResponseCache(str(tmp_path))
+    second = simulator.sbc(response_cache=second_cache)
+    _get(first)
+    count = simulator.request_count
+    _get(second)
+    # Read from the directory
+    assert simulator.request_count == count
+    assert second_cache.hits == 1
+    # Changed through the first, the second no longer uses its copy
+    assert first.update_config_element(_xml(
+        "session-agent", hostname="hostname-0", attribute_0="changed"
+    ))
+    assert "changed" in _get(second)
+    assert (second_cache.hits, second_cache.misses) == (1, 1)
+
+
+def test_invalidation_through_directory_survives_restart(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put(HOST, URL, _response(b"<old/>"), time.time())
+    ResponseCache(str(tmp_path)).invalidate(HOST)
+    # A new process, that loads the response from the directory
+    assert ResponseCache(str(tmp_path)).get(HOST, URL) is None
+    assert cache.get(HOST, URL) is None
+    # Responses to requests sent after the invalidation are used
+    cache.put(HOST, URL, _response(b"<new/>"), time.time())
+    assert ResponseCache(str(tmp_path)).get(HOST, URL).content == b"<new/>"
+
+
+def test_other_hosts_are_not_invalidated():
+    cache = ResponseCache()
+    cache.put(HOST, URL, _response(b"<a/>"), time.time())
+    cache.put("other", URL + "?other", _response(b"<b/>"), time.time())
+    cache.invalidate(HOST)
+    assert cache.get(HOST, URL) is None
+    assert cache.get("other", URL + "?other").content == b"<b/>"
+
+
+def test_fresh():
+    cache = ResponseCache(max_age=60)
+    entry = cache.put(HOST, URL, _response(b"<a/>"), time.time())
+    assert cache.fresh(entry)
+    entry.sent -= 61
+    assert not cache.fresh(entry)
+    # Responses with validators are always revalidated
+    entry = cache.put(HOST, URL, _response(b"<a/>", ETag='"1"'), time.time())
+    assert not cache.fresh(entry)
+    assert entry.validators == {"If-None-Match": '"1"'}
+    entry = cache.put(
+        HOST, URL, _response(b"<a/>", Last_Modified="yesterday"), time.time()
+    )
+    assert entry.validators == {"If-Modified-Since": "yesterday"}
+
+
+def test_least_recently_used_responses_are_dropped():
+    cache = ResponseCache(max_bytes=10)
+    for name in "abc":
+        cache.put(HOST, URL + name, _response(b"12345"), time.time())
+    assert len(cache) == 2
+    assert cache.get(HOST, URL + "a") is None
+    # Used, b is dropped next
+    assert cache.get(HOST, URL + "b") is not None
+    cache.put(HOST, URL + "d", _response(b"12345"), time.time())
+    assert cache.get(HOST, URL + "b") is not None
+    assert cache.get(HOST, URL + "c") is None
+    # Larger than the cache
+    cache.put(HOST, URL + "e", _response(b"12345678901"), time.time())
+    assert cache.get(HOST, URL + "e") is None
@@ -0,0 +1,88 @@
+import logging
+
+import pytest
+
+from sbc_rest_client.ha import SbcHaPair
+from sbc_rest_client.operations import OperationPoller
+from sbc_rest_client.rolling import RollingRestart
+from sbc_rest_client.simulator import SbcSimulator
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+def _poller() -> OperationPoller:
+    return OperationPoller(initial_delay=0.02, max_delay=0.05, timeout=5)
+
+
+@pytest.fixture
+def simulators(request):
+    reboot_duration = getattr(request, "param", 0.3)
+    simulators = list()
+    for _ in range(3):
+        active = SbcSimulator(
+            role="active", reboot_duration=reboot_duration,
+            operation_duration=0.01
+        )
+        standby = SbcSimulator(
+            role="standby", reboot_duration=reboot_duration,
+            operation_duration=0.01
+        )
+        active.start()
+        standby.start()
+        active.pair_with(standby)
+        simulators.append((active, standby))
+    yield simulators
+    for pair in simulators:
+        for simulator in pair:
+            simulator.stop()
+
+
+def _restart(simulators, **kwargs) -> RollingRestart:
+    # Retries would ride out the short reboots of the simulators
+    sites = [
+        SbcHaPair(active.sbc(retries=0), standby.sbc(retries=0))
+        for active, standby in simulators
+    ]
+    return RollingRestart(
+        sites, reboot_poller=_poller(), switchover_poller=_poller(),
+        reboot_grace=1.0, **kwargs
+    )
+
+
+def test_rolling_restart(simulators):
+    results = _restart(simulators, max_in_flight=3).run()
+    assert all(results)
+    for active, standby in simulators:
+        assert active.reboots == standby.reboots == 1
+        # Switched over once
+        assert (active.role, standby.role) == ("standby", "active")
+
+
+@pytest.mark.parametrize("simulators", [0.0], indirect=True)
+def test_peer_that_does_not_go_down_fails_site(simulators):
+    restart = _restart(simulators[:1])
+    result, = restart.run()
+    assert not result and not result.skipped
+    assert result.error == "reboot standby failed"
+    active, standby = simulators[0]
+    # No switchover to a peer that did not reboot
+    assert (active.role, standby.role) == ("active", "standby")
+    assert active.reboots == 0
+
+
+@pytest.mark.parametrize("simulators", [0.0], indirect=True)
+def test_skipped_sites_are_not_failures(simulators, caplog):
+    restart = _restart(simulators, max_in_flight=1, max_failures=1)
+    with caplog.at_level(logging.INFO, logger="sbc_rest_client.rolling"):
+        results = restart.run()
+    assert [result.skipped for result in results] == [False, True, True]
+    assert not any(results)
+    assert restart._failures == 1
+    errors = [
+        record for record in caplog.records
+        if record.levelno >= logging.ERROR
+    ]
+    assert len(errors) == 1
+    for active, standby in simulators[1:]:
+        assert active.reboots == standby.reboots == 0
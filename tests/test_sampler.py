@@ -0,0 +1,108 @@
+import math
+import threading
+
+import pytest
+
+from sbc_rest_client.sampler import KpiSampler, RingBuffer
+from sbc_rest_client.simulator import SbcSimulator
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+def _buffer(capacity: int, n: int) -> RingBuffer:
+    """A buffer holding samples 1 to n, a second apart, with a == t."""
+
+    buffer = RingBuffer(capacity, ("a", "b"))
+    for t in range(1, n + 1):
+        buffer.append(float(t), {"a": t, "b": "not a number"})
+    return buffer
+
+
+def test_empty():
+    buffer = RingBuffer(3, ("a",))
+    assert len(buffer) == 0
+    assert buffer.timestamps() == []
+    assert buffer.values("a", window=10) == []
+    assert buffer.latest("a") is None
+    assert buffer.min("a") is None
+    assert buffer.percentile("a", 50) is None
+    assert buffer.rate("a") is None
+
+
+def test_wraparound():
+    for n in (2, 3, 5, 7):
+        buffer = _buffer(3, n)
+        expected = [float(t) for t in range(max(1, n - 2), n + 1)]
+        assert len(buffer) == len(expected)
+        assert buffer.timestamps() == expected
+        assert buffer.values("a") == expected
+        assert buffer.latest("a") == n
+
+
+def test_window():
+    buffer = _buffer(5, 8)
+    # The window is counted back from the latest sample, inclusive
+    assert buffer.timestamps(window=2) == [6.0, 7.0, 8.0]
+    assert buffer.values("a", window=0) == [8.0]
+    assert buffer.values("a", window=100) == [4.0, 5.0, 6.0, 7.0, 8.0]
+    assert buffer.min("a", window=1) == 7
+    assert buffer.max("a", window=1) == 8
+    assert buffer.mean("a", window=2) == 7
+    assert buffer.rate("a", window=3) == 1.0
+
+
+def test_missing_values_are_ignored():
+    buffer = _buffer(3, 4)
+    assert buffer.values("b") == []
+    assert buffer.latest("b") is not None and math.isnan(buffer.latest("b"))
+    assert buffer.mean("b") is None
+    buffer.append(5.0, {})
+    assert buffer.values("a") == [3.0, 4.0]
+    assert buffer.rate("a") == 1.0
+
+
+def test_percentile():
+    buffer = RingBuffer(10, ("a",))
+    for t, value in enumerate([5, 1, 4, 2, 3]):
+        buffer.append(float(t), {"a": value})
+    assert buffer.percentile("a", 0) == 1
+    assert buffer.percentile("a", 50) == 3
+    assert buffer.percentile("a", 100) == 5
+    assert buffer.percentile("a", 25) == 2
+    assert buffer.percentile("a", 10) == pytest.approx(1.4)
+    with pytest.raises(ValueError):
+        buffer.percentile("a", 101)
+
+
+def test_queries_while_appending():
+    buffer = RingBuffer(64, ("a", "b"))
+    stop = threading.Event()
+
+    def append():
+        t = 0.0
+        while not stop.is_set():
+            t += 1
+            buffer.append(t, {"a": t, "b": 2 * t})
+
+    thread = threading.Thread(target=append)
+    thread.start()
+    try:
+        for _ in range(2000):
+            rate = buffer.rate("a", window=10)
+            assert rate is None or rate == 1.0
+            timestamps = buffer.timestamps()
+            assert timestamps == sorted(timestamps)
+    finally:
+        stop.set()
+        thread.join()
+
+
+def test_sampler_records_history():
+    with SbcSimulator() as simulator:
+        sampler = KpiSampler([simulator.sbc()], capacity=2)
+        for _ in range(3):
+            sampler.sample_once()
+        history = sampler.history(simulator.address)
+        assert len(history) == 2
+        assert len(history.values("sysGlobalConSessions")) == 2
@@ -0,0 +1,104 @@
+import threading
+
+import pytest
+
+from sbc_rest_client.simulator import SbcSimulator
+from sbc_rest_client.singleflight import SingleFlight
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+def test_concurrent_reads_share_one_call():
+    single_flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def read():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    results = []
+    leader = threading.Thread(
+        target=lambda: results.append(single_flight.do("e", "k", read))
+    )
+    leader.start()
+    started.wait(5)
+    followers = [
+        threading.Thread(
+            target=lambda: results.append(single_flight.do("e", "k", read))
+        )
+        for _ in range(5)
+    ]
+    for follower in followers:
+        follower.start()
+    while single_flight.shared < 5:
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+    assert results == ["value"] * 6
+    assert len(calls) == 1
+
+
+def test_failed_read_is_not_cached():
+    single_flight = SingleFlight(ttls={"e": 60})
+
+    def fail():
+        raise Exception("Failed!")
+
+    with pytest.raises(Exception, match="Failed!"):
+        single_flight.do("e", "k", fail)
+    assert single_flight.do("e", "k", lambda: "value") == "value"
+    assert single_flight.do("e", "k", fail) == "value"
+    assert single_flight.hits == 1
+
+
+def test_falsy_results_are_cached():
+    single_flight = SingleFlight(ttls={"e": 60})
+    assert single_flight.do("e", "k", lambda: []) == []
+    assert single_flight.do("e", "k", lambda: ["other"]) == []
+
+
+def test_invalidate():
+    single_flight = SingleFlight(ttls={"e": 60})
+    single_flight.do("e", "a", lambda: 1)
+    single_flight.do("e", "b", lambda: 1)
+    single_flight.invalidate("e", "a")
+    assert single_flight.do("e", "a", lambda: 2) == 2
+    assert single_flight.do("e", "b", lambda: 2) == 1
+
+
+@pytest.fixture
+def simulator():
+    with SbcSimulator() as simulator:
+        yield simulator
+
+
+def test_error_responses_are_not_cached(simulator):
+    single_flight = SingleFlight(ttls={
+        "role": 60, "supported_rest_api_versions": 60, "kpi_snapshot": 60,
+        "config_element_types": 60, "element_type_metadata": 60,
+    })
+    sbc = simulator.sbc(single_flight=single_flight, retries=0)
+    sbc.role
+    single_flight.invalidate()
+    simulator.failure_rate = 1
+    assert sbc.role is False
+    with pytest.raises(Exception):
+        sbc.supported_rest_api_versions
+    with pytest.raises(Exception):
+        sbc.kpi_snapshot()
+    with pytest.raises(Exception):
+        sbc.config_element_types()
+    with pytest.raises(Exception):
+        sbc.config_element_key_attributes("session-agent")
+    simulator.failure_rate = 0
+    assert sbc.role == "standalone"
+    assert sbc.supported_rest_api_versions == ["v1.0", "v1.1"]
+    assert "sysGlobalCPS" in sbc.kpi_snapshot().fields
+    assert "session-agent" in sbc.config_element_types()
+    assert sbc.config_element_key_attributes("session-agent") == ["hostname"]
@@ -0,0 +1,159 @@
+import pytest
+
+from sbc_rest_client.elements import ConfigElement
+from sbc_rest_client.simulator import SbcSimulator
+from sbc_rest_client.sync import diff_elements, index_elements, sync_config
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+KEYS = ("hostname",)
+
+
+def _agent(hostname, sub_elements=(), **attributes) -> ConfigElement:
+    return ConfigElement(
+        "session-agent",
+        [("hostname", hostname)] + [
+            (name.replace("_", "-"), value)
+            for name, value in attributes.items()
+        ],
+        sub_elements
+    )
+
+
+def _sub(name: str) -> ConfigElement:
+    return ConfigElement("auth-attribute", [("name", name)])
+
+
+def test_add_update_and_unchanged():
+    running = [_agent("a", state="enabled"), _agent("b", state="enabled")]
+    desired = [
+        _agent("a", state="enabled"),
+        _agent("b", state="disabled", description="x"),
+        _agent("c"),
+    ]
+    diff = diff_elements(running, desired, KEYS)
+    assert diff.adds == [_agent("c")]
+    # Only the key and the changed attributes are sent
+    assert diff.updates == [_agent("b", state="disabled", description="x")]
+    assert diff.deletes == []
+
+
+def test_update_sends_only_changed_attributes():
+    running = [_agent("a", state="enabled", description="old")]
+    desired = [_agent("a", state="enabled", description="new")]
+    diff = diff_elements(running, desired, KEYS)
+    assert diff.updates == [_agent("a", description="new")]
+
+
+def test_unmanaged_attributes_are_left_alone():
+    running = [_agent("a", state="enabled", description="x")]
+    assert not diff_elements(running, [_agent("a")], KEYS)
+
+
+def test_prune():
+    running = [_agent("a"), _agent("b c")]
+    desired = [_agent("a")]
+    assert diff_elements(running, desired, KEYS).deletes == []
+    assert diff_elements(running, desired, KEYS, prune=True).deletes == [
+        ("session-agent", "&hostname=b%20c")
+    ]
+
+
+def test_sub_elements():
+    running = [_agent("a", [_sub("x")], state="enabled")]
+    # The whole desired element, sub elements included
+    desired = [_agent("a", [_sub("y")], state="enabled")]
+    assert diff_elements(running, desired, KEYS).updates == desired
+    assert not diff_elements(running, running, KEYS)
+
+
+def test_sub_elements_compare_desired_attributes_only():
+    running = [_agent("a", [
+        ConfigElement("auth-attribute", [("name", "x"), ("type", "md5")]),
+        ConfigElement("auth-attribute", [("name", "y"), ("type", "md5")]),
+    ])]
+    desired = [_agent("a", [_sub("x"), _sub("y")])]
+    assert not diff_elements(running, desired, KEYS)
+    # Matched by position
+    desired = [_agent("a", [_sub("y"), _sub("x")])]
+    assert diff_elements(running, desired, KEYS).updates == desired
+
+
+def test_nested_sub_elements():
+    running = [_agent("a", [ConfigElement(
+        "auth-attribute", [("name", "x"), ("type", "md5")],
+        [ConfigElement("value", [("v", "1"), ("w", "2")])]
+    )])]
+
+    def desired(v):
+        return [_agent("a", [ConfigElement(
+            "auth-attribute", [("name", "x")],
+            [ConfigElement("value", [("v", v)])]
+        )])]
+
+    assert not diff_elements(running, desired("1"), KEYS)
+    assert diff_elements(running, desired("3"), KEYS).updates == desired("3")
+
+
+def test_sub_elements_differ_in_number():
+    running = [_agent("a", [_sub("x")])]
+    desired = [_agent("a", [_sub("x"), _sub("y")])]
+    assert diff_elements(running, desired, KEYS).updates == desired
+
+
+def test_unmanaged_sub_element_types_are_left_alone():
+    running = [_agent("a", [
+        _sub("x"), ConfigElement("response-map", [("name", "m")])
+    ])]
+    desired = [_agent("a", [_sub("x")])]
+    assert not diff_elements(running, desired, KEYS)
+
+
+def test_sub_elements_are_unmanaged_without_desired_sub_elements():
+    running = [_agent("a", [_sub("x")], state="enabled")]
+    desired = [_agent("a", state="enabled")]
+    assert not diff_elements(running, desired, KEYS)
+
+
+def test_key_normalisation():
+    # A single value in a list is the same as the value
+    running = [ConfigElement("local-policy", [
+        ("from-address", ("10.0.0.1",)), ("to-address", "*"),
+    ])]
+    desired = [ConfigElement("local-policy", [
+        ("to-address", "*"), ("from-address", "10.0.0.1"),
+        ("source-realm", ""),
+    ])]
+    keys = ["from-address", "to-address", "source-realm"]
+    # A missing key attribute counts as empty
+    assert list(index_elements(running, keys)) == [("10.0.0.1", "*", "")]
+    assert not diff_elements(running, desired, keys)
+
+
+def test_duplicate_keys():
+    with pytest.raises(ValueError, match="Duplicate session-agent"):
+        diff_elements([], [_agent("a"), _agent("a", state="x")], KEYS)
+    with pytest.raises(ValueError, match="Duplicate session-agent"):
+        diff_elements([_agent("a"), _agent("a")], [], KEYS)
+
+
+def test_sync_config():
+    with SbcSimulator(element_count=2, attribute_count=2,
+                      operation_duration=0.01) as simulator:
+        sbc = simulator.sbc()
+        desired = {"session-agent": [
+            _agent("hostname-0", attribute_1="changed"), _agent("new"),
+        ]}
+        diff = sync_config(sbc, desired, prune=True, dry_run=True)
+        assert diff.summary() == "1 to add, 1 to update, 1 to delete"
+        assert len(list(sbc.config_elements("session-agent"))) == 2
+        sync_config(sbc, desired, prune=True)
+        agents = {
+            agent.get("hostname"): agent
+            for agent in sbc.config_elements("session-agent")
+        }
+        assert sorted(agents) == ["hostname-0", "new"]
+        assert agents["hostname-0"].get("attribute-1") == "changed"
+        assert not sync_config(sbc, desired, prune=True, dry_run=True)
@@ -0,0 +1,175 @@
+import pytest
+
+from sbc_rest_client.simulator import SbcSimulator
+from sbc_rest_client.transaction import (
+    ConfigTransaction, ConfigTransactionError
+)
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+def _xml(element_type: str, **attributes: str) -> str:
+    return (
+        "<configElement><elementType>{}</elementType>{}</configElement>"
+    ).format(
+        element_type, "".join(
+            "<attribute><name>{}</name><value>{}</value></attribute>".format(
+                name.replace("_", "-"), value
+            )
+            for name, value in attributes.items()
+        )
+    )
+
+
+@pytest.fixture
+def simulator():
+    with SbcSimulator(element_count=3, attribute_count=3,
+                      operation_duration=0.01) as simulator:
+        yield simulator
+
+
+def _agents(sbc) -> dict:
+    """The running session agents by hostname."""
+
+    return {
+        agent["hostname"]: agent for agent in
+        sbc.config_elements("session-agent")
+    }
+
+
+class _CountingReads(object):
+    """Counts the reads of running elements of an Sbc object."""
+
+    def __init__(self, sbc, monkeypatch) -> None:
+        self.reads = list()
+        config_elements = sbc.config_elements
+
+        def counted(element_type, key_attribs=None):
+            self.reads.append((element_type, key_attribs))
+            return config_elements(element_type, key_attribs)
+
+        monkeypatch.setattr(sbc, "config_elements", counted)
+
+
+def test_commit_applies_and_unlocks(simulator):
+    sbc = simulator.sbc()
+    with ConfigTransaction(sbc) as tx:
+        tx.add(_xml("session-agent", hostname="new"))
+        tx.update(_xml("session-agent", hostname="hostname-0",
+                       attribute_0="changed"))
+        tx.delete("session-agent", "&hostname=hostname-1")
+    agents = _agents(sbc)
+    assert "new" in agents
+    assert "hostname-1" not in agents
+    assert agents["hostname-0"]["attribute-0"] == "changed"
+    assert not simulator.locked
+
+
+def test_failed_phase_undoes_applied_operations(simulator):
+    sbc = simulator.sbc()
+    before = _agents(sbc)
+    tx = ConfigTransaction(sbc)
+    tx.begin()
+    tx.delete("session-agent", "&hostname=hostname-1")
+    tx.add(_xml("session-agent", hostname="new"))
+    tx.update(_xml("session-agent", hostname="hostname-0",
+                   attribute_0="changed"))
+    # No such element, the update phase fails
+    tx.update(_xml("session-agent", hostname="missing", attribute_0="x"))
+    with pytest.raises(ConfigTransactionError) as e:
+        tx.commit()
+    assert e.value.failures == [
+        ("update", _xml("session-agent", hostname="missing", attribute_0="x"))
+    ]
+    assert e.value.undo_failures == []
+    after = _agents(sbc)
+    assert sorted(after) == sorted(before)
+    assert dict(after["hostname-0"].items()) == \
+        dict(before["hostname-0"].items())
+    assert not simulator.locked
+    assert len(tx) == 0
+
+
+def test_running_elements_are_read_once_per_element_type(simulator,
+                                                          monkeypatch):
+    sbc = simulator.sbc()
+    before = _agents(sbc)
+    counter = _CountingReads(sbc, monkeypatch)
+    tx = ConfigTransaction(sbc)
+    tx.begin()
+    tx.delete("session-agent", "&hostname=hostname-1")
+    tx.delete("session-agent", "&hostname=hostname-2")
+    tx.delete("realm-config", "&identifier=identifier-0")
+    tx.update(_xml("session-agent", hostname="hostname-0",
+                   attribute_0="changed"))
+    # No such element, the update phase fails
+    tx.update(_xml("session-agent", hostname="missing", attribute_0="x"))
+    with pytest.raises(ConfigTransactionError):
+        tx.commit()
+    assert sorted(counter.reads[:2]) == [
+        ("realm-config", "&identifier=identifier-0"),
+        ("session-agent", None),
+    ]
+    # The update phase
+    assert counter.reads[2:] == [("session-agent", None)]
+    # Undone with the elements read once
+    after = _agents(sbc)
+    assert sorted(after) == sorted(before)
+    assert dict(after["hostname-0"].items()) == \
+        dict(before["hostname-0"].items())
+    assert sorted(
+        e["identifier"] for e in sbc.config_elements("realm-config")
+    ) == ["identifier-0", "identifier-1", "identifier-2"]
+
+
+def test_no_reads_without_undo(simulator, monkeypatch):
+    sbc = simulator.sbc()
+    counter = _CountingReads(sbc, monkeypatch)
+    with ConfigTransaction(sbc, undo=False) as tx:
+        tx.delete("session-agent", "&hostname=hostname-1")
+        tx.delete("session-agent", "&hostname=hostname-2")
+        tx.update(_xml("session-agent", hostname="hostname-0",
+                       attribute_0="changed"))
+    assert counter.reads == []
+
+
+def test_failed_activation_undoes_applied_operations(simulator, monkeypatch):
+    sbc = simulator.sbc()
+    monkeypatch.setattr(sbc, "activate_config", lambda: False)
+    with pytest.raises(ConfigTransactionError, match="activate"):
+        with ConfigTransaction(sbc) as tx:
+            tx.add(_xml("session-agent", hostname="new"))
+    assert "new" not in _agents(sbc)
+    assert not simulator.locked
+
+
+def test_undo_failures_are_reported(simulator, monkeypatch):
+    sbc = simulator.sbc()
+    tx = ConfigTransaction(sbc, activate=False)
+    tx.begin()
+    tx.add(_xml("session-agent", hostname="new"))
+    # Exists already
+    tx.add(_xml("session-agent", hostname="hostname-0"))
+    tx.update(_xml("session-agent", hostname="new", attribute_0="x"))
+    monkeypatch.setattr(sbc, "delete_config_element", lambda *args: False)
+    with pytest.raises(ConfigTransactionError) as e:
+        tx.commit()
+    assert e.value.failures == [
+        ("add", _xml("session-agent", hostname="hostname-0"))
+    ]
+    assert e.value.undo_failures == [
+        ("add", _xml("session-agent", hostname="new"))
+    ]
+    assert not simulator.locked
+
+
+def test_exception_in_block_sends_nothing(simulator):
+    sbc = simulator.sbc()
+    version = simulator.config_version
+    with pytest.raises(RuntimeError):
+        with ConfigTransaction(sbc) as tx:
+            tx.add(_xml("session-agent", hostname="new"))
+            raise RuntimeError()
+    assert simulator.config_version == version
+    assert not simulator.locked
@@ -0,0 +1,111 @@
+import pytest
+
+from sbc_rest_client import transport
+from sbc_rest_client.ratelimit import HostLimiter
+from sbc_rest_client.simulator import SbcSimulator
+from sbc_rest_client.transport import (
+    make_retry, make_session, shared_session, without_overload_retries
+)
+
+
+__author__ = '139928764+p4irin@users.noreply.github.com'
+
+
+@pytest.fixture
+def shared_sessions(monkeypatch):
+    monkeypatch.setattr(transport, "_shared_sessions", dict())
+
+
+def _attempts(simulator, sbc, read) -> int:
+    """The number of requests sent for one failing read."""
+
+    sbc.role
+    simulator.failure_rate = 1
+    requests_before = simulator.request_count
+    read(sbc)
+    simulator.failure_rate = 0
+    return simulator.request_count - requests_before
+
+
+def _role(sbc) -> None:
+    sbc.role
+
+
+def test_make_retry():
+    retries = make_retry()
+    assert retries.total == 2
+    assert set(retries.status_forcelist) == {502, 503, 504}
+    assert retries.is_retry("GET", 503)
+    assert not retries.is_retry("POST", 503)
+    assert not retries.raise_on_status
+    assert retries.respect_retry_after_header
+
+
+def test_without_overload_retries_defaults_to_make_retry():
+    retries = without_overload_retries(None)
+    assert retries.total == 2
+    assert set(retries.status_forcelist) == {502, 504}
+    assert not retries.is_retry("GET", 429, has_retry_after=True)
+    assert not retries.is_retry("GET", 503, has_retry_after=True)
+    assert retries.is_retry("GET", 502)
+
+
+def test_gets_are_retried():
+    with SbcSimulator(failure_status=502) as simulator:
+        sbc = simulator.sbc()
+        assert _attempts(simulator, sbc, _role) == 3
+
+
+def test_overloads_are_retried_without_limiter():
+    with SbcSimulator() as simulator:
+        # The simulator asks to retry 503s after a second
+        sbc = simulator.sbc(retries=make_retry(total=1))
+        assert _attempts(simulator, sbc, _role) == 2
+
+
+def test_only_other_failures_are_retried_with_limiter():
+    with SbcSimulator() as simulator:
+        limiter = HostLimiter(rate=None, adaptive=False)
+        sbc = simulator.sbc(limiter=limiter)
+        assert _attempts(simulator, sbc, _role) == 1
+        simulator.failure_status = 502
+        assert _attempts(simulator, sbc, _role) == 3
+
+
+def test_changes_are_not_retried():
+    with SbcSimulator(failure_status=502) as simulator:
+        sbc = simulator.sbc()
+        assert _attempts(simulator, sbc, lambda sbc: sbc.lock()) == 1
+
+
+def test_no_retries():
+    with SbcSimulator(failure_status=502) as simulator:
+        sbc = simulator.sbc(retries=0)
+        assert _attempts(simulator, sbc, _role) == 1
+
+
+def test_shared_session_per_retry_parameters(shared_sessions):
+    session = shared_session("sbc1", retries=make_retry(total=3))
+    assert shared_session("sbc1", retries=make_retry(total=3)) is session
+    # Their repr() is the same
+    assert shared_session(
+        "sbc1", retries=make_retry(total=3, status_forcelist=(502,))
+    ) is not session
+    assert shared_session(
+        "sbc1", retries=make_retry(total=3, backoff_factor=1)
+    ) is not session
+    assert shared_session("sbc1", retries=3) is shared_session(
+        "sbc1", retries=3
+    )
+    assert shared_session("sbc1", retries=3) is not session
+    assert shared_session("sbc2", retries=make_retry(total=3)) is not session
+    assert shared_session(
+        "sbc1", retries=make_retry(total=3), retry_overload=False
+    ) is not session
+
+
+def test_session_retry_policy():
+    session = make_session(retries=make_retry(total=4), retry_overload=False)
+    retries = session.get_adapter("https://sbc1").max_retries
+    assert retries.total == 4
+    assert set(retries.status_forcelist) == {502, 504}